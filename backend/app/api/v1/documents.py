@@ -1,22 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Tuple
+import asyncio
 import os
+import traceback
 import uuid
 from pathlib import Path
 
 from app.database import get_db
-from app.dependencies import get_current_active_user
+from app.dependencies import get_current_active_user, require_llm_budget
 from app.models.user import User
-from app.models.document import Document, DocumentType, ProcessingStatus
-from app.schemas.document import DocumentResponse, DocumentCreate, DocumentUpdate, DocumentList
+from app.models.document import Document, DocumentBlob, DocumentPage, DocumentType, ProcessingStatus
+from app.models.chunk_summary import ChunkSummary
+from app.schemas.document import (
+    DocumentResponse, DocumentCreate, DocumentUpdate, DocumentList,
+    DocumentContent, DocumentPageContent, BatchUploadResult, BatchUploadResponse
+)
 from app.config import settings
+from app.utils.pagination import paginate
 from app.services.document_service import DocumentService
+from app.services.document_processor import document_processor
+from app.services.storage_service import StorageService, FileTooLargeError
+from app.services.llm_service import LLMService
+from app.services.vector_index import vector_store
+from app.utils.sse import sse_response, sse_text_stream
 
 router = APIRouter()
 
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -29,63 +43,152 @@ async def upload_document(
             detail=f"File type {file_extension} not allowed"
         )
     
-    # Validate file size
-    if file.size > settings.MAX_FILE_SIZE:
+    # Stream file into content-addressed storage, rejecting it as soon as
+    # it passes the size limit
+    try:
+        blob, _ = await StorageService.store_upload(file, db, file_extension)
+    except FileTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="File too large"
         )
     
-    # Generate unique filename
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+    document, reused = _create_document(db, blob, file.filename, file_extension, current_user)
+    db.commit()
+    db.refresh(document)
+    
+    # Start background processing; reused results only need indexing
+    if not reused:
+        document_processor.enqueue(document.id)
+    else:
+        background_tasks.add_task(vector_store.index_document, current_user.id, document.id)
+    
+    return document
+
+@router.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_documents_batch(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    if len(files) > settings.MAX_BATCH_UPLOAD_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.MAX_BATCH_UPLOAD_FILES} files per batch"
+        )
+    
+    results = [BatchUploadResult(filename=file.filename) for file in files]
+    extensions = [Path(file.filename).suffix.lower() for file in files]
+    for result, extension in zip(results, extensions):
+        if extension not in settings.ALLOWED_FILE_TYPES:
+            result.error = f"File type {extension} not allowed"
+    
+    # Stream all accepted files to storage concurrently
+    semaphore = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+    
+    async def save(file: UploadFile, extension: str):
+        async with semaphore:
+            incoming_path = os.path.join(settings.UPLOAD_DIR, "incoming", f"{uuid.uuid4()}{extension}")
+            return await StorageService.save_upload(file, incoming_path)
+    
+    pending = [i for i, result in enumerate(results) if result.error is None]
+    saved = await asyncio.gather(
+        *[save(files[i], extensions[i]) for i in pending],
+        return_exceptions=True
+    )
     
-    # Save file
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Create every document in one transaction; a failing file only rolls
+    # back its own savepoint
+    created = []
+    try:
+        for i, stored in zip(pending, saved):
+            if isinstance(stored, FileTooLargeError):
+                results[i].error = "File too large"
+                continue
+            if isinstance(stored, Exception):
+                results[i].error = f"Upload failed: {stored}"
+                continue
+            try:
+                with db.begin_nested():
+                    blob, _ = StorageService.add_blob_reference(db, stored, extensions[i])
+                    document, reused = _create_document(
+                        db, blob, files[i].filename, extensions[i], current_user
+                    )
+                created.append((i, document, reused))
+            except Exception as e:
+                print(f"Error storing {files[i].filename}: {type(e).__name__}: {e}")
+                traceback.print_exc()
+                results[i].error = f"Failed to store file ({type(e).__name__})"
+        db.commit()
+    finally:
+        for stored in saved:
+            if isinstance(stored, dict) and os.path.exists(stored["file_path"]):
+                os.remove(stored["file_path"])
     
-    # Create document record
+    for i, document, reused in created:
+        db.refresh(document)
+        results[i].document = DocumentResponse.model_validate(document)
+        if not reused:
+            document_processor.enqueue(document.id)
+        else:
+            background_tasks.add_task(vector_store.index_document, current_user.id, document.id)
+    
+    return BatchUploadResponse(
+        results=results,
+        uploaded=len(created),
+        failed=len(results) - len(created)
+    )
+
+def _create_document(
+    db: Session,
+    blob: DocumentBlob,
+    filename: str,
+    file_extension: str,
+    owner: User
+) -> Tuple[Document, bool]:
+    """Add a document for a stored blob, reusing the results of an identical
+    upload that was already processed. Returns the document and whether
+    processing results were reused."""
     document_type = DocumentType(file_extension.lstrip('.'))
     document = Document(
-        title=file.filename,
-        filename=unique_filename,
-        file_path=file_path,
-        file_size=len(content),
+        title=filename,
+        filename=os.path.basename(blob.file_path),
+        file_path=blob.file_path,
+        file_size=blob.file_size,
+        content_hash=blob.content_hash,
         document_type=document_type,
-        owner_id=current_user.id
+        owner_id=owner.id
     )
     
-    db.add(document)
-    db.commit()
-    db.refresh(document)
-    
-    # Start background processing
-    # TODO: Add background task for document processing
+    duplicate = DocumentService.find_processed_duplicate(db, blob.content_hash)
+    if duplicate:
+        DocumentService.copy_processed_content(duplicate, document)
     
-    return document
+    db.add(document)
+    return document, duplicate is not None
 
 @router.get("/", response_model=DocumentList)
 async def list_documents(
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    documents = db.query(Document).filter(
-        Document.owner_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    query = db.query(Document).filter(Document.owner_id == current_user.id)
     
-    total = db.query(Document).filter(
-        Document.owner_id == current_user.id
-    ).count()
+    documents, next_cursor, total = paginate(
+        query, Document, limit, cursor=cursor, skip=skip, include_total=include_total
+    )
     
     return DocumentList(
         documents=documents,
         total=total,
-        page=skip // limit + 1,
-        size=limit
+        page=None if cursor else skip // limit + 1,  # Cursor pages have no number
+        size=limit,
+        next_cursor=next_cursor
     )
 
 @router.get("/{document_id}", response_model=DocumentResponse)
@@ -107,6 +210,131 @@ async def get_document(
     
     return document
 
+@router.get("/{document_id}/content", response_model=DocumentContent)
+async def get_document_content(
+    document_id: int,
+    start_page: Optional[int] = Query(None, ge=1),
+    end_page: Optional[int] = Query(None, ge=1),
+    raw: bool = False,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.owner_id == current_user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    if start_page and end_page and start_page > end_page:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_page must not be after end_page"
+        )
+    
+    pages = DocumentService.get_pages(db, document.id, start_page, end_page)
+    
+    return DocumentContent(
+        document_id=document.id,
+        page_count=document.page_count,
+        pages=[
+            DocumentPageContent(
+                page_number=page.page_number,
+                content=page.raw_content if raw else page.processed_content
+            )
+            for page in pages
+        ]
+    )
+
+@router.post("/{document_id}/summarize", response_model=DocumentResponse)
+async def summarize_document(
+    document_id: int,
+    max_length: int = Query(500, ge=50, le=4000),
+    current_user: User = Depends(require_llm_budget),
+    db: Session = Depends(get_db)
+):
+    document = _get_summarizable_document(db, document_id, current_user)
+    llm_service = LLMService(user_id=current_user.id)
+    chunks, known_summaries = _load_summary_chunks(db, document, llm_service)
+    
+    summary, new_summaries = await llm_service.summarize_chunks(chunks, max_length, known_summaries)
+    
+    _store_chunk_summaries(db, new_summaries)
+    document.summary = summary
+    db.commit()
+    db.refresh(document)
+    return document
+
+@router.post("/{document_id}/summarize/stream")
+async def stream_document_summary(
+    document_id: int,
+    max_length: int = Query(500, ge=50, le=4000),
+    current_user: User = Depends(require_llm_budget),
+    db: Session = Depends(get_db)
+):
+    """Summarize a document, streaming the final summary as server-sent events"""
+    document = _get_summarizable_document(db, document_id, current_user)
+    llm_service = LLMService(user_id=current_user.id)
+    chunks, known_summaries = _load_summary_chunks(db, document, llm_service)
+    
+    async def deltas():
+        content, combine, new_summaries = await llm_service.prepare_summary(chunks, known_summaries)
+        
+        def store_summaries():
+            # Keep the section summaries even if the client leaves during the final step
+            _store_chunk_summaries(db, new_summaries)
+            db.commit()
+        
+        await run_in_threadpool(store_summaries)
+        async for delta in llm_service.stream_summary(content, max_length, combine):
+            yield delta
+    
+    async def save_summary(summary: str):
+        document.summary = summary
+        await run_in_threadpool(db.commit)
+    
+    return sse_response(sse_text_stream(deltas(), on_complete=save_summary))
+
+def _get_summarizable_document(db: Session, document_id: int, owner: User) -> Document:
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.owner_id == owner.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    if document.processing_status != ProcessingStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Document has not been processed yet"
+        )
+    
+    return document
+
+def _load_summary_chunks(db: Session, document: Document, llm_service: LLMService) -> Tuple[List[dict], dict]:
+    """Chunk a document and look up the chunk summaries kept from earlier runs"""
+    chunks = llm_service.chunk_records(DocumentService.iter_page_records(db, document.id))
+    
+    # Only chunks whose text changed since the last summary need the LLM
+    keys = list({chunk["key"] for chunk in chunks})
+    known_summaries = {
+        row.chunk_key: row.summary
+        for row in db.query(ChunkSummary).filter(ChunkSummary.chunk_key.in_(keys))
+    } if keys else {}
+    return chunks, known_summaries
+
+def _store_chunk_summaries(db: Session, summaries: dict):
+    for key, summary in summaries.items():
+        db.merge(ChunkSummary(chunk_key=key, summary=summary))
+
 @router.put("/{document_id}", response_model=DocumentResponse)
 async def update_document(
     document_id: int,
@@ -135,6 +363,7 @@ async def update_document(
 @router.delete("/{document_id}")
 async def delete_document(
     document_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -149,11 +378,20 @@ async def delete_document(
             detail="Document not found"
         )
     
-    # Delete file
-    if os.path.exists(document.file_path):
-        os.remove(document.file_path)
+    # Release the stored file; it is only removed once no document uses it
+    if document.content_hash:
+        orphaned_path = StorageService.release_blob(db, document.content_hash)
+    else:
+        orphaned_path = document.file_path  # Uploaded before content-addressed storage
     
+    db.query(DocumentPage).filter(
+        DocumentPage.document_id == document.id
+    ).delete(synchronize_session=False)
     db.delete(document)
     db.commit()
     
+    if orphaned_path and os.path.exists(orphaned_path):
+        os.remove(orphaned_path)
+    
+    background_tasks.add_task(vector_store.remove_document, current_user.id, document_id)
     return {"message": "Document deleted successfully"}
\ No newline at end of file
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from app.database import get_db
 from app.dependencies import get_current_active_user
 from app.models.user import User
 from app.models.exercise import Exercise
+from app.utils.pagination import paginate, set_pagination_headers
 from app.schemas.exercise import ExerciseResponse, ExerciseCreate, ExerciseUpdate
 
 router = APIRouter()
@@ -28,8 +29,11 @@ async def create_exercise(
 
 @router.get("/", response_model=List[ExerciseResponse])
 async def list_exercises(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     category: str = None,
     difficulty: str = None,
     current_user: User = Depends(get_current_active_user),
@@ -43,7 +47,10 @@ async def list_exercises(
     if difficulty:
         query = query.filter(Exercise.difficulty == difficulty)
     
-    exercises = query.offset(skip).limit(limit).all()
+    exercises, next_cursor, total = paginate(
+        query, Exercise, limit, cursor=cursor, skip=skip, include_total=include_total
+    )
+    set_pagination_headers(response, next_cursor, total)
     return exercises
 
 @router.get("/{exercise_id}", response_model=ExerciseResponse)
@@ -1,16 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime, timedelta
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+import heapq
+import json
 
 from app.database import get_db
-from app.dependencies import get_current_active_user
+from app.dependencies import get_current_active_user, require_llm_budget
 from app.models.user import User
 from app.models.flashcard import Flashcard, ReviewStatus
-from app.schemas.flashcard import FlashcardResponse, FlashcardCreate, FlashcardUpdate, FlashcardReview
+from app.models.knowledge_point import KnowledgePoint
+from app.models.review_log import ReviewLog
+from app.models.review_stats import DailyReviewStats
+from app.config import settings
+from app.utils.pagination import paginate, set_pagination_headers
+from app.services.llm_service import LLMService
+from app.services.forecast_service import ForecastService
+from app.services.review_service import ReviewService
+from app.services.scheduler import get_scheduler
+from app.schemas.flashcard import (
+    FlashcardResponse, FlashcardCreate, FlashcardUpdate, FlashcardReview,
+    FlashcardBatchGenerate, FlashcardBatchResponse, ReviewSessionResponse,
+    FlashcardBatchReview, FlashcardBatchReviewResponse, DueForecastResponse
+)
 
 router = APIRouter()
 
+def _as_utc(value: datetime) -> datetime:
+    """Naive UTC, as the scheduling columns are written"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 @router.post("/", response_model=FlashcardResponse)
 async def create_flashcard(
     flashcard: FlashcardCreate,
@@ -23,14 +46,78 @@ async def create_flashcard(
         due_date=datetime.utcnow()
     )
     db.add(db_flashcard)
+    ForecastService.move(db, current_user.id, None, db_flashcard.due_date)
     db.commit()
     db.refresh(db_flashcard)
     return db_flashcard
 
+@router.post("/generate", response_model=FlashcardBatchResponse)
+async def generate_flashcards(
+    request: FlashcardBatchGenerate,
+    current_user: User = Depends(require_llm_budget),
+    db: Session = Depends(get_db)
+):
+    knowledge_point_ids = list(dict.fromkeys(request.knowledge_point_ids))
+    if len(knowledge_point_ids) > settings.MAX_FLASHCARD_BATCH_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many knowledge points. Maximum is {settings.MAX_FLASHCARD_BATCH_POINTS}"
+        )
+    
+    knowledge_points = db.query(KnowledgePoint).filter(
+        KnowledgePoint.id.in_(knowledge_point_ids),
+        KnowledgePoint.user_id == current_user.id
+    ).all()
+    
+    if len(knowledge_points) != len(knowledge_point_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Knowledge point not found"
+        )
+    
+    generated = await LLMService(user_id=current_user.id).generate_flashcards_batch(
+        [
+            {"id": point.id, "title": point.title, "description": point.description}
+            for point in knowledge_points
+        ],
+        count=request.cards_per_point,
+        bypass_cache=request.bypass_cache
+    )
+    
+    now = datetime.utcnow()
+    rows = [
+        {
+            "front": card["front"],
+            "back": card["back"],
+            "tags": json.dumps([]),
+            "user_id": current_user.id,
+            "knowledge_point_id": knowledge_point_id,
+            "due_date": now
+        }
+        for knowledge_point_id in knowledge_point_ids
+        for card in generated.get(knowledge_point_id, [])
+    ]
+    
+    # One multi-row INSERT ... RETURNING for the whole deck
+    flashcards = db.scalars(insert(Flashcard).returning(Flashcard), rows).all() if rows else []
+    if rows:
+        ForecastService.apply(db, {(current_user.id, ForecastService.due_day(now)): len(rows)})
+    
+    # Serialize before committing so the returned rows are not reloaded one by one
+    response = FlashcardBatchResponse(
+        flashcards=flashcards,
+        failed_knowledge_point_ids=[id for id in knowledge_point_ids if not generated.get(id)]
+    )
+    db.commit()
+    return response
+
 @router.get("/", response_model=List[FlashcardResponse])
 async def list_flashcards(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     due_only: bool = False,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -40,9 +127,71 @@ async def list_flashcards(
     if due_only:
         query = query.filter(Flashcard.due_date <= datetime.utcnow())
     
-    flashcards = query.offset(skip).limit(limit).all()
+    flashcards, next_cursor, total = paginate(
+        query, Flashcard, limit, cursor=cursor, skip=skip, include_total=include_total
+    )
+    set_pagination_headers(response, next_cursor, total)
     return flashcards
 
+@router.get("/review-session", response_model=ReviewSessionResponse)
+async def get_review_session(
+    limit: int = Query(20, ge=1, le=200),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """The next cards to review, in priority order.
+
+    Overdue cards come first, most overdue first, then relearning cards
+    due within ``REVIEW_LEARN_AHEAD_MINUTES``, then new cards while fewer
+    than ``NEW_CARDS_PER_DAY`` have been introduced today. Each queue is
+    read in due order from the (user_id, review_status, due_date) index
+    and stops after ``limit`` rows, however many cards the user has.
+    """
+    now = datetime.utcnow()
+    query = db.query(Flashcard).filter(Flashcard.user_id == current_user.id)
+    
+    def due_cards(review_status: ReviewStatus, until: Optional[datetime], count: int) -> List[Flashcard]:
+        if count <= 0:
+            return []
+        queue = query.filter(Flashcard.review_status == review_status)
+        if until is not None:
+            queue = queue.filter(Flashcard.due_date <= until)
+        return queue.order_by(Flashcard.due_date, Flashcard.id).limit(count).all()
+    
+    # One index range per status keeps each queue a bounded scan
+    overdue = list(heapq.merge(
+        due_cards(ReviewStatus.REVIEW, now, limit),
+        due_cards(ReviewStatus.LEARNING, now, limit),
+        key=lambda card: (card.due_date, card.id)
+    ))[:limit]
+    relearning = due_cards(
+        ReviewStatus.RELEARNING,
+        now + timedelta(minutes=settings.REVIEW_LEARN_AHEAD_MINUTES),
+        limit - len(overdue)
+    )
+    
+    introduced_today = db.query(DailyReviewStats.new_cards).filter(
+        DailyReviewStats.user_id == current_user.id,
+        DailyReviewStats.day == now.date()
+    ).scalar() or 0
+    new_cards_remaining = max(0, settings.NEW_CARDS_PER_DAY - introduced_today)
+    new = due_cards(ReviewStatus.NEW, None, min(limit - len(overdue) - len(relearning), new_cards_remaining))
+    
+    return ReviewSessionResponse(
+        flashcards=overdue + relearning + new,
+        new_cards_remaining=new_cards_remaining - len(new)
+    )
+
+@router.get("/forecast", response_model=DueForecastResponse)
+async def get_due_forecast(
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """How many cards come due on each of the next ``days`` days, from the maintained histogram"""
+    overdue, upcoming = ForecastService.forecast(db, current_user, days)
+    return DueForecastResponse(overdue=overdue, days=upcoming)
+
 @router.get("/{flashcard_id}", response_model=FlashcardResponse)
 async def get_flashcard(
     flashcard_id: int,
@@ -62,6 +211,82 @@ async def get_flashcard(
     
     return flashcard
 
+@router.post("/reviews", response_model=FlashcardBatchReviewResponse)
+async def review_flashcards_batch(
+    batch: FlashcardBatchReview,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Apply reviews made offline, in the order they were made, in one transaction.
+
+    Reviews whose ``review_id`` was already submitted are skipped, so a
+    client may safely resend a batch whose response it never received.
+    """
+    now = datetime.utcnow()
+    review_ids = [review.review_id for review in batch.reviews]
+    submitted = set(db.scalars(
+        select(ReviewLog.review_id).where(
+            ReviewLog.user_id == current_user.id,
+            ReviewLog.review_id.in_(review_ids)
+        )
+    ))
+    
+    reviews = []
+    duplicates = []
+    for review in batch.reviews:
+        if review.review_id in submitted:
+            duplicates.append(review.review_id)
+            continue
+        submitted.add(review.review_id)
+        reviews.append(review)
+    
+    flashcard_ids = {review.flashcard_id for review in reviews}
+    flashcards = {
+        flashcard.id: flashcard
+        for flashcard in db.query(Flashcard).filter(
+            Flashcard.id.in_(flashcard_ids),
+            Flashcard.user_id == current_user.id
+        )
+    } if flashcard_ids else {}
+    
+    if len(flashcards) != len(flashcard_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+    
+    scheduler = get_scheduler(current_user.scheduling_algorithm)
+    logs = [
+        ReviewService.review(
+            scheduler,
+            flashcards[review.flashcard_id],
+            review.score,
+            min(_as_utc(review.reviewed_at), now),  # Don't schedule from a clock running ahead
+            time_spent=review.time_spent,
+            review_id=review.review_id
+        )
+        # Stable, so reviews with the same timestamp keep the submitted order
+        for review in sorted(reviews, key=lambda review: _as_utc(review.reviewed_at))
+    ]
+    
+    # Serialize before committing so the cards are not reloaded one by one
+    response = FlashcardBatchReviewResponse(
+        flashcards=list(flashcards.values()),
+        applied_review_ids=[review.review_id for review in reviews],
+        duplicate_review_ids=duplicates
+    )
+    try:
+        ReviewService.record(db, current_user.id, logs)
+        db.commit()
+    except IntegrityError:
+        # The same reviews are being submitted concurrently
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Reviews already being submitted"
+        )
+    return response
+
 @router.post("/{flashcard_id}/review", response_model=FlashcardResponse)
 async def review_flashcard(
     flashcard_id: int,
@@ -80,34 +305,14 @@ async def review_flashcard(
             detail="Flashcard not found"
         )
     
-    # Update review statistics
-    flashcard.total_reviews += 1
-    flashcard.last_review_score = review.score
-    flashcard.last_reviewed = datetime.utcnow()
-    
-    if review.score >= 3:  # Correct answer
-        flashcard.correct_reviews += 1
-        flashcard.repetitions += 1
-        
-        # Update interval based on spaced repetition algorithm
-        if flashcard.repetitions == 1:
-            flashcard.interval = 1
-        elif flashcard.repetitions == 2:
-            flashcard.interval = 6
-        else:
-            flashcard.interval = int(flashcard.interval * flashcard.ease_factor)
-        
-        # Update ease factor
-        flashcard.ease_factor = max(1.3, flashcard.ease_factor + (0.1 - (5 - review.score) * (0.08 + (5 - review.score) * 0.02)))
-        
-        # Set next due date
-        flashcard.due_date = datetime.utcnow() + timedelta(days=flashcard.interval)
-        flashcard.review_status = ReviewStatus.REVIEW
-    else:  # Incorrect answer
-        flashcard.repetitions = 0
-        flashcard.interval = 1
-        flashcard.due_date = datetime.utcnow() + timedelta(minutes=10)
-        flashcard.review_status = ReviewStatus.RELEARNING
+    log = ReviewService.review(
+        get_scheduler(current_user.scheduling_algorithm),
+        flashcard,
+        review.score,
+        datetime.utcnow(),
+        time_spent=review.time_spent
+    )
+    ReviewService.record(db, current_user.id, [log])
     
     db.commit()
     db.refresh(flashcard)
@@ -155,6 +360,7 @@ async def delete_flashcard(
             detail="Flashcard not found"
         )
     
+    ForecastService.move(db, current_user.id, flashcard.due_date, None)
     db.delete(flashcard)
     db.commit()
     
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.database import get_db
-from app.dependencies import get_current_active_user
+from app.dependencies import get_current_active_user, require_llm_budget
 from app.models.user import User
 from app.models.knowledge_point import KnowledgePoint
+from app.utils.pagination import paginate, set_pagination_headers
+from app.utils.sse import sse_response, sse_text_stream
+from app.services.llm_service import LLMService
+from app.services.vector_index import vector_store
 from app.schemas.knowledge_point import KnowledgePointResponse, KnowledgePointCreate, KnowledgePointUpdate
 
 router = APIRouter()
@@ -13,6 +17,7 @@ router = APIRouter()
 @router.post("/", response_model=KnowledgePointResponse)
 async def create_knowledge_point(
     knowledge_point: KnowledgePointCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -23,12 +28,22 @@ async def create_knowledge_point(
     db.add(db_knowledge_point)
     db.commit()
     db.refresh(db_knowledge_point)
+    
+    background_tasks.add_task(
+        vector_store.index_knowledge_point,
+        current_user.id,
+        db_knowledge_point.id,
+        vector_store.knowledge_point_text(db_knowledge_point)
+    )
     return db_knowledge_point
 
 @router.get("/", response_model=List[KnowledgePointResponse])
 async def list_knowledge_points(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     category: str = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -38,7 +53,10 @@ async def list_knowledge_points(
     if category:
         query = query.filter(KnowledgePoint.category == category)
     
-    knowledge_points = query.offset(skip).limit(limit).all()
+    knowledge_points, next_cursor, total = paginate(
+        query, KnowledgePoint, limit, cursor=cursor, skip=skip, include_total=include_total
+    )
+    set_pagination_headers(response, next_cursor, total)
     return knowledge_points
 
 @router.get("/{knowledge_point_id}", response_model=KnowledgePointResponse)
@@ -60,10 +78,51 @@ async def get_knowledge_point(
     
     return knowledge_point
 
+@router.get("/{knowledge_point_id}/explain")
+async def explain_knowledge_point(
+    knowledge_point_id: int,
+    user_level: str = Query("intermediate", pattern="^(beginner|intermediate|advanced)$"),
+    bypass_cache: bool = False,
+    current_user: User = Depends(require_llm_budget),
+    db: Session = Depends(get_db)
+):
+    """Stream an explanation of a knowledge point as server-sent events.
+    
+    The user's most relevant notes and document passages are added as context.
+    """
+    knowledge_point = db.query(KnowledgePoint).filter(
+        KnowledgePoint.id == knowledge_point_id,
+        KnowledgePoint.user_id == current_user.id
+    ).first()
+    
+    if not knowledge_point:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Knowledge point not found"
+        )
+    
+    related = await vector_store.retrieve_context(
+        current_user.id,
+        vector_store.knowledge_point_text(knowledge_point),
+        exclude=[f"kp:{knowledge_point.id}"]
+    )
+    context = knowledge_point.description or ""
+    if related:
+        context = f"{context}\n\nRelated notes:\n{related}".strip()
+    
+    deltas = LLMService(user_id=current_user.id).stream_explain_concept(
+        knowledge_point.title,
+        context=context,
+        user_level=user_level,
+        bypass_cache=bypass_cache
+    )
+    return sse_response(sse_text_stream(deltas))
+
 @router.put("/{knowledge_point_id}", response_model=KnowledgePointResponse)
 async def update_knowledge_point(
     knowledge_point_id: int,
     knowledge_point_update: KnowledgePointUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -83,11 +142,19 @@ async def update_knowledge_point(
     
     db.commit()
     db.refresh(knowledge_point)
+    
+    background_tasks.add_task(
+        vector_store.index_knowledge_point,
+        current_user.id,
+        knowledge_point.id,
+        vector_store.knowledge_point_text(knowledge_point)
+    )
     return knowledge_point
 
 @router.delete("/{knowledge_point_id}")
 async def delete_knowledge_point(
     knowledge_point_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -105,4 +172,5 @@ async def delete_knowledge_point(
     db.delete(knowledge_point)
     db.commit()
     
+    background_tasks.add_task(vector_store.remove_knowledge_point, current_user.id, knowledge_point_id)
     return {"message": "Knowledge point deleted successfully"}
\ No newline at end of file
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from typing import List
+from datetime import datetime, timedelta
 
 from app.database import get_db
 from app.dependencies import get_current_active_user
 from app.models.user import User
-from app.schemas.user import UserResponse, UserUpdate
+from app.models.llm_usage import LLMUsage
+from app.models.review_stats import DailyReviewStats, ReviewStats
+from app.schemas.user import (
+    UserResponse, UserUpdate, LLMUsageResponse, SchedulingAlgorithmUpdate, RescheduleResponse,
+    ReviewStatsResponse
+)
+from app.services.scheduler import get_scheduler, reschedule
 
 router = APIRouter()
 
@@ -23,4 +31,56 @@ async def update_user_me(
     
     db.commit()
     db.refresh(current_user)
-    return current_user
\ No newline at end of file
+    return current_user
+
+@router.put("/me/scheduling-algorithm", response_model=RescheduleResponse)
+def update_scheduling_algorithm(
+    update: SchedulingAlgorithmUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Switch the spaced repetition algorithm, rescheduling every card from its review history.
+    
+    Rescheduling a large deck takes a while, so this runs in the threadpool
+    rather than on the event loop.
+    """
+    counts = reschedule(db, get_scheduler(update.scheduling_algorithm), user_id=current_user.id)
+    current_user.scheduling_algorithm = update.scheduling_algorithm
+    db.commit()
+    return RescheduleResponse(scheduling_algorithm=update.scheduling_algorithm, **counts)
+
+@router.get("/me/llm-usage", response_model=List[LLMUsageResponse])
+async def read_user_llm_usage(
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Daily LLM usage per method and model, newest first.
+    
+    Usage is written periodically, so the latest calls may not show yet.
+    """
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    return db.query(LLMUsage).filter(
+        LLMUsage.user_id == current_user.id,
+        LLMUsage.day >= since
+    ).order_by(LLMUsage.day.desc(), LLMUsage.method, LLMUsage.model).all()
+
+@router.get("/me/review-stats", response_model=ReviewStatsResponse)
+async def read_user_review_stats(
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Review totals, overall and per day, read from counters kept up to date on each review"""
+    totals = db.query(ReviewStats).filter(ReviewStats.user_id == current_user.id).first()
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    daily = db.query(DailyReviewStats).filter(
+        DailyReviewStats.user_id == current_user.id,
+        DailyReviewStats.day >= since
+    ).order_by(DailyReviewStats.day.desc()).all()
+    
+    response = ReviewStatsResponse(days=daily)
+    if totals:
+        for field in ("reviews", "correct_reviews", "new_cards", "time_spent"):
+            setattr(response, field, getattr(totals, field))
+    return response
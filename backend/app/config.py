@@ -12,16 +12,97 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
-    # OpenAI
+    # LLM
+    LLM_PROVIDER: str = "openai"  # "openai" or "mock"
+    LLM_MODEL: str = "gpt-3.5-turbo"
     OPENAI_API_KEY: str = ""
+    OPENAI_BASE_URL: str = ""  # Any OpenAI-compatible server, e.g. benchmarks/mock_llm_server.py
+    LLM_REQUEST_TIMEOUT: float = 60.0  # Seconds
+    LLM_MAX_RETRIES: int = 2  # Retries of rate-limited, timed out or failed requests
+    LLM_RETRY_BASE_DELAY: float = 0.5  # Seconds, doubled per retry, with jitter
+    LLM_RETRY_MAX_DELAY: float = 8.0  # Seconds
+    LLM_HEDGE_ENABLED: bool = False  # Duplicate requests that run slower than usual
+    LLM_HEDGE_PERCENTILE: float = 95.0  # Latency percentile after which to hedge
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Recent requests needed before hedging
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures that make calls fail fast, 0 to disable
+    LLM_CIRCUIT_RESET_TIMEOUT: float = 30.0  # Seconds to fail fast before trying the provider again
+    LLM_MAX_CONNECTIONS: int = 20  # Pooled HTTP connections to the provider
+    LLM_MAX_CONCURRENCY: int = 8  # LLM requests in flight per process
+    LLM_REQUESTS_PER_MINUTE: int = 500  # 0 to disable
+    LLM_TOKENS_PER_MINUTE: int = 90000  # 0 to disable
+    LLM_REPAIR_ATTEMPTS: int = 1  # Times to ask again for missing or invalid items
+    
+    # Mock LLM Provider
+    MOCK_LLM_LATENCY_MS: float = 200.0  # Median latency
+    MOCK_LLM_LATENCY_SIGMA: float = 0.5  # Log-normal spread; higher means a longer tail
+    MOCK_LLM_ERROR_RATE: float = 0.0  # Fraction of calls that fail
+    MOCK_LLM_SEED: int = 0
+    
+    # Summarization
+    SUMMARY_CHUNK_TOKENS: int = 3000  # Prompt tokens per chunk in map-reduce summaries
+    SUMMARY_CHUNK_SUMMARY_TOKENS: int = 300  # Completion tokens per chunk summary
+    SUMMARY_CONCURRENCY: int = 4  # Chunk summaries generated at once
+    
+    # Flashcard Generation
+    FLASHCARD_BATCH_SIZE: int = 10  # Knowledge points per prompt
+    FLASHCARD_BATCH_MAX_TOKENS: int = 4000  # Completion tokens per batch prompt
+    MAX_FLASHCARD_BATCH_POINTS: int = 500  # Knowledge points per generation request
+    
+    # Flashcard Review
+    NEW_CARDS_PER_DAY: int = 20  # New cards introduced per user per day
+    REVIEW_LEARN_AHEAD_MINUTES: int = 20  # Relearning cards due this soon join a review session
+    SCHEDULING_ALGORITHM: str = "sm2"  # "sm2" or "fsrs", for users who haven't chosen
+    FSRS_DESIRED_RETENTION: float = 0.9  # Recall probability at which FSRS cards come due
+    REVIEW_MAXIMUM_INTERVAL: int = 36500  # Days between reviews, for either algorithm
+    RESCHEDULE_BATCH_SIZE: int = 10000  # Cards replayed and written back at once
+    
+    # Retrieval
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    EMBEDDING_BATCH_SIZE: int = 100  # Texts per embedding request
+    VECTOR_INDEX_DIR: str = "./vector_index"  # Per-user index snapshots
+    VECTOR_INDEX_MAX_USERS: int = 100  # Indexes kept in memory
+    RETRIEVAL_CHUNK_TOKENS: int = 300  # Tokens per indexed document passage
+    RETRIEVAL_TOP_K: int = 5  # Passages added to an explanation
+    RETRIEVAL_CONTEXT_TOKENS: int = 1200  # Token budget for those passages
+    
+    # LLM Response Cache
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_SHARED_ENABLED: bool = True  # Share cached responses through Redis
+    LLM_CACHE_MAX_ENTRIES: int = 1000  # In-process entries
+    LLM_CACHE_TTL_DEFAULT: int = 86400  # 1 day
+    LLM_CACHE_TTL_SUMMARY: int = 604800  # 7 days
+    LLM_CACHE_TTL_KNOWLEDGE_POINTS: int = 604800  # 7 days
+    LLM_CACHE_TTL_FLASHCARDS: int = 86400  # 1 day
+    LLM_CACHE_TTL_EXPLANATION: int = 86400  # 1 day
+    LLM_CACHE_TTL_EXERCISES: int = 86400  # 1 day
+    LLM_SINGLE_FLIGHT_SHARED: bool = False  # Coalesce identical requests across workers through Redis
+    LLM_SINGLE_FLIGHT_LOCK_TTL: int = 60  # Seconds
+    LLM_SINGLE_FLIGHT_POLL_INTERVAL: float = 0.2  # Seconds
+    
+    # LLM Usage Accounting
+    LLM_PROMPT_PRICE_PER_1K: float = 0.0015  # USD per 1000 prompt tokens
+    LLM_COMPLETION_PRICE_PER_1K: float = 0.002  # USD per 1000 completion tokens
+    LLM_USAGE_FLUSH_INTERVAL: int = 30  # Seconds between writes of usage to the database
+    LLM_DAILY_TOKEN_BUDGET: int = 0  # Tokens per user per day, 0 for unlimited
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     
     # File Upload
     MAX_FILE_SIZE: int = 50000000  # 50MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB
     UPLOAD_DIR: str = "./uploads"
     ALLOWED_FILE_TYPES: List[str] = [".pdf", ".ppt", ".pptx", ".doc", ".docx", ".txt"]
+    MAX_BATCH_UPLOAD_FILES: int = 50
+    BATCH_UPLOAD_CONCURRENCY: int = 4  # Files streamed to storage at once
+    
+    # Document Processing
+    DOCUMENT_PROCESSING_WORKERS: int = 2  # Worker processes for text extraction
+    PDF_PAGES_PER_SHARD: int = 50  # Pages per parallel PDF extraction task, 0 to disable
+    DOCUMENT_PROCESSING_STALE_SECONDS: int = 3600  # PROCESSING documents older than this are resumed on startup
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_DIR: str = "./extraction_cache"
+    EXTRACTION_CACHE_MAX_BYTES: int = 1000000000  # 1GB
     
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:3001"]
@@ -6,6 +6,7 @@ from jose import JWTError, jwt
 from app.database import get_db
 from app.models.user import User
 from app.config import settings
+from app.services.telemetry import llm_telemetry
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token")
 
@@ -36,4 +37,18 @@ async def get_current_user(
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def require_llm_budget(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> User:
+    """The current user, if they have LLM tokens left in today's budget"""
+    if settings.LLM_DAILY_TOKEN_BUDGET and (
+        llm_telemetry.tokens_used_today(db, current_user.id) >= settings.LLM_DAILY_TOKEN_BUDGET
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Daily LLM token budget exceeded"
+        )
+    return current_user
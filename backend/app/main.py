@@ -1,16 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.staticfiles import StaticFiles
+import math
 import os
 
 from app.config import settings
-from app.database import engine
+from app.database import SessionLocal, engine
 from app.models import Base
 from app.api.v1 import auth, documents, knowledge_points, flashcards, exercises, users
+from app.services.document_processor import document_processor
+from app.services.document_service import DocumentService
+from app.services.llm_errors import LLMError
+from app.services.llm_providers import close_provider
+from app.services.telemetry import llm_telemetry
+from app.utils.schema import add_missing_columns
 
-# Create database tables
+# Create database tables, and add what older versions of existing tables lack
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, Base.metadata)
 
 app = FastAPI(
     title="Study With LLM API",
@@ -48,6 +57,51 @@ app.include_router(knowledge_points.router, prefix="/api/v1/knowledge-points", t
 app.include_router(flashcards.router, prefix="/api/v1/flashcards", tags=["flashcards"])
 app.include_router(exercises.router, prefix="/api/v1/exercises", tags=["exercises"])
 
+@app.exception_handler(LLMError)
+async def llm_error_handler(request: Request, exc: LLMError):
+    # Temporary failures are 503 so clients know to come back later
+    print(f"Error calling LLM for {request.url.path}: {exc}")
+    headers = {}
+    if exc.retry_after is not None:
+        headers["Retry-After"] = str(math.ceil(exc.retry_after))
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE if exc.retryable else status.HTTP_502_BAD_GATEWAY,
+        content={"detail": "Generation is temporarily unavailable" if exc.retryable else "Generation failed"},
+        headers=headers
+    )
+
+@app.on_event("startup")
+def migrate_legacy_documents():
+    """Move document text stored by older versions into document pages"""
+    db = SessionLocal()
+    try:
+        migrated = DocumentService.migrate_legacy_content(db)
+        if migrated:
+            print(f"Moved the text of {migrated} documents into document pages")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def start_document_processor():
+    document_processor.start()
+    document_processor.resume()
+
+@app.on_event("shutdown")
+async def stop_document_processor():
+    await document_processor.shutdown()
+
+@app.on_event("shutdown")
+async def close_llm_provider():
+    await close_provider()
+
+@app.on_event("startup")
+async def start_llm_telemetry():
+    llm_telemetry.start()
+
+@app.on_event("shutdown")
+async def stop_llm_telemetry():
+    await llm_telemetry.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "Study With LLM API", "version": "1.0.0"}
@@ -56,6 +110,10 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return llm_telemetry.render_metrics()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,8 +1,13 @@
 from app.database import Base
 from .user import User
-from .document import Document
+from .document import Document, DocumentBlob, DocumentPage
 from .knowledge_point import KnowledgePoint
 from .flashcard import Flashcard
 from .exercise import Exercise
+from .chunk_summary import ChunkSummary
+from .llm_usage import LLMUsage
+from .review_log import ReviewLog
+from .review_stats import ReviewStats, DailyReviewStats
+from .due_forecast import DueForecast
 
-__all__ = ["Base", "User", "Document", "KnowledgePoint", "Flashcard", "Exercise"]
\ No newline at end of file
+__all__ = ["Base", "User", "Document", "DocumentBlob", "DocumentPage", "KnowledgePoint", "Flashcard", "Exercise", "ChunkSummary", "LLMUsage", "ReviewLog", "ReviewStats", "DailyReviewStats", "DueForecast"]
\ No newline at end of file
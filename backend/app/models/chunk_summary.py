@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ChunkSummary(Base):
+    """Summary of one chunk of document text, reused across re-summaries.
+
+    Keyed by a hash of the chunk text together with the model and prompt
+    version, so an edited document only needs new summaries for the chunks
+    whose text changed, and identical chunks in other documents are shared.
+    """
+    __tablename__ = "chunk_summaries"
+
+    chunk_key = Column(String(64), primary_key=True)
+    summary = Column(Text, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, LargeBinary, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
+import zlib
 from app.database import Base
 
 class DocumentType(str, enum.Enum):
@@ -20,26 +21,30 @@ class ProcessingStatus(str, enum.Enum):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Keyset pagination of a user's documents, newest first
+        Index("ix_documents_owner_id_created_at_id", "owner_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer)
+    content_hash = Column(String(64), index=True)  # SHA-256 of the file content
     document_type = Column(Enum(DocumentType), nullable=False)
     
     # Processing status
     processing_status = Column(Enum(ProcessingStatus), default=ProcessingStatus.PENDING)
     processing_error = Column(Text)
     
-    # Content
-    raw_content = Column(Text)  # Extracted text content
-    processed_content = Column(Text)  # Processed/cleaned content
+    # Content (extracted text lives in document_pages)
     summary = Column(Text)
     
     # Metadata
     language = Column(String)
     page_count = Column(Integer)
+    page_offsets = Column(Text)  # JSON array of each page's start offset in the extracted text
     
     # Foreign keys
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -51,4 +56,67 @@ class Document(Base):
     
     # Relationships
     owner = relationship("User", back_populates="documents")
-    knowledge_points = relationship("KnowledgePoint", back_populates="document")
\ No newline at end of file
+    knowledge_points = relationship("KnowledgePoint", back_populates="document")
+    pages = relationship(
+        "DocumentPage",
+        back_populates="document",
+        order_by="DocumentPage.page_number",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+class DocumentPage(Base):
+    """Compressed extracted text of one page or slide of a document.
+
+    Kept out of the documents table so that listing and ownership queries
+    never load document bodies. Formats without pages are stored in pages
+    of consecutive paragraphs.
+    """
+    __tablename__ = "document_pages"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    page_number = Column(Integer, primary_key=True)  # 1-based
+    
+    # zlib-compressed UTF-8 text
+    raw_data = Column(LargeBinary)  # Extracted text content
+    processed_data = Column(LargeBinary)  # Processed/cleaned content
+    
+    # Relationships
+    document = relationship("Document", back_populates="pages")
+
+    @staticmethod
+    def _compress(text):
+        return zlib.compress(text.encode("utf-8")) if text is not None else None
+
+    @staticmethod
+    def _decompress(data):
+        return zlib.decompress(data).decode("utf-8") if data is not None else None
+
+    @property
+    def raw_content(self):
+        return self._decompress(self.raw_data)
+
+    @raw_content.setter
+    def raw_content(self, text):
+        self.raw_data = self._compress(text)
+
+    @property
+    def processed_content(self):
+        return self._decompress(self.processed_data)
+
+    @processed_content.setter
+    def processed_content(self, text):
+        self.processed_data = self._compress(text)
+
+class DocumentBlob(Base):
+    """A stored upload, shared by every document with the same content"""
+    __tablename__ = "document_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True, nullable=False)  # SHA-256
+    file_path = Column(String, nullable=False)
+    file_size = Column(Integer)
+    ref_count = Column(Integer, default=0, nullable=False)  # Documents using this blob
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
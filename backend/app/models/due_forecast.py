@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, UniqueConstraint
+from app.database import Base
+
+class DueForecast(Base):
+    """How many of a user's flashcards are due on each day (UTC).
+
+    Kept up to date as cards are created, reviewed, rescheduled and
+    deleted. Overdue cards stay counted on the day they fell due.
+    """
+    __tablename__ = "due_forecast"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", name="uq_due_forecast_user_id_day"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    cards = Column(Integer, default=0, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Float, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -19,6 +19,10 @@ class DifficultyLevel(str, enum.Enum):
 
 class Exercise(Base):
     __tablename__ = "exercises"
+    __table_args__ = (
+        # Keyset pagination of a user's exercises, newest first
+        Index("ix_exercises_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Float, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -18,6 +18,13 @@ class ReviewStatus(str, enum.Enum):
 
 class Flashcard(Base):
     __tablename__ = "flashcards"
+    __table_args__ = (
+        # Keyset pagination of a user's flashcards, newest first
+        Index("ix_flashcards_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Due cards of a user, and each review session queue in due order
+        Index("ix_flashcards_user_id_due_date", "user_id", "due_date"),
+        Index("ix_flashcards_user_id_review_status_due_date", "user_id", "review_status", "due_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     front = Column(Text, nullable=False)  # Question/Prompt
@@ -32,6 +39,8 @@ class Flashcard(Base):
     interval = Column(Integer, default=1)  # Days until next review
     repetitions = Column(Integer, default=0)
     review_status = Column(Enum(ReviewStatus), default=ReviewStatus.NEW)
+    stability = Column(Float)  # FSRS memory stability in days
+    difficulty = Column(Float)  # FSRS difficulty, 1-10
     
     # Review statistics
     total_reviews = Column(Integer, default=0)
@@ -41,6 +50,7 @@ class Flashcard(Base):
     # Scheduling
     due_date = Column(DateTime(timezone=True))
     last_reviewed = Column(DateTime(timezone=True))
+    first_reviewed = Column(DateTime(timezone=True))  # When the card stopped being new
     
     # Metadata
     tags = Column(Text)  # JSON array of tags
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, ForeignKey, Index, UniqueConstraint, text
+from sqlalchemy.sql import func
+from app.database import Base
+
+class LLMUsage(Base):
+    """Daily LLM usage per user, method and model.
+
+    Rows are incremented from aggregated telemetry rather than written per
+    call. ``user_id`` is NULL for calls not made on behalf of a user; as
+    the unique constraint treats NULLs as distinct, those rows get a
+    partial unique index of their own.
+    """
+    __tablename__ = "llm_usage"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "method", "model", name="uq_llm_usage_user_id_day_method_model"),
+        Index(
+            "uq_llm_usage_day_method_model_system",
+            "day", "method", "model",
+            unique=True,
+            postgresql_where=text("user_id IS NULL"),
+            sqlite_where=text("user_id IS NULL")
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    day = Column(Date, nullable=False, index=True)
+    method = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    
+    # Counters
+    calls = Column(Integer, default=0, nullable=False)
+    cache_hits = Column(Integer, default=0, nullable=False)
+    errors = Column(Integer, default=0, nullable=False)
+    retries = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    latency_ms = Column(Float, default=0.0, nullable=False)  # Sum over calls
+    cost = Column(Float, default=0.0, nullable=False)  # USD
+    
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
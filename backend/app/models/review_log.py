@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, ForeignKey, UniqueConstraint
+from app.database import Base
+
+class ReviewLog(Base):
+    """One flashcard review, appended and never updated.
+
+    Rows are kept small as every review adds one. ``review_id`` is chosen
+    by clients that sync reviews in batches, so a sync that is retried
+    after a lost response applies each review only once; reviews made
+    through the API one at a time have none.
+    """
+    __tablename__ = "review_logs"
+    __table_args__ = (
+        UniqueConstraint("user_id", "review_id", name="uq_review_logs_user_id_review_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    review_id = Column(String(64))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"), nullable=False, index=True)
+    reviewed_at = Column(DateTime(timezone=True), nullable=False)
+    score = Column(SmallInteger, nullable=False)  # 1-5 scale
+    time_spent = Column(Integer)  # Seconds
+    previous_interval = Column(Integer)  # Days, before the review
+    interval = Column(Integer)  # Days, after the review
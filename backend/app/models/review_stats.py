@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ReviewStats(Base):
+    """Review totals of a user, incremented as reviews are logged"""
+    __tablename__ = "review_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    
+    # Counters
+    reviews = Column(Integer, default=0, nullable=False)
+    correct_reviews = Column(Integer, default=0, nullable=False)
+    new_cards = Column(Integer, default=0, nullable=False)  # First reviews of new cards
+    time_spent = Column(Integer, default=0, nullable=False)  # Seconds
+    
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class DailyReviewStats(Base):
+    """Review totals of a user per day (UTC), incremented as reviews are logged"""
+    __tablename__ = "review_stats_daily"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", name="uq_review_stats_daily_user_id_day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    
+    # Counters
+    reviews = Column(Integer, default=0, nullable=False)
+    correct_reviews = Column(Integer, default=0, nullable=False)
+    new_cards = Column(Integer, default=0, nullable=False)
+    time_spent = Column(Integer, default=0, nullable=False)  # Seconds
+    
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
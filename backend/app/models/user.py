@@ -17,6 +17,8 @@ class User(Base):
     # Learning preferences
     learning_style = Column(Text)  # JSON string for learning preferences
     preferred_language = Column(String, default="zh-CN")
+    scheduling_algorithm = Column(String)  # "sm2" or "fsrs", None for SCHEDULING_ALGORITHM
+    due_forecast_built = Column(Boolean, default=False)  # Whether due_forecast counts all of the user's cards
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -32,6 +32,26 @@ class DocumentResponse(DocumentBase):
 
 class DocumentList(BaseModel):
     documents: List[DocumentResponse]
-    total: int
-    page: int
-    size: int
\ No newline at end of file
+    total: Optional[int] = None  # Only counted on request, for the first page
+    page: Optional[int] = None
+    size: int
+    next_cursor: Optional[str] = None
+
+class DocumentPageContent(BaseModel):
+    page_number: int
+    content: Optional[str] = None
+
+class DocumentContent(BaseModel):
+    document_id: int
+    page_count: Optional[int] = None
+    pages: List[DocumentPageContent]
+
+class BatchUploadResult(BaseModel):
+    filename: str
+    document: Optional[DocumentResponse] = None
+    error: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    results: List[BatchUploadResult]
+    uploaded: int
+    failed: int
\ No newline at end of file
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
+import json
 from app.models.flashcard import FlashcardType, ReviewStatus
 
 class FlashcardBase(BaseModel):
@@ -25,6 +26,8 @@ class FlashcardResponse(FlashcardBase):
     interval: int
     repetitions: int
     review_status: ReviewStatus
+    stability: Optional[float] = None
+    difficulty: Optional[float] = None
     total_reviews: int
     correct_reviews: int
     due_date: Optional[datetime] = None
@@ -34,9 +37,55 @@ class FlashcardResponse(FlashcardBase):
     knowledge_point_id: Optional[int] = None
     created_at: datetime
     
+    @field_validator("tags", mode="before")
+    @classmethod
+    def parse_tags(cls, value):
+        # Stored as a JSON array in a Text column
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return json.loads(value) if value else []
+        return value
+    
     class Config:
         from_attributes = True
 
 class FlashcardReview(BaseModel):
     score: int  # 1-5 scale
-    time_spent: Optional[int] = None  # seconds
\ No newline at end of file
+    time_spent: Optional[int] = None  # seconds
+
+class FlashcardBatchReviewItem(BaseModel):
+    review_id: str = Field(..., min_length=1, max_length=64)  # Client-generated, unique per review
+    flashcard_id: int
+    score: int = Field(..., ge=1, le=5)
+    reviewed_at: datetime
+    time_spent: Optional[int] = None  # seconds
+
+class FlashcardBatchReview(BaseModel):
+    reviews: List[FlashcardBatchReviewItem] = Field(..., min_length=1, max_length=1000)
+
+class FlashcardBatchGenerate(BaseModel):
+    knowledge_point_ids: List[int] = Field(..., min_length=1)
+    cards_per_point: int = Field(3, ge=1, le=10)
+    bypass_cache: bool = False
+
+class FlashcardBatchResponse(BaseModel):
+    flashcards: List[FlashcardResponse]
+    failed_knowledge_point_ids: List[int] = []
+
+class ReviewSessionResponse(BaseModel):
+    flashcards: List[FlashcardResponse]
+    new_cards_remaining: int  # New cards still allowed today after this session
+
+class FlashcardBatchReviewResponse(BaseModel):
+    flashcards: List[FlashcardResponse]  # Cards changed by this request
+    applied_review_ids: List[str]
+    duplicate_review_ids: List[str] = []  # Already submitted, not applied again
+
+class DueForecastDay(BaseModel):
+    day: date
+    cards: int
+
+class DueForecastResponse(BaseModel):
+    overdue: int  # Due before today and not yet reviewed
+    days: List[DueForecastDay]  # Starting today
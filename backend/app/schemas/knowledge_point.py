@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional, List
 from datetime import datetime
+import json
 
 class KnowledgePointBase(BaseModel):
     title: str
@@ -33,5 +34,15 @@ class KnowledgePointResponse(KnowledgePointBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     
+    @field_validator("tags", mode="before")
+    @classmethod
+    def parse_tags(cls, value):
+        # Stored as a JSON array in a Text column
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return json.loads(value) if value else []
+        return value
+    
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,32 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+# Items the LLM is asked to return as JSON arrays. Surrounding whitespace is
+# stripped and required text must not be empty.
+
+class KnowledgePointItem(BaseModel):
+    title: str = Field(..., min_length=1)
+    description: Optional[str] = ""
+    category: Optional[str] = ""
+
+    class Config:
+        str_strip_whitespace = True
+
+class FlashcardItem(BaseModel):
+    front: str = Field(..., min_length=1)
+    back: str = Field(..., min_length=1)
+
+    class Config:
+        str_strip_whitespace = True
+
+class BatchFlashcardItem(FlashcardItem):
+    knowledge_point_id: int
+
+class ExerciseItem(BaseModel):
+    question: str = Field(..., min_length=1)
+    options: List[str] = []
+    correct_answer: str = Field(..., min_length=1)
+    explanation: Optional[str] = ""
+
+    class Config:
+        str_strip_whitespace = True
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
-from datetime import datetime
+from typing import List, Literal, Optional
+from datetime import date, datetime
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -19,12 +19,54 @@ class UserUpdate(BaseModel):
 class UserResponse(UserBase):
     id: int
     is_active: bool
+    scheduling_algorithm: Optional[str] = None
     created_at: datetime
     last_login: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
+class SchedulingAlgorithmUpdate(BaseModel):
+    scheduling_algorithm: Literal["sm2", "fsrs"]
+
+class RescheduleResponse(BaseModel):
+    scheduling_algorithm: str
+    rescheduled: int  # Cards replayed from their review history
+    skipped: int  # Cards without a complete history, kept as they were
+
+class LLMUsageResponse(BaseModel):
+    day: date
+    method: str
+    model: str
+    calls: int
+    cache_hits: int
+    errors: int
+    retries: int
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: float
+    cost: float
+    
+    class Config:
+        from_attributes = True
+
+class DailyReviewStatsResponse(BaseModel):
+    day: date
+    reviews: int
+    correct_reviews: int
+    new_cards: int
+    time_spent: int  # Seconds
+    
+    class Config:
+        from_attributes = True
+
+class ReviewStatsResponse(BaseModel):
+    reviews: int = 0
+    correct_reviews: int = 0
+    new_cards: int = 0
+    time_spent: int = 0  # Seconds
+    days: List[DailyReviewStatsResponse] = []  # Days with reviews, newest first
+
 class Token(BaseModel):
     access_token: str
     token_type: str
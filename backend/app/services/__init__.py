@@ -3,11 +3,38 @@ from .document_service import DocumentService
 from .llm_service import LLMService
 from .translation_service import TranslationService
 from .flashcard_service import FlashcardService
+from .storage_service import StorageService
+from .document_processor import DocumentProcessor
+from .llm_cache import LLMCache
+from .single_flight import SingleFlight
+from .llm_providers import LLMProvider, OpenAIProvider, MockProvider
+from .vector_index import VectorIndex, VectorStore
+from .llm_errors import LLMError
+from .resilience import ResilientCaller
+from .scheduler import Scheduler, SM2Scheduler, FSRSScheduler
+from .review_service import ReviewService
+from .forecast_service import ForecastService
 
 __all__ = [
     "AuthService",
     "DocumentService", 
     "LLMService",
     "TranslationService",
-    "FlashcardService"
+    "FlashcardService",
+    "StorageService",
+    "DocumentProcessor",
+    "LLMCache",
+    "SingleFlight",
+    "LLMProvider",
+    "OpenAIProvider",
+    "MockProvider",
+    "VectorIndex",
+    "VectorStore",
+    "LLMError",
+    "ResilientCaller",
+    "Scheduler",
+    "SM2Scheduler",
+    "FSRSScheduler",
+    "ReviewService",
+    "ForecastService"
 ]
\ No newline at end of file
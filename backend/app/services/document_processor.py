@@ -0,0 +1,212 @@
+from typing import Callable, Dict, List, Optional, Set
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import asyncio
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.document import Document, ProcessingStatus
+from app.services.document_service import DocumentService
+from app.services.vector_index import vector_store
+from app.config import settings
+
+class DocumentProcessor:
+    """Background document processing on a pool of worker processes.
+
+    Jobs are queued on the API event loop, while the PyPDF2/python-pptx/
+    python-docx extraction runs in child processes so that large files never
+    block request handling. PDFs longer than ``pdf_pages_per_shard`` pages
+    are split into page ranges that are extracted in parallel. At most
+    ``max_workers`` jobs are extracting at once, which keeps PROCESSING
+    meaning "a worker is on it" rather than "queued".
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        pdf_pages_per_shard: Optional[int] = None
+    ):
+        self.max_workers = max_workers or settings.DOCUMENT_PROCESSING_WORKERS
+        self.pdf_pages_per_shard = (
+            settings.PDF_PAGES_PER_SHARD if pdf_pages_per_shard is None else pdf_pages_per_shard
+        )
+        self.session_factory = session_factory
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+    async def shutdown(self):
+        """Drop queued jobs and stop the worker processes"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._semaphore = None
+
+    def resume(self) -> List[int]:
+        """Re-enqueue documents left unprocessed by an earlier run.
+
+        Picks up PENDING documents (never started, or put back on shutdown)
+        and PROCESSING documents untouched for longer than
+        ``DOCUMENT_PROCESSING_STALE_SECONDS`` (their process died). Each one is
+        claimed with a conditional update so that when several API workers
+        start together only one of them resumes it.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.DOCUMENT_PROCESSING_STALE_SECONDS)
+        unfinished = or_(
+            Document.processing_status == ProcessingStatus.PENDING,
+            and_(
+                Document.processing_status == ProcessingStatus.PROCESSING,
+                func.coalesce(Document.updated_at, Document.created_at) < cutoff
+            )
+        )
+
+        db = self.session_factory()
+        try:
+            document_ids = [
+                document_id
+                for document_id, in db.query(Document.id).filter(unfinished).order_by(Document.id)
+            ]
+            claimed = []
+            for document_id in document_ids:
+                updated = db.query(Document).filter(Document.id == document_id, unfinished).update(
+                    {Document.processing_status: ProcessingStatus.PROCESSING},
+                    synchronize_session=False
+                )
+                db.commit()
+                if updated:
+                    claimed.append(document_id)
+        finally:
+            db.close()
+
+        for document_id in claimed:
+            self.enqueue(document_id)
+        return claimed
+
+    def enqueue(self, document_id: int) -> asyncio.Task:
+        """Queue a document for processing; must be called from the event loop"""
+        self.start()
+        task = asyncio.create_task(self.process(document_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def process(self, document_id: int) -> bool:
+        """Move a document through PROCESSING to COMPLETED or FAILED, then index it"""
+        self.start()
+        async with self._semaphore:
+            owner_id = await self._process(document_id)
+        if owner_id is None:
+            return False
+        # Embedding waits on the network, so it doesn't hold an extraction slot
+        await vector_store.index_document(owner_id, document_id)
+        return True
+
+    async def _process(self, document_id: int) -> Optional[int]:
+        """Extract and store a document; returns its owner if it was completed"""
+        db = self.session_factory()
+        try:
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if document is None:
+                return None
+
+            document.processing_status = ProcessingStatus.PROCESSING
+            db.commit()
+
+            try:
+                extraction = await self.extract(
+                    document.file_path,
+                    document.document_type.value,
+                    document.content_hash
+                )
+            except asyncio.CancelledError:
+                # Shutting down: leave the document to be picked up again
+                document.processing_status = ProcessingStatus.PENDING
+                db.commit()
+                raise
+            except Exception as e:
+                print(f"Error processing document {document_id}: {e}")
+                DocumentService.mark_failed(document, str(e))
+                db.commit()
+                return None
+
+            # Writing the pages is blocking database work, so it runs in a
+            # thread, and it is allowed to finish when shutting down
+            stored = asyncio.get_running_loop().run_in_executor(
+                None, self._store, db, document, extraction
+            )
+            try:
+                success = await asyncio.shield(stored)
+            except asyncio.CancelledError:
+                await stored
+                raise
+            # Read before the session closes
+            return document.owner_id if success else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _store(db: Session, document: Document, extraction: Dict) -> bool:
+        """Write a document's pages and final status"""
+        try:
+            success = DocumentService.apply_extraction(db, document, extraction)
+        except Exception as e:
+            print(f"Error storing document {document.id}: {e}")
+            DocumentService.mark_failed(document, str(e))
+            success = False
+        db.commit()
+        return success
+
+    async def extract(self, file_path: str, document_type: str, content_hash: Optional[str] = None) -> Dict:
+        """Run extraction on the pool, sharding large PDFs by page range.
+
+        Each shard writes its pages to its own file; the files are joined in
+        a thread. Cached extractions are returned without touching the file.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+
+        if content_hash:
+            cached = await loop.run_in_executor(
+                None, DocumentService.get_cached_extraction, content_hash, document_type
+            )
+            if cached is not None:
+                return cached
+
+        if document_type == 'pdf' and self.pdf_pages_per_shard > 0:
+            page_count = await loop.run_in_executor(
+                self._executor, DocumentService.count_pages, file_path, document_type
+            )
+            if page_count > self.pdf_pages_per_shard:
+                parts = await asyncio.gather(*[
+                    loop.run_in_executor(
+                        self._executor, DocumentService.extract_pdf_pages, file_path, start, end
+                    )
+                    for start, end in DocumentService.pdf_page_ranges(page_count, self.pdf_pages_per_shard)
+                ], return_exceptions=True)
+                errors = [part for part in parts if isinstance(part, BaseException)]
+                if errors:
+                    for part in parts:
+                        if not isinstance(part, BaseException):
+                            DocumentService.remove_file(part["path"])
+                    raise errors[0]
+                return await loop.run_in_executor(
+                    None, DocumentService.finish_extraction, parts, document_type, content_hash
+                )
+
+        return await loop.run_in_executor(
+            self._executor, DocumentService.extract_content, file_path, document_type, content_hash
+        )
+
+document_processor = DocumentProcessor()
@@ -1,93 +1,617 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, Iterable, Iterator, Callable
+from datetime import datetime
+import gzip
+import json
 import os
+import re
+import shutil
+import tempfile
 from pathlib import Path
 import PyPDF2
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 from pptx import Presentation
 from docx import Document as DocxDocument
 
-from app.models.document import Document, ProcessingStatus
+from app.models.document import Document, DocumentPage, ProcessingStatus
+from app.services.extraction_cache import extraction_cache
+from app.utils.helpers import file_sha256
 from app.config import settings
 
+# Unicode script ranges used for language detection, mapped to language codes
+SCRIPT_PATTERNS = {
+    "zh": re.compile(r"[\u4e00-\u9fff]"),
+    "ja": re.compile(r"[\u3040-\u30ff]"),
+    "ko": re.compile(r"[\uac00-\ud7af]"),
+    "ru": re.compile(r"[\u0400-\u04ff]"),
+    "ar": re.compile(r"[\u0600-\u06ff]"),
+    "en": re.compile(r"[A-Za-z]"),
+}
+
+# Extractor used for each document type, and the version of its output.
+# Bump a version whenever an extractor changes what it produces; this
+# invalidates the cached extractions of that format only.
+EXTRACTOR_FORMATS = {
+    "pdf": "pdf",
+    "ppt": "pptx",
+    "pptx": "pptx",
+    "doc": "docx",
+    "docx": "docx",
+    "txt": "txt",
+}
+EXTRACTOR_VERSIONS = {
+    "pdf": 1,
+    "pptx": 1,
+    "docx": 1,
+    "txt": 1,
+}
+
+# Record types that correspond to physical pages of the source file
+PAGED_RECORD_TYPES = ("page", "slide")
+
+# Formats without pages are stored in pages of consecutive paragraphs of up
+# to this many characters, so that no page holds the whole document
+UNPAGED_PAGE_SIZE = 20000
+
 class DocumentService:
     @staticmethod
-    def extract_text_from_file(file_path: str, document_type: str) -> Optional[str]:
-        """Extract text content from uploaded file"""
-        try:
-            if document_type == 'pdf':
-                return DocumentService._extract_from_pdf(file_path)
-            elif document_type in ['ppt', 'pptx']:
-                return DocumentService._extract_from_pptx(file_path)
-            elif document_type in ['doc', 'docx']:
-                return DocumentService._extract_from_docx(file_path)
-            elif document_type == 'txt':
-                return DocumentService._extract_from_txt(file_path)
-            else:
-                return None
-        except Exception as e:
-            print(f"Error extracting text from {file_path}: {e}")
-            return None
+    def extract_text_from_file(
+        file_path: str,
+        document_type: str,
+        content_hash: Optional[str] = None
+    ) -> Optional[str]:
+        """Extract text content from uploaded file, using the extraction cache"""
+        raw_content = DocumentService.read_extraction(
+            DocumentService.extract_content(file_path, document_type, content_hash)
+        )
+        return raw_content.strip() if raw_content else None
+    
+    @staticmethod
+    def iter_records(file_path: str, document_type: str) -> Iterator[Dict]:
+        """Stream the text of a file as records with location metadata.
+        
+        Each record is ``{"type": ..., "number": ..., "text": ...}`` where the
+        type is ``page`` (PDF), ``slide`` (PowerPoint) or ``paragraph`` (Word
+        and plain text) and the number is 1-based. Only one record is held
+        in memory at a time (python-docx still parses the whole file).
+        """
+        if document_type == 'pdf':
+            return DocumentService._iter_pdf_pages(file_path)
+        elif document_type in ['ppt', 'pptx']:
+            return DocumentService._iter_pptx_slides(file_path)
+        elif document_type in ['doc', 'docx']:
+            return DocumentService._iter_docx_paragraphs(file_path)
+        elif document_type == 'txt':
+            return DocumentService._iter_txt_paragraphs(file_path)
+        return iter(())
     
     @staticmethod
-    def _extract_from_pdf(file_path: str) -> str:
-        text = ""
+    def _iter_pdf_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Dict]:
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text.strip()
+            end = len(pdf_reader.pages) if end is None else min(end, len(pdf_reader.pages))
+            for i in range(start, end):
+                yield {"type": "page", "number": i + 1, "text": pdf_reader.pages[i].extract_text() or ""}
     
     @staticmethod
-    def _extract_from_pptx(file_path: str) -> str:
-        text = ""
+    def _iter_pptx_slides(file_path: str) -> Iterator[Dict]:
         presentation = Presentation(file_path)
-        for slide in presentation.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        return text.strip()
+        for number, slide in enumerate(presentation.slides, start=1):
+            texts = [shape.text for shape in slide.shapes if hasattr(shape, "text")]
+            yield {"type": "slide", "number": number, "text": "\n".join(texts)}
     
     @staticmethod
-    def _extract_from_docx(file_path: str) -> str:
+    def _iter_docx_paragraphs(file_path: str) -> Iterator[Dict]:
         doc = DocxDocument(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text.strip()
+        for number, paragraph in enumerate(doc.paragraphs, start=1):
+            yield {"type": "paragraph", "number": number, "text": paragraph.text}
     
     @staticmethod
-    def _extract_from_txt(file_path: str) -> str:
+    def _iter_txt_paragraphs(file_path: str) -> Iterator[Dict]:
+        """Yield blank-line separated paragraphs, reading the file line by line"""
+        number = 0
+        lines = []
         with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
+            for line in file:
+                if line.strip():
+                    lines.append(line.rstrip('\n'))
+                elif lines:
+                    number += 1
+                    yield {"type": "paragraph", "number": number, "text": "\n".join(lines)}
+                    lines = []
+        if lines:
+            yield {"type": "paragraph", "number": number + 1, "text": "\n".join(lines)}
+    
+    @staticmethod
+    def extract_pdf_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> Dict:
+        """Extract pages [start, end) of a PDF into a file for finish_extraction"""
+        return DocumentService.write_pages(DocumentService._iter_pdf_pages(file_path, start, end))
+    
+    @staticmethod
+    def pdf_page_ranges(page_count: int, pages_per_shard: int) -> List[Tuple[int, int]]:
+        """Split a page count into contiguous [start, end) shards"""
+        return [
+            (start, min(start + pages_per_shard, page_count))
+            for start in range(0, page_count, pages_per_shard)
+        ]
+    
+    @staticmethod
+    def count_pages(file_path: str, document_type: str) -> Optional[int]:
+        """Count pages (PDF) or slides (PowerPoint); other formats have no pages"""
+        if document_type == 'pdf':
+            with open(file_path, 'rb') as file:
+                return len(PyPDF2.PdfReader(file).pages)
+        elif document_type in ['ppt', 'pptx']:
+            return len(Presentation(file_path).slides)
+        return None
+    
+    @staticmethod
+    def clean_records(records: Iterable[Dict]) -> Iterator[Dict]:
+        """Clean each record's text, dropping records that end up empty"""
+        for record in records:
+            text = DocumentService._clean_text(record["text"])
+            if text:
+                yield {**record, "text": text}
+    
+    @staticmethod
+    def detect_language(texts: Iterable[str]) -> Optional[str]:
+        """Guess the dominant language of a stream of texts from its scripts"""
+        counts = {language: 0 for language in SCRIPT_PATTERNS}
+        for text in texts:
+            DocumentService._count_scripts(text, counts)
+        return DocumentService._language_from_counts(counts)
+    
+    @staticmethod
+    def _count_scripts(text: str, counts: Dict[str, int]):
+        for language, pattern in SCRIPT_PATTERNS.items():
+            counts[language] += len(pattern.findall(text))
+    
+    @staticmethod
+    def _language_from_counts(counts: Dict[str, int]) -> Optional[str]:
+        language = max(counts, key=counts.get)
+        if counts[language] == 0:
+            return None
+        # Japanese mixes kana with Han characters
+        if language == "zh" and counts["ja"] >= counts["zh"] * 0.1:
+            return "ja"
+        return language
+    
+    @staticmethod
+    def iter_chunks(
+        records: Iterable[Dict],
+        max_size: int,
+        measure: Callable[[str], int] = len,
+        boundary: Optional[Callable[[Dict], bool]] = None
+    ) -> Iterator[Dict]:
+        """Group a record stream into chunks of at most ``max_size``.
+        
+        ``measure`` gives the size of a piece of text (characters by default).
+        Records larger than a chunk are split on line boundaries, and lines
+        larger than a chunk are split evenly. When ``boundary`` returns True
+        for a record, a new chunk is started before it. Each chunk carries
+        the location of its first and last record.
+        """
+        parts = []
+        size = 0
+        start = end = None
+        for record in records:
+            location = (record["type"], record["number"])
+            if parts and boundary is not None and boundary(record):
+                yield {"text": "\n".join(parts), "start": start, "end": end}
+                parts = []
+                size = 0
+            for line in DocumentService._split_oversized_lines(record["text"], max_size, measure):
+                line_size = measure(line) + 1
+                if parts and size + line_size > max_size:
+                    yield {"text": "\n".join(parts), "start": start, "end": end}
+                    parts = []
+                    size = 0
+                if not parts:
+                    start = location
+                parts.append(line)
+                size += line_size
+                end = location
+        if parts:
+            yield {"text": "\n".join(parts), "start": start, "end": end}
+    
+    @staticmethod
+    def _split_oversized_lines(text: str, max_size: int, measure: Callable[[str], int]) -> Iterator[str]:
+        for line in text.split("\n"):
+            line_size = measure(line) + 1
+            if line_size <= max_size:
+                yield line
+                continue
+            pieces = -(-line_size // max_size) + 1
+            step = -(-len(line) // pieces)
+            for offset in range(0, len(line), step):
+                yield line[offset:offset + step]
+    
+    @staticmethod
+    def extract_content(file_path: str, document_type: str, content_hash: Optional[str] = None) -> Dict:
+        """Extract and clean document content into an extraction file.
+        
+        This is the CPU-bound part of processing and touches no database
+        state, so it can run inside a worker process. Pages are cleaned and
+        written out as they are read, and only the location of the file is
+        returned: ``{"path": ..., "temporary": ...}``, with no path when the
+        file holds no text. Errors reading the file are raised. Results are looked up in and stored to the
+        extraction cache, keyed by ``content_hash`` (computed from the file
+        when not given); otherwise the file is temporary and is removed once
+        stored on the document.
+        """
+        use_cache = settings.EXTRACTION_CACHE_ENABLED and document_type in EXTRACTOR_FORMATS
+        if use_cache:
+            try:
+                content_hash = content_hash or file_sha256(file_path)
+                cached = DocumentService.get_cached_extraction(content_hash, document_type)
+                if cached is not None:
+                    return cached
+            except OSError as e:
+                print(f"Error reading extraction cache for {file_path}: {e}")
+                use_cache = False
+        
+        part = DocumentService.write_pages(DocumentService.iter_records(file_path, document_type))
+        return DocumentService.finish_extraction([part], document_type, content_hash if use_cache else None)
+    
+    @staticmethod
+    def get_cached_extraction(content_hash: str, document_type: str) -> Optional[Dict]:
+        file_format = EXTRACTOR_FORMATS.get(document_type)
+        if not settings.EXTRACTION_CACHE_ENABLED or file_format is None:
+            return None
+        path = extraction_cache.lookup(content_hash, file_format, EXTRACTOR_VERSIONS[file_format])
+        return {"path": path, "temporary": False} if path is not None else None
+    
+    @staticmethod
+    def write_pages(records: Iterable[Dict]) -> Dict:
+        """Clean a record stream (in document order) into a temporary file.
+        
+        Each page or slide is cleaned and written as one JSON line as soon as
+        it is read, so only the current page is held in memory. Paragraphs
+        of formats without pages are grouped into pages of up to
+        ``UNPAGED_PAGE_SIZE`` characters. Returns the path of the file with
+        what is needed to merge it with the files of neighbouring page
+        ranges. Extraction errors are raised, after removing the file.
+        """
+        fd, path = tempfile.mkstemp(prefix="extraction-", suffix=".jsonl.gz")
+        os.close(fd)
+        page_offsets = []
+        position = 0
+        counts = {language: 0 for language in SCRIPT_PATTERNS}
+        has_text = False
+        paragraphs = []
+        paragraphs_size = 0
+        unpaged_number = 0
+        
+        try:
+            with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as output:
+                for record in records:
+                    text = record["text"]
+                    if record["type"] in PAGED_RECORD_TYPES:
+                        page_offsets.append(position)
+                        has_text |= DocumentService._write_page(output, record["number"], text, counts)
+                    else:
+                        if paragraphs and paragraphs_size + len(text) > UNPAGED_PAGE_SIZE:
+                            unpaged_number += 1
+                            has_text |= DocumentService._write_page(
+                                output, unpaged_number, "\n".join(paragraphs), counts
+                            )
+                            paragraphs = []
+                            paragraphs_size = 0
+                        paragraphs.append(text)
+                        paragraphs_size += len(text) + 1
+                    position += len(text) + 1
+                if paragraphs:
+                    has_text |= DocumentService._write_page(
+                        output, unpaged_number + 1, "\n".join(paragraphs), counts
+                    )
+        except BaseException:
+            DocumentService.remove_file(path)
+            raise
+        
+        return {
+            "path": path,
+            "page_offsets": page_offsets,
+            "length": position,
+            "counts": counts,
+            "has_text": has_text
+        }
+    
+    @staticmethod
+    def _write_page(output, number: int, raw_text: str, counts: Dict[str, int]) -> bool:
+        text = DocumentService._clean_text(raw_text)
+        DocumentService._count_scripts(text, counts)
+        output.write(json.dumps({"page": number, "raw": raw_text, "processed": text}) + "\n")
+        return bool(text)
     
     @staticmethod
-    def process_document(document: Document) -> bool:
+    def finish_extraction(parts: List[Dict], document_type: str, content_hash: Optional[str] = None) -> Dict:
+        """Join the files of consecutive page ranges into one extraction file.
+        
+        The files are gzip streams, so they are concatenated as bytes, and a
+        final summary line (page count, page offsets and language) is
+        appended. The result is moved into the extraction cache when a
+        ``content_hash`` is given.
+        """
+        if not any(part["has_text"] for part in parts):
+            for part in parts:
+                DocumentService.remove_file(part["path"])
+            return {"path": None, "temporary": False}
+        
+        path = parts[0]["path"]
+        if len(parts) > 1:
+            with open(path, "ab") as output:
+                for part in parts[1:]:
+                    with open(part["path"], "rb") as source:
+                        shutil.copyfileobj(source, output)
+                    DocumentService.remove_file(part["path"])
+        
+        page_offsets = []
+        position = 0
+        counts = {language: 0 for language in SCRIPT_PATTERNS}
+        for part in parts:
+            page_offsets.extend(position + offset for offset in part["page_offsets"])
+            position += part["length"]
+            for language, count in part["counts"].items():
+                counts[language] += count
+        summary = {
+            "page_count": len(page_offsets) or None,
+            "page_offsets": page_offsets or None,
+            "language": DocumentService._language_from_counts(counts)
+        }
+        with gzip.open(path, "at", encoding="utf-8") as output:
+            output.write(json.dumps({"summary": summary}) + "\n")
+        
+        file_format = EXTRACTOR_FORMATS.get(document_type)
+        if content_hash and settings.EXTRACTION_CACHE_ENABLED and file_format is not None:
+            try:
+                cached_path = extraction_cache.store(
+                    content_hash, file_format, EXTRACTOR_VERSIONS[file_format], path
+                )
+                return {"path": cached_path, "temporary": False}
+            except OSError as e:
+                print(f"Error writing extraction cache entry {content_hash}: {e}")
+        return {"path": path, "temporary": True}
+    
+    @staticmethod
+    def iter_extraction(path: str) -> Iterator[Dict]:
+        """Stream the page lines, then the summary line, of an extraction file"""
+        with gzip.open(path, "rt", encoding="utf-8") as entry:
+            for line in entry:
+                yield json.loads(line)
+    
+    @staticmethod
+    def read_extraction(extraction: Dict, processed: bool = False) -> Optional[str]:
+        """Load the full text of an extraction, removing it if temporary"""
+        if extraction.get("path") is None:
+            return None
+        key = "processed" if processed else "raw"
+        try:
+            return "\n".join(
+                entry[key] for entry in DocumentService.iter_extraction(extraction["path"]) if "page" in entry
+            )
+        finally:
+            if extraction.get("temporary"):
+                DocumentService.remove_file(extraction["path"])
+    
+    @staticmethod
+    def apply_extraction(db: Session, document: Document, extraction: Dict) -> bool:
+        """Store the result of extract_content on the document.
+        
+        Pages are streamed from the extraction file into the session and
+        flushed in batches, so the document is never held in memory at once.
+        """
+        document.processed_at = datetime.utcnow()
+        
+        if extraction.get("path") is None:
+            document.processing_status = ProcessingStatus.FAILED
+            document.processing_error = "Failed to extract text content"
+            return False
+        
+        try:
+            # A savepoint, so that a broken file leaves no partial pages behind
+            with db.begin_nested():
+                summary = DocumentService.store_pages(
+                    db, document, DocumentService.iter_extraction(extraction["path"])
+                )
+        except (OSError, ValueError):
+            if not extraction.get("temporary"):
+                extraction_cache.discard(extraction["path"])
+            raise
+        finally:
+            if extraction.get("temporary"):
+                DocumentService.remove_file(extraction["path"])
+        
+        document.page_count = summary.get("page_count")
+        if summary.get("page_offsets") is not None:
+            document.page_offsets = json.dumps(summary["page_offsets"])
+        document.language = summary.get("language")
+        document.processing_status = ProcessingStatus.COMPLETED
+        document.processing_error = None
+        
+        # TODO: Add more processing like:
+        # - Summary generation using LLM
+        # - Knowledge point extraction
+        
+        return True
+    
+    @staticmethod
+    def store_pages(db: Session, document: Document, entries: Iterable[Dict], batch_size: int = 50) -> Dict:
+        """Replace a document's pages with a stream of extraction entries.
+        
+        Returns the summary entry that ends the stream.
+        """
+        db.query(DocumentPage).filter(DocumentPage.document_id == document.id).delete()
+        summary = {}
+        pending = 0
+        for entry in entries:
+            if "summary" in entry:
+                summary = entry["summary"]
+                continue
+            db.add(DocumentPage(
+                document_id=document.id,
+                page_number=entry["page"],
+                raw_content=entry["raw"],
+                processed_content=entry["processed"]
+            ))
+            pending += 1
+            if pending == batch_size:
+                db.flush()
+                pending = 0
+        db.flush()
+        db.expire(document, ["pages"])
+        return summary
+    
+    @staticmethod
+    def remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    
+    @staticmethod
+    def get_pages(
+        db: Session,
+        document_id: int,
+        start_page: Optional[int] = None,
+        end_page: Optional[int] = None
+    ) -> List[DocumentPage]:
+        """Load the stored pages of a document, optionally limited to a range"""
+        query = db.query(DocumentPage).filter(DocumentPage.document_id == document_id)
+        if start_page is not None:
+            query = query.filter(DocumentPage.page_number >= start_page)
+        if end_page is not None:
+            query = query.filter(DocumentPage.page_number <= end_page)
+        return query.order_by(DocumentPage.page_number).all()
+    
+    @staticmethod
+    def iter_page_records(db: Session, document_id: int, processed: bool = True) -> Iterator[Dict]:
+        """Stream a document's stored text page by page as extraction records"""
+        query = db.query(DocumentPage).filter(
+            DocumentPage.document_id == document_id
+        ).order_by(DocumentPage.page_number).yield_per(50)
+        for page in query:
+            text = page.processed_content if processed else page.raw_content
+            yield {"type": "page", "number": page.page_number, "text": text or ""}
+    
+    @staticmethod
+    def get_content(db: Session, document_id: int, processed: bool = True) -> Optional[str]:
+        """Load the full stored text of a document"""
+        texts = [
+            record["text"]
+            for record in DocumentService.iter_page_records(db, document_id, processed)
+            if record["text"]
+        ]
+        return "\n".join(texts) if texts else None
+    
+    @staticmethod
+    def migrate_legacy_content(db: Session, batch_size: int = 50) -> int:
+        """Move text stored on the documents table by older versions into pages.
+        
+        Older databases kept each document's whole text in the raw_content
+        and processed_content columns, without page boundaries, so it becomes
+        a single page. The old columns are cleared once copied, which makes
+        this cheap to run on every startup. Returns the documents migrated.
+        """
+        columns = {column["name"] for column in inspect(db.get_bind()).get_columns("documents")}
+        if not {"raw_content", "processed_content"} <= columns:
+            return 0
+        
+        select_legacy = text(
+            "SELECT id, raw_content, processed_content FROM documents "
+            "WHERE (raw_content IS NOT NULL OR processed_content IS NOT NULL) AND id > :after "
+            "ORDER BY id LIMIT :limit"
+        )
+        clear_legacy = text(
+            "UPDATE documents SET raw_content = NULL, processed_content = NULL WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+        
+        migrated = 0
+        after = 0
+        failed_ids = None
+        while True:
+            rows = db.execute(select_legacy, {"after": after, "limit": batch_size}).all()
+            if not rows:
+                return migrated
+            ids = [row[0] for row in rows]
+            added = 0
+            for document_id, raw_content, processed_content in rows:
+                has_pages = db.query(DocumentPage.page_number).filter(
+                    DocumentPage.document_id == document_id
+                ).first() is not None
+                if has_pages:
+                    continue
+                db.add(DocumentPage(
+                    document_id=document_id,
+                    page_number=1,
+                    raw_content=raw_content,
+                    processed_content=(
+                        processed_content if processed_content is not None
+                        else DocumentService._clean_text(raw_content)
+                    )
+                ))
+                added += 1
+            db.execute(clear_legacy, {"ids": ids})
+            try:
+                db.commit()
+            except IntegrityError as e:
+                db.rollback()
+                if failed_ids != ids:
+                    # Most likely another API worker starting up migrated these
+                    # documents first; the retry skips them
+                    failed_ids = ids
+                    continue
+                print(f"Error migrating the text of documents {ids[0]}-{ids[-1]}, skipping them: {e}")
+            else:
+                migrated += added
+            failed_ids = None
+            after = ids[-1]
+    
+    @staticmethod
+    def find_processed_duplicate(db: Session, content_hash: str) -> Optional[Document]:
+        """Find an already processed document with the same file content"""
+        return db.query(Document).filter(
+            Document.content_hash == content_hash,
+            Document.processing_status == ProcessingStatus.COMPLETED
+        ).order_by(Document.processed_at.desc()).first()
+    
+    @staticmethod
+    def copy_processed_content(source: Document, document: Document):
+        """Reuse the extraction results (and summary) of an identical upload"""
+        document.pages = [
+            DocumentPage(
+                page_number=page.page_number,
+                raw_data=page.raw_data,
+                processed_data=page.processed_data
+            )
+            for page in source.pages
+        ]
+        document.page_count = source.page_count
+        document.page_offsets = source.page_offsets
+        document.language = source.language
+        document.summary = source.summary
+        document.processing_status = ProcessingStatus.COMPLETED
+        document.processing_error = None
+        document.processed_at = datetime.utcnow()
+    
+    @staticmethod
+    def mark_failed(document: Document, error: str):
+        document.processing_status = ProcessingStatus.FAILED
+        document.processing_error = error
+        document.processed_at = datetime.utcnow()
+    
+    @staticmethod
+    def process_document(db: Session, document: Document) -> bool:
         """Process document and extract content"""
         try:
-            # Extract text content
-            raw_content = DocumentService.extract_text_from_file(
+            extraction = DocumentService.extract_content(
                 document.file_path, 
                 document.document_type.value
             )
-            
-            if raw_content:
-                document.raw_content = raw_content
-                document.processed_content = DocumentService._clean_text(raw_content)
-                document.processing_status = ProcessingStatus.COMPLETED
-                
-                # TODO: Add more processing like:
-                # - Language detection
-                # - Summary generation using LLM
-                # - Knowledge point extraction
-                
-                return True
-            else:
-                document.processing_status = ProcessingStatus.FAILED
-                document.processing_error = "Failed to extract text content"
-                return False
+            return DocumentService.apply_extraction(db, document, extraction)
                 
         except Exception as e:
-            document.processing_status = ProcessingStatus.FAILED
-            document.processing_error = str(e)
+            DocumentService.mark_failed(document, str(e))
             return False
     
     @staticmethod
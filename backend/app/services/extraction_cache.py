@@ -0,0 +1,107 @@
+from typing import Optional
+import os
+import shutil
+import uuid
+
+from app.config import settings
+
+class ExtractionCache:
+    """Persistent cache of extraction files.
+
+    Entries are the gzip-compressed JSON-lines files written by
+    ``DocumentService.extract_content`` (one line per page), stored under
+    ``<directory>/<format>/v<version>/`` and keyed by the SHA-256 of the
+    source file, so bumping a format's extractor version only invalidates
+    that format. Entries are streamed from disk rather than loaded. Lookups
+    refresh an entry's modification time and stores evict the least
+    recently used entries once the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+    @property
+    def directory(self) -> str:
+        return self._directory or settings.EXTRACTION_CACHE_DIR
+
+    @property
+    def max_bytes(self) -> int:
+        return settings.EXTRACTION_CACHE_MAX_BYTES if self._max_bytes is None else self._max_bytes
+
+    def _path(self, content_hash: str, file_format: str, version: int) -> str:
+        return os.path.join(
+            self.directory, file_format, f"v{version}", content_hash[:2], f"{content_hash}.jsonl.gz"
+        )
+
+    def lookup(self, content_hash: str, file_format: str, version: int) -> Optional[str]:
+        """Return the path of a cached entry, if there is one"""
+        path = self._path(content_hash, file_format, version)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, content_hash: str, file_format: str, version: int, source_path: str) -> str:
+        """Move a finished extraction file into the cache and return its new path"""
+        path = self._path(content_hash, file_format, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4()}.tmp"
+        try:
+            shutil.move(source_path, temp_path)
+            os.replace(temp_path, path)
+        finally:
+            self._remove(temp_path)
+
+        self._prune_versions(file_format, version)
+        self._evict(keep=path)
+        return path
+
+    def discard(self, path: str):
+        """Drop an entry that turned out to be unreadable"""
+        print(f"Discarding unreadable extraction cache entry {path}")
+        self._remove(path)
+
+    def _prune_versions(self, file_format: str, version: int):
+        """Drop entries written by other versions of a format's extractor"""
+        format_dir = os.path.join(self.directory, file_format)
+        for entry in os.scandir(format_dir):
+            if entry.is_dir() and entry.name != f"v{version}":
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _evict(self, keep: Optional[str] = None):
+        """Evict least recently used entries, never the one just stored"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            if path == keep:
+                continue
+            self._remove(path)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+extraction_cache = ExtractionCache()
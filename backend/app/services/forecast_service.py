@@ -0,0 +1,90 @@
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.due_forecast import DueForecast
+from app.models.flashcard import Flashcard
+from app.models.user import User
+from app.utils.counters import add_counts
+
+class ForecastService:
+    """Maintains each user's histogram of flashcard due dates.
+
+    A card whose due date changes moves from the count of its old day to
+    that of its new day, so keeping the forecast costs at most two counter
+    updates per card. The histogram is built from the cards once per user,
+    on first read, as cards may predate it.
+    """
+
+    @staticmethod
+    def due_day(due_date: Optional[datetime]) -> Optional[date]:
+        if due_date is None:
+            return None
+        if due_date.tzinfo is not None:
+            due_date = due_date.astimezone(timezone.utc)
+        return due_date.date()
+
+    @classmethod
+    def changes(cls, moves: Iterable[Tuple[int, Optional[datetime], Optional[datetime]]]) -> Counter:
+        """Net change per (user_id, day) of cards moving from one due date to another (None if none)"""
+        changes = Counter()
+        for user_id, old, new in moves:
+            old_day, new_day = cls.due_day(old), cls.due_day(new)
+            if old_day == new_day:
+                continue
+            if old_day is not None:
+                changes[user_id, old_day] -= 1
+            if new_day is not None:
+                changes[user_id, new_day] += 1
+        return changes
+
+    @staticmethod
+    def apply(db: Session, changes: Dict[Tuple[int, date], int]):
+        for (user_id, day), delta in changes.items():
+            if delta:
+                add_counts(db, DueForecast, {"user_id": user_id, "day": day}, {"cards": delta})
+
+    @classmethod
+    def move(cls, db: Session, user_id: int, old: Optional[datetime], new: Optional[datetime]):
+        """Account for one card whose due date changed from ``old`` to ``new``"""
+        cls.apply(db, cls.changes([(user_id, old, new)]))
+
+    @classmethod
+    def rebuild(cls, db: Session, user: User):
+        """Count the user's cards per due day from scratch"""
+        db.query(DueForecast).filter(DueForecast.user_id == user.id).delete(synchronize_session=False)
+        counts = Counter(
+            cls.due_day(due_date)
+            for due_date in db.scalars(
+                select(Flashcard.due_date).where(Flashcard.user_id == user.id, Flashcard.due_date.isnot(None))
+            )
+        )
+        if counts:
+            db.execute(insert(DueForecast), [
+                {"user_id": user.id, "day": day, "cards": cards} for day, cards in counts.items()
+            ])
+        user.due_forecast_built = True
+
+    @classmethod
+    def forecast(cls, db: Session, user: User, days: int, today: Optional[date] = None) -> Tuple[int, List[Dict]]:
+        """Cards overdue, and cards due on each of the next ``days`` days starting today"""
+        if not user.due_forecast_built:
+            cls.rebuild(db, user)
+            db.commit()
+
+        today = today or datetime.utcnow().date()
+        rows = db.query(DueForecast.day, DueForecast.cards).filter(
+            DueForecast.user_id == user.id,
+            DueForecast.day < today + timedelta(days=days)
+        ).all()
+
+        upcoming = dict.fromkeys((today + timedelta(days=offset) for offset in range(days)), 0)
+        overdue = 0
+        for day, cards in rows:
+            if day < today:
+                overdue += cards
+            else:
+                upcoming[day] += cards
+        return overdue, [{"day": day, "cards": cards} for day, cards in upcoming.items()]
@@ -0,0 +1,138 @@
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import time
+
+from app.config import settings
+
+# Bump to invalidate every shared entry after a change in what is cached
+CACHE_KEY_VERSION = 2
+
+# Seconds to wait before trying Redis again after it failed
+SHARED_RETRY_INTERVAL = 30
+
+class LLMCache:
+    """Two-tier cache of LLM completions keyed by model, prompt and sampling.
+
+    The first tier is an in-process LRU of ``max_entries`` completions; the
+    second is shared between API processes through Redis at ``REDIS_URL``.
+    Any object with Redis' async ``get``/``set(..., ex=...)`` can be passed
+    as ``shared`` instead. A failing Redis is skipped for a while rather
+    than failing requests.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, shared=None):
+        self._max_entries = max_entries
+        self._shared = shared
+        self._shared_retry_at = 0.0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    @property
+    def max_entries(self) -> int:
+        return settings.LLM_CACHE_MAX_ENTRIES if self._max_entries is None else self._max_entries
+
+    @property
+    def shared(self):
+        if self._shared is None and settings.LLM_CACHE_SHARED_ENABLED:
+            import redis.asyncio as redis
+            self._shared = redis.from_url(settings.REDIS_URL, decode_responses=True)
+        return self._shared
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+        # Prompts differing only in whitespace share a key
+        normalized = [
+            {"role": message["role"], "content": " ".join(message["content"].split())}
+            for message in messages
+        ]
+        payload = json.dumps(
+            {"model": model, "messages": normalized, "max_tokens": max_tokens, "temperature": temperature},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"llm:v{CACHE_KEY_VERSION}:{digest}"
+
+    @staticmethod
+    def ttl_for(method: str) -> int:
+        return getattr(settings, f"LLM_CACHE_TTL_{method.upper()}", settings.LLM_CACHE_TTL_DEFAULT)
+
+    async def get(self, method: str, key: str) -> Optional[str]:
+        value = self._get_local(key)
+        if value is None:
+            value = await self._get_shared(key)
+            if value is not None:
+                self._set_local(key, value, self.ttl_for(method))
+
+        self._stats[method]["hits" if value is not None else "misses"] += 1
+        return value
+
+    async def set(self, method: str, key: str, value: str):
+        ttl = self.ttl_for(method)
+        if ttl <= 0:
+            return
+        self._set_local(key, value, ttl)
+        await self._set_shared(key, value, ttl)
+
+    async def get_shared(self, key: str) -> Optional[str]:
+        """Read only the shared tier, without touching the hit/miss counts"""
+        return await self._get_shared(key)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit and miss counts per LLMService method"""
+        return {method: dict(counts) for method, counts in self._stats.items()}
+
+    def clear(self):
+        self._entries.clear()
+        self._stats.clear()
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: str, ttl: int):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_shared(self, key: str) -> Optional[str]:
+        shared = self._available_shared()
+        if shared is None:
+            return None
+        try:
+            return await shared.get(key)
+        except Exception as e:
+            self._shared_failed(e)
+            return None
+
+    async def _set_shared(self, key: str, value: str, ttl: int):
+        shared = self._available_shared()
+        if shared is None:
+            return
+        try:
+            await shared.set(key, value, ex=ttl)
+        except Exception as e:
+            self._shared_failed(e)
+
+    def _available_shared(self):
+        if time.monotonic() < self._shared_retry_at:
+            return None
+        return self.shared
+
+    def _shared_failed(self, error: Exception):
+        print(f"Error reaching shared LLM cache: {error}")
+        self._shared_retry_at = time.monotonic() + SHARED_RETRY_INTERVAL
+
+llm_cache = LLMCache()
@@ -0,0 +1,32 @@
+from typing import Optional
+
+class LLMError(Exception):
+    """Base class of errors from LLM calls.
+
+    ``retryable`` tells callers whether the same work may succeed if
+    requeued, and ``retry_after`` (seconds) when to try, if known.
+    """
+
+    retryable = False
+
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMProviderError(LLMError):
+    """Raised by a provider when a request fails"""
+    pass
+
+class LLMTransientError(LLMProviderError):
+    """A provider failure worth retrying: rate limits, timeouts, overload, lost connections"""
+
+    retryable = True
+
+class LLMUnavailableError(LLMError):
+    """Calls fail fast because the provider has been failing"""
+
+    retryable = True
+
+class LLMResponseError(LLMError):
+    """The completion could not be used, e.g. it held no valid items"""
+    pass
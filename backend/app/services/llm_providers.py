@@ -0,0 +1,295 @@
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import random
+import re
+import httpx
+import openai
+
+from app.config import settings
+from app.services.llm_errors import LLMProviderError, LLMTransientError
+from app.utils.tokens import count_tokens
+
+# HTTP statuses worth retrying besides 5xx
+RETRYABLE_STATUSES = {408, 409, 429}
+
+class LLMProvider:
+    """Chat completion backend used by ``LLMService``.
+
+    ``complete`` returns a dict with the completion 'text' and its
+    'prompt_tokens' and 'completion_tokens' (None when unknown); ``stream``
+    yields the text in pieces as it is generated. ``embed`` returns one
+    embedding vector per text. Failures are raised as ``LLMProviderError``,
+    or ``LLMTransientError`` when retrying may help.
+    """
+
+    name = "base"
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        max_tokens: int,
+        temperature: float
+    ) -> Dict:
+        raise NotImplementedError
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        max_tokens: int,
+        temperature: float
+    ) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI (or any OpenAI-compatible server at ``OPENAI_BASE_URL``).
+
+    The client doesn't retry by itself; ``LLMService`` does.
+    """
+
+    name = "openai"
+
+    def __init__(self, client: Optional[openai.AsyncOpenAI] = None):
+        self._client = client
+
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        # One client per process, sharing a pool of connections
+        if self._client is None:
+            self._client = openai.AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL or None,
+                timeout=settings.LLM_REQUEST_TIMEOUT,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.LLM_MAX_CONNECTIONS
+                    ),
+                    timeout=settings.LLM_REQUEST_TIMEOUT
+                )
+            )
+        return self._client
+
+    async def complete(self, messages, model, max_tokens, temperature) -> Dict:
+        try:
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+        except openai.APIError as e:
+            raise self.provider_error(e) from e
+        
+        usage = response.usage
+        return {
+            "text": response.choices[0].message.content.strip(),
+            "prompt_tokens": usage.prompt_tokens if usage else None,
+            "completion_tokens": usage.completion_tokens if usage else None
+        }
+
+    async def stream(self, messages, model, max_tokens, temperature) -> AsyncIterator[str]:
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+        except openai.APIError as e:
+            raise self.provider_error(e) from e
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except openai.APIError as e:
+            raise self.provider_error(e) from e
+        finally:
+            # Closing the connection early stops generation upstream
+            await stream.response.aclose()
+
+    async def embed(self, texts, model) -> List[List[float]]:
+        try:
+            response = await self.client.embeddings.create(model=model, input=texts)
+        except openai.APIError as e:
+            raise self.provider_error(e) from e
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    @staticmethod
+    def provider_error(error: openai.APIError) -> LLMProviderError:
+        """Classify an OpenAI client error as transient or not"""
+        if isinstance(error, openai.APIConnectionError):  # Includes timeouts
+            return LLMTransientError(str(error))
+        if isinstance(error, openai.APIStatusError):
+            if error.status_code in RETRYABLE_STATUSES or error.status_code >= 500:
+                retry_after = None
+                try:
+                    retry_after = float(error.response.headers.get("retry-after", ""))
+                except ValueError:
+                    pass
+                return LLMTransientError(str(error), retry_after=retry_after)
+        return LLMProviderError(str(error))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+MOCK_WORDS = (
+    "energy cell membrane process structure function system reaction concept "
+    "model theory example evidence cause effect change pattern data result"
+).split()
+MOCK_EMBEDDING_DIMENSIONS = 256
+
+class MockProvider(LLMProvider):
+    """Offline provider returning deterministic, schema-valid responses.
+
+    The content of a response depends only on the prompt, so repeated runs
+    produce identical output. It recognises the prompts of each
+    ``LLMService`` method and answers with JSON in the shape that method
+    parses; anything else gets plain text. Latency is log-normally
+    distributed around ``latency_ms`` and a fraction ``error_rate`` of calls
+    fail, both drawn from a generator seeded with ``seed`` so benchmark runs
+    are reproducible.
+    """
+
+    name = "mock"
+
+    def __init__(
+        self,
+        latency_ms: Optional[float] = None,
+        latency_sigma: Optional[float] = None,
+        error_rate: Optional[float] = None,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = settings.MOCK_LLM_LATENCY_MS if latency_ms is None else latency_ms
+        self.latency_sigma = settings.MOCK_LLM_LATENCY_SIGMA if latency_sigma is None else latency_sigma
+        self.error_rate = settings.MOCK_LLM_ERROR_RATE if error_rate is None else error_rate
+        self._random = random.Random(settings.MOCK_LLM_SEED if seed is None else seed)
+
+    async def complete(self, messages, model, max_tokens, temperature) -> Dict:
+        await self._simulate_call()
+        text = self.respond(messages, max_tokens)
+        return {
+            "text": text,
+            "prompt_tokens": sum(count_tokens(message["content"], model) for message in messages),
+            "completion_tokens": count_tokens(text, model)
+        }
+
+    async def stream(self, messages, model, max_tokens, temperature) -> AsyncIterator[str]:
+        await self._simulate_call()
+        for piece in re.findall(r"\S+\s*", self.respond(messages, max_tokens)):
+            await asyncio.sleep(0)
+            yield piece
+
+    async def embed(self, texts, model) -> List[List[float]]:
+        await self._simulate_call()
+        return [self.embedding(text) for text in texts]
+
+    async def _simulate_call(self):
+        latency = self.latency_ms * self._random.lognormvariate(0, self.latency_sigma) if self.latency_ms > 0 else 0
+        failed = self._random.random() < self.error_rate
+        await asyncio.sleep(latency / 1000)
+        if failed:
+            raise LLMTransientError("Mock provider error")
+
+    @classmethod
+    def respond(cls, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        system = messages[0]["content"] if len(messages) > 1 else ""
+        prompt = messages[-1]["content"]
+        seed = int(hashlib.sha256(json.dumps(messages).encode("utf-8")).hexdigest()[:16], 16)
+        words = random.Random(seed)
+        count = cls._requested_count(prompt)
+
+        if "'knowledge_point_id'" in system:
+            listing = prompt.split("\n\n", 1)[-1]
+            ids = [int(id) for id in re.findall(r"^(\d+):", listing, re.MULTILINE)]
+            return json.dumps([
+                {
+                    "knowledge_point_id": id,
+                    "front": f"Question {number + 1} about point {id}: {cls._sentence(words, 6)}?",
+                    "back": cls._sentence(words, 12)
+                }
+                for id in ids
+                for number in range(count)
+            ])
+        if "'front'" in system:
+            return json.dumps([
+                {"front": f"{cls._sentence(words, 6)}?", "back": cls._sentence(words, 12)}
+                for _ in range(count)
+            ])
+        if "'title'" in system:
+            return json.dumps([
+                {
+                    "title": cls._sentence(words, 3).rstrip("."),
+                    "description": cls._sentence(words, 15),
+                    "category": words.choice(MOCK_WORDS)
+                }
+                for _ in range(5)
+            ])
+        if "'question'" in system:
+            exercises = []
+            for _ in range(count):
+                options = [cls._sentence(words, 3) for _ in range(4)]
+                exercises.append({
+                    "question": f"{cls._sentence(words, 8)}?",
+                    "options": options,
+                    "correct_answer": options[0],
+                    "explanation": cls._sentence(words, 15)
+                })
+            return json.dumps(exercises)
+
+        # Free text (summaries, explanations), roughly filling the budget
+        return cls._sentence(words, max(1, min(max_tokens, 400) * 3 // 4))
+
+    @staticmethod
+    def embedding(text: str) -> List[float]:
+        """Hashed bag of words, so texts sharing words are similar"""
+        vector = [0.0] * MOCK_EMBEDDING_DIMENSIONS
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % MOCK_EMBEDDING_DIMENSIONS] += 1.0
+        return vector
+
+    @staticmethod
+    def _requested_count(prompt: str) -> int:
+        match = re.search(r"Create (\d+)", prompt)
+        return int(match.group(1)) if match else 3
+
+    @staticmethod
+    def _sentence(words: random.Random, length: int) -> str:
+        text = " ".join(words.choice(MOCK_WORDS) for _ in range(length))
+        return text[:1].upper() + text[1:] + "."
+
+PROVIDERS = {
+    OpenAIProvider.name: OpenAIProvider,
+    MockProvider.name: MockProvider
+}
+
+_provider: Optional[LLMProvider] = None
+
+def get_provider() -> LLMProvider:
+    """The process-wide provider selected by ``LLM_PROVIDER``"""
+    global _provider
+    if _provider is None:
+        if settings.LLM_PROVIDER not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider: {settings.LLM_PROVIDER}")
+        _provider = PROVIDERS[settings.LLM_PROVIDER]()
+    return _provider
+
+async def close_provider():
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
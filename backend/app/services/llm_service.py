@@ -1,133 +1,731 @@
-from typing import List, Dict, Optional
-import openai
+from collections import defaultdict
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Iterable, Tuple, Type
+import asyncio
+import hashlib
+import json
+import time
+from pydantic import BaseModel, ValidationError
 from app.config import settings
+from app.schemas.llm import BatchFlashcardItem, ExerciseItem, FlashcardItem, KnowledgePointItem
+from app.services.document_service import DocumentService
+from app.services.llm_cache import LLMCache, llm_cache
+from app.services.llm_errors import LLMProviderError, LLMResponseError
+from app.services.llm_providers import LLMProvider, get_provider
+from app.services.rate_limiter import llm_rate_limiter
+from app.services.resilience import ResilientCaller, llm_resilience
+from app.services.single_flight import SingleFlight, llm_single_flight
+from app.services.telemetry import llm_telemetry
+from app.utils.json_array import parse_json_array
+from app.utils.tokens import count_tokens
+
+# Bump when the summarization prompts change so stored chunk summaries are
+# regenerated
+SUMMARY_PROMPT_VERSION = 1
+
+# Chunks also start at roughly one in this many records (chosen by a hash of
+# the record text), so chunk boundaries line up again shortly after an edit
+SUMMARY_BOUNDARY_MODULUS = 4
+
+# Completion budget per requested flashcard in batch generation
+FLASHCARD_TOKENS_PER_CARD = 120
+
+# Smallest completion budget when asking again for missing items
+REPAIR_MIN_TOKENS = 200
 
 class LLMService:
-    def __init__(self):
-        openai.api_key = settings.OPENAI_API_KEY
+    """LLM calls for the study features.
     
-    async def generate_summary(self, content: str, max_length: int = 500) -> str:
-        """Generate a summary of the document content"""
-        try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that creates concise summaries of educational content."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Please create a concise summary of the following content in {max_length} characters or less:\n\n{content}"
-                    }
-                ],
-                max_tokens=max_length // 4,  # Rough estimate
-                temperature=0.3
+    Failed calls raise ``LLMError`` once retries are exhausted, with
+    ``retryable`` set when the work may succeed if requeued later.
+    """
+    
+    def __init__(
+        self,
+        provider: Optional[LLMProvider] = None,
+        cache: Optional[LLMCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        user_id: Optional[int] = None,
+        resilience: Optional[ResilientCaller] = None
+    ):
+        """``user_id`` is the user calls are made for, for usage accounting"""
+        self.provider = provider or get_provider()
+        self.user_id = user_id
+        self.model = settings.LLM_MODEL
+        self.cache = cache or llm_cache
+        self.single_flight = single_flight or llm_single_flight
+        self.resilience = resilience or llm_resilience
+    
+    async def _chat(
+        self,
+        method: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        bypass_cache: bool = False,
+        parse: Optional[Callable[[str], Any]] = None
+    ) -> Any:
+        """Run a completion through the response cache.
+        
+        ``method`` selects the cache TTL. With ``bypass_cache`` the cached
+        response is ignored but the fresh one still replaces it. Responses
+        that ``parse`` rejects are not cached. Concurrent misses for the same
+        prompt share one upstream request.
+        """
+        parse = parse or (lambda content: content)
+        key = self.cache.make_key(self.model, messages, max_tokens, temperature)
+        use_cache = settings.LLM_CACHE_ENABLED and not bypass_cache
+        
+        if use_cache:
+            cached = await self._get_cached(method, key)
+            if cached is not None:
+                return parse(cached)
+        
+        async def fetch() -> str:
+            content = await self._complete(messages, max_tokens, temperature, method=method)
+            parse(content)
+            await self._cache_response(method, key, content)
+            return content
+        
+        # Other workers' results can only be picked up through the cache
+        poll = (lambda: self.cache.get_shared(key)) if use_cache else None
+        return parse(await self.single_flight.do(key, fetch, poll))
+    
+    async def _cache_response(self, method: str, key: str, content: str) -> None:
+        """Cache a response the same way whichever variant produced it."""
+        if settings.LLM_CACHE_ENABLED:
+            await self.cache.set(method, key, content.strip())
+    
+    async def _chat_items(
+        self,
+        method: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        schema: Type[BaseModel],
+        count: Optional[int] = None,
+        bypass_cache: bool = False
+    ) -> List[Dict]:
+        """Run a completion that asks for a JSON array of ``schema`` items.
+        
+        Malformed or invalid items are dropped instead of failing the whole
+        response. When fewer than ``count`` items are valid (or, without a
+        count, some were invalid), the model is asked again for just the
+        missing ones, up to ``LLM_REPAIR_ATTEMPTS`` times.
+        """
+        parse = lambda content: self._parse_items(content, schema)
+        items, invalid = await self._chat(method, messages, max_tokens, temperature, bypass_cache, parse=parse)
+        
+        for _ in range(settings.LLM_REPAIR_ATTEMPTS):
+            missing = count - len(items) if count is not None else invalid
+            if missing <= 0:
+                break
+            repair_messages = messages + [
+                {"role": "assistant", "content": json.dumps(items, ensure_ascii=False)},
+                {
+                    "role": "user",
+                    "content": f"Some items were missing or invalid. Create {missing} more in the same JSON format, different from the ones above."
+                }
+            ]
+            try:
+                more, invalid = await self._chat(
+                    method,
+                    repair_messages,
+                    max(REPAIR_MIN_TOKENS, max_tokens * missing // (len(items) + missing)),
+                    temperature,
+                    bypass_cache,
+                    parse=parse
+                )
+            except Exception as e:
+                print(f"Error asking again for {method} items: {e}")
+                break
+            items.extend(more[:missing])
+        
+        return items if count is None else items[:count]
+    
+    @staticmethod
+    def _parse_items(content: str, schema: Type[BaseModel]) -> Tuple[List[Dict], int]:
+        """The valid items of a JSON array response and how many were invalid"""
+        elements, invalid = parse_json_array(content)
+        items = []
+        invalid_count = len(invalid)
+        for element in elements:
+            try:
+                items.append(schema.model_validate(element).model_dump())
+            except ValidationError:
+                invalid_count += 1
+        
+        if not items:
+            raise LLMResponseError("No valid items in response")
+        return items, invalid_count
+    
+    async def _get_cached(self, method: str, key: str) -> Optional[str]:
+        started = time.perf_counter()
+        cached = await self.cache.get(method, key)
+        if cached is not None:
+            llm_telemetry.record(
+                method, self.model, time.perf_counter() - started, user_id=self.user_id, cache_hit=True
             )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error generating summary: {e}")
-            return "Summary generation failed"
+        return cached
     
-    async def extract_knowledge_points(self, content: str) -> List[Dict[str, str]]:
-        """Extract key knowledge points from content"""
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        method: str = "completion"
+    ) -> str:
+        prompt_tokens = sum(count_tokens(message["content"], self.model) for message in messages)
+        
+        async def attempt() -> Dict:
+            async with llm_rate_limiter.limit(prompt_tokens + max_tokens) as usage:
+                completion = await self.provider.complete(messages, self.model, max_tokens, temperature)
+                if completion["prompt_tokens"] is not None and completion["completion_tokens"] is not None:
+                    usage.report(completion["prompt_tokens"] + completion["completion_tokens"])
+            return completion
+        
+        started = time.perf_counter()
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an educational assistant that extracts key knowledge points from learning materials. Return a JSON array of objects with 'title', 'description', and 'category' fields."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Extract the main knowledge points from this content:\n\n{content}"
-                    }
-                ],
-                max_tokens=1000,
-                temperature=0.2
+            completion, retries = await self.resilience.call(attempt)
+        except Exception as e:
+            llm_telemetry.record(
+                method, self.model, time.perf_counter() - started, user_id=self.user_id, error=type(e).__name__
             )
+            raise
+        
+        llm_telemetry.record(
+            method,
+            self.model,
+            time.perf_counter() - started,
+            user_id=self.user_id,
+            prompt_tokens=completion["prompt_tokens"] or prompt_tokens,
+            completion_tokens=completion["completion_tokens"] or count_tokens(completion["text"], self.model),
+            retries=retries
+        )
+        return completion["text"]
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with ``EMBEDDING_MODEL``, in batches of ``EMBEDDING_BATCH_SIZE``"""
+        model = settings.EMBEDDING_MODEL
+        vectors = []
+        for start in range(0, len(texts), settings.EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + settings.EMBEDDING_BATCH_SIZE]
+            tokens = sum(count_tokens(text, model) for text in batch)
             
-            # Parse the response as JSON
-            import json
-            knowledge_points = json.loads(response.choices[0].message.content)
-            return knowledge_points
-        except Exception as e:
-            print(f"Error extracting knowledge points: {e}")
-            return []
+            async def attempt() -> List[List[float]]:
+                async with llm_rate_limiter.limit(tokens):
+                    return await self.provider.embed(batch, model)
+            
+            started = time.perf_counter()
+            try:
+                batch_vectors, retries = await self.resilience.call(attempt)
+                vectors.extend(batch_vectors)
+            except Exception as e:
+                llm_telemetry.record(
+                    "embedding", model, time.perf_counter() - started, user_id=self.user_id, error=type(e).__name__
+                )
+                raise
+            llm_telemetry.record(
+                "embedding", model, time.perf_counter() - started, user_id=self.user_id, prompt_tokens=tokens, retries=retries
+            )
+        return vectors
     
-    async def generate_flashcards(self, knowledge_point: str, count: int = 5) -> List[Dict[str, str]]:
-        """Generate flashcards for a knowledge point"""
+    async def _stream_complete(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        method: str = "completion"
+    ) -> AsyncIterator[str]:
+        """Yield completion text as the provider streams it.
+        
+        Closing the generator early (e.g. the client disconnected) closes
+        the provider's stream, which stops generation upstream. A stream is
+        only retried if it fails before producing any text.
+        """
+        prompt_tokens = sum(count_tokens(message["content"], self.model) for message in messages)
+        breaker = self.resilience.breaker
+        started = time.perf_counter()
+        parts = []
+        retries = 0
+        error = "Cancelled"  # Unless the stream completes or fails
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an educational assistant that creates effective flashcards for learning. Return a JSON array of objects with 'front' (question) and 'back' (answer) fields."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Create {count} flashcards to help learn about: {knowledge_point}"
-                    }
-                ],
-                max_tokens=800,
-                temperature=0.4
-            )
-            
-            import json
-            flashcards = json.loads(response.choices[0].message.content)
-            return flashcards
+            while True:
+                breaker.before_call()
+                try:
+                    async with llm_rate_limiter.limit(prompt_tokens + max_tokens):
+                        stream = self.provider.stream(messages, self.model, max_tokens, temperature)
+                        try:
+                            async for delta in stream:
+                                parts.append(delta)
+                                yield delta
+                        finally:
+                            await stream.aclose()
+                except LLMProviderError as e:
+                    breaker.record_error(e)
+                    delay = None if parts else self.resilience.retry_delay(e, retries)
+                    if delay is None:
+                        raise
+                    retries += 1
+                    await asyncio.sleep(delay)
+                    continue
+                except BaseException:
+                    breaker.release()
+                    raise
+                breaker.record_success()
+                break
+            error = None
         except Exception as e:
-            print(f"Error generating flashcards: {e}")
-            return []
+            error = type(e).__name__
+            raise
+        finally:
+            # Streams don't report usage, so tokens are counted locally
+            llm_telemetry.record(
+                method,
+                self.model,
+                time.perf_counter() - started,
+                user_id=self.user_id,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=count_tokens("".join(parts), self.model),
+                retries=retries,
+                error=error
+            )
     
-    async def explain_concept(self, concept: str, context: str = "", user_level: str = "intermediate") -> str:
-        """Provide an explanation of a concept"""
-        try:
-            system_prompt = f"You are a helpful tutor explaining concepts at a {user_level} level. Provide clear, engaging explanations."
-            user_prompt = f"Explain this concept: {concept}"
+    async def _chat_stream(
+        self,
+        method: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        bypass_cache: bool = False
+    ) -> AsyncIterator[str]:
+        """Streaming counterpart of ``_chat``.
+        
+        A cached response is sent as a single piece. A streamed response is
+        cached only once it has completed, under the same key as ``_chat``
+        uses, so both variants share entries.
+        """
+        key = self.cache.make_key(self.model, messages, max_tokens, temperature)
+        
+        if settings.LLM_CACHE_ENABLED and not bypass_cache:
+            cached = await self._get_cached(method, key)
+            if cached is not None:
+                yield cached
+                return
+        
+        parts = []
+        async for delta in self._stream_complete(messages, max_tokens, temperature, method=method):
+            parts.append(delta)
+            yield delta
+        
+        await self._cache_response(method, key, "".join(parts))
+    
+    async def generate_summary(self, content: str, max_length: int = 500, bypass_cache: bool = False) -> str:
+        """Generate a summary of the document content.
+        
+        Content longer than one chunk is summarized with map-reduce.
+        """
+        chunks = self.chunk_records([{"type": "page", "number": 1, "text": content}])
+        summary, _ = await self.summarize_chunks(chunks, max_length, bypass_cache=bypass_cache)
+        return summary
+    
+    def chunk_records(self, records: Iterable[Dict], chunk_tokens: Optional[int] = None) -> List[Dict]:
+        """Split a record stream into token-bounded chunks with stable keys"""
+        chunk_tokens = chunk_tokens or settings.SUMMARY_CHUNK_TOKENS
+        
+        def boundary(record: Dict) -> bool:
+            digest = hashlib.sha1(record["text"].encode("utf-8")).hexdigest()
+            return int(digest[:8], 16) % SUMMARY_BOUNDARY_MODULUS == 0
+        
+        return [
+            {**chunk, "key": self._chunk_key(chunk["text"])}
+            for chunk in DocumentService.iter_chunks(
+                records,
+                chunk_tokens,
+                measure=lambda text: count_tokens(text, self.model),
+                boundary=boundary
+            )
+            if chunk["text"].strip()
+        ]
+    
+    def _chunk_key(self, text: str) -> str:
+        key = f"{SUMMARY_PROMPT_VERSION}:{self.model}:{settings.SUMMARY_CHUNK_SUMMARY_TOKENS}:{text}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+    
+    async def summarize_chunks(
+        self,
+        chunks: List[Dict],
+        max_length: int = 500,
+        known_summaries: Optional[Dict[str, str]] = None,
+        bypass_cache: bool = False
+    ) -> Tuple[str, Dict[str, str]]:
+        """Map-reduce summarization of chunks from ``chunk_records``.
+        
+        Returns the final summary and the newly generated chunk summaries so
+        the caller can keep them.
+        """
+        if not chunks:
+            return "", {}
+        content, combine, new_summaries = await self.prepare_summary(chunks, known_summaries, bypass_cache)
+        summary = await self._chat(
+            "summary",
+            messages=self._summary_messages(content, max_length, combine),
+            max_tokens=max_length,
+            temperature=0.3,
+            bypass_cache=bypass_cache
+        )
+        return summary, new_summaries
+    
+    async def prepare_summary(
+        self,
+        chunks: List[Dict],
+        known_summaries: Optional[Dict[str, str]] = None,
+        bypass_cache: bool = False
+    ) -> Tuple[str, bool, Dict[str, str]]:
+        """Map step of summarization, up to the final prompt.
+        
+        Chunk summaries found in ``known_summaries`` (by chunk key) are
+        reused; the others are generated concurrently, at most
+        SUMMARY_CONCURRENCY at a time, and merged until they fit in one
+        prompt. Returns the text to summarize, whether it is made of section
+        summaries, and the newly generated chunk summaries.
+        """
+        if len(chunks) == 1:
+            return chunks[0]["text"], False, {}
+        
+        known_summaries = known_summaries or {}
+        semaphore = asyncio.Semaphore(settings.SUMMARY_CONCURRENCY)
+        
+        async def summarize(chunk: Dict) -> str:
+            if chunk["key"] in known_summaries:
+                return known_summaries[chunk["key"]]
+            async with semaphore:
+                return await self._summarize_section(chunk["text"], bypass_cache)
+        
+        summaries = await asyncio.gather(*[summarize(chunk) for chunk in chunks])
+        new_summaries = {
+            chunk["key"]: summary
+            for chunk, summary in zip(chunks, summaries)
+            if chunk["key"] not in known_summaries
+        }
+        
+        return await self._reduce_summaries(list(summaries), semaphore, bypass_cache), True, new_summaries
+    
+    def stream_summary(
+        self,
+        content: str,
+        max_length: int = 500,
+        combine: bool = False,
+        bypass_cache: bool = False
+    ) -> AsyncIterator[str]:
+        """Stream the final summary of ``content`` from ``prepare_summary``"""
+        return self._chat_stream(
+            "summary",
+            messages=self._summary_messages(content, max_length, combine),
+            max_tokens=max_length,
+            temperature=0.3,
+            bypass_cache=bypass_cache
+        )
+    
+    async def _reduce_summaries(
+        self,
+        summaries: List[str],
+        semaphore: asyncio.Semaphore,
+        bypass_cache: bool = False
+    ) -> str:
+        """Merge section summaries, in several rounds if they overflow a chunk"""
+        while True:
+            # Group by size only: content-defined boundaries would split
+            # summaries that already fit in one prompt
+            groups = list(DocumentService.iter_chunks(
+                (
+                    {"type": "section", "number": number, "text": summary}
+                    for number, summary in enumerate(summaries, start=1)
+                ),
+                settings.SUMMARY_CHUNK_TOKENS,
+                measure=lambda text: count_tokens(text, self.model)
+            ))
+            if len(groups) <= 1:
+                break
             
-            if context:
-                user_prompt += f"\n\nContext: {context}"
+            async def merge(group: Dict) -> str:
+                async with semaphore:
+                    return await self._summarize_section(group["text"], bypass_cache)
             
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=600,
-                temperature=0.5
-            )
+            summaries = await asyncio.gather(*[merge(group) for group in groups])
+        
+        return "\n\n".join(summaries)
+    
+    async def _summarize_section(self, text: str, bypass_cache: bool = False) -> str:
+        return await self._chat(
+            "summary",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a helpful assistant that summarizes one section of a longer educational document. Keep the key concepts, definitions and facts."
+                },
+                {
+                    "role": "user",
+                    "content": f"Summarize this section:\n\n{text}"
+                }
+            ],
+            max_tokens=settings.SUMMARY_CHUNK_SUMMARY_TOKENS,
+            temperature=0.3,
+            bypass_cache=bypass_cache
+        )
+    
+    @staticmethod
+    def _summary_messages(content: str, max_length: int, combine: bool = False) -> List[Dict[str, str]]:
+        if combine:
+            prompt = f"The following are summaries of consecutive sections of one document. Combine them into a single concise summary of the whole document in {max_length} characters or less:\n\n{content}"
+        else:
+            prompt = f"Please create a concise summary of the following content in {max_length} characters or less:\n\n{content}"
+        
+        # max_tokens is max_length: one token per character is an upper
+        # bound for both Latin and CJK text
+        return [
+            {
+                "role": "system",
+                "content": "You are a helpful assistant that creates concise summaries of educational content."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    async def extract_knowledge_points(self, content: str, bypass_cache: bool = False) -> List[Dict[str, str]]:
+        """Extract key knowledge points from content"""
+        return await self._chat_items(
+            "knowledge_points",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an educational assistant that extracts key knowledge points from learning materials. Return a JSON array of objects with 'title', 'description', and 'category' fields."
+                },
+                {
+                    "role": "user",
+                    "content": f"Extract the main knowledge points from this content:\n\n{content}"
+                }
+            ],
+            max_tokens=1000,
+            temperature=0.2,
+            schema=KnowledgePointItem,
+            bypass_cache=bypass_cache
+        )
+    
+    async def generate_flashcards(
+        self,
+        knowledge_point: str,
+        count: int = 5,
+        bypass_cache: bool = False
+    ) -> List[Dict[str, str]]:
+        """Generate flashcards for a knowledge point"""
+        return await self._chat_items(
+            "flashcards",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an educational assistant that creates effective flashcards for learning. Return a JSON array of objects with 'front' (question) and 'back' (answer) fields."
+                },
+                {
+                    "role": "user",
+                    "content": f"Create {count} flashcards to help learn about: {knowledge_point}"
+                }
+            ],
+            max_tokens=800,
+            temperature=0.4,
+            schema=FlashcardItem,
+            count=count,
+            bypass_cache=bypass_cache
+        )
+    
+    async def generate_flashcards_batch(
+        self,
+        knowledge_points: List[Dict],
+        count: int = 3,
+        batch_size: Optional[int] = None,
+        bypass_cache: bool = False
+    ) -> Dict[int, List[Dict[str, str]]]:
+        """Generate flashcards for many knowledge points.
+        
+        ``knowledge_points`` are dicts with 'id', 'title' and optionally
+        'description'. Several points are packed into each prompt and the
+        batches run concurrently. Returns the valid cards per knowledge point
+        id; points whose batch failed are missing from the result. If every
+        batch failed, the first error is raised.
+        """
+        batch_size = batch_size or settings.FLASHCARD_BATCH_SIZE
+        batches = [
+            knowledge_points[start:start + batch_size]
+            for start in range(0, len(knowledge_points), batch_size)
+        ]
+        
+        results = await asyncio.gather(
+            *[self._generate_flashcard_batch(batch, count, bypass_cache) for batch in batches],
+            return_exceptions=True
+        )
+        
+        flashcards = {}
+        errors = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                print(f"Error generating flashcards for knowledge points {[point['id'] for point in batch]}: {result}")
+                errors.append(result)
+            else:
+                flashcards.update(result)
+        
+        # With nothing to show, let the caller see why
+        if errors and not flashcards:
+            raise errors[0]
+        return flashcards
+    
+    async def _generate_flashcard_batch(
+        self,
+        batch: List[Dict],
+        count: int,
+        bypass_cache: bool = False
+    ) -> Dict[int, List[Dict[str, str]]]:
+        flashcards = await self._complete_flashcard_batch(batch, count, bypass_cache)
+        
+        for _ in range(settings.LLM_REPAIR_ATTEMPTS):
+            # Ask again only for the points that came back short
+            short = defaultdict(list)
+            for point in batch:
+                missing = count - len(flashcards[point["id"]])
+                if missing > 0:
+                    short[missing].append(point)
+            if not short:
+                break
             
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error explaining concept: {e}")
-            return "Explanation generation failed"
+            results = await asyncio.gather(
+                *[self._complete_flashcard_batch(points, missing, bypass_cache) for missing, points in short.items()],
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Error asking again for flashcards: {result}")
+                    continue
+                for knowledge_point_id, cards in result.items():
+                    flashcards[knowledge_point_id].extend(cards)
+        
+        return flashcards
+    
+    async def _complete_flashcard_batch(
+        self,
+        batch: List[Dict],
+        count: int,
+        bypass_cache: bool = False
+    ) -> Dict[int, List[Dict[str, str]]]:
+        listing = "\n".join(
+            f"{point['id']}: {point['title']}" + (f" - {point['description']}" if point.get("description") else "")
+            for point in batch
+        )
+        return await self._chat(
+            "flashcards",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an educational assistant that creates effective flashcards for learning. Return a JSON array of objects with 'knowledge_point_id' (the number before the knowledge point), 'front' (question) and 'back' (answer) fields."
+                },
+                {
+                    "role": "user",
+                    "content": f"Create {count} flashcards for each of these knowledge points:\n\n{listing}"
+                }
+            ],
+            max_tokens=min(FLASHCARD_TOKENS_PER_CARD * count * len(batch), settings.FLASHCARD_BATCH_MAX_TOKENS),
+            temperature=0.4,
+            bypass_cache=bypass_cache,
+            parse=lambda content: self._parse_flashcard_batch(content, [point["id"] for point in batch], count)
+        )
+    
+    @staticmethod
+    def _parse_flashcard_batch(content: str, knowledge_point_ids: List[int], count: int) -> Dict[int, List[Dict[str, str]]]:
+        """Validate a batch response, keeping well-formed cards for requested points"""
+        elements, _ = parse_json_array(content)
+        
+        flashcards = {id: [] for id in knowledge_point_ids}
+        for element in elements:
+            try:
+                card = BatchFlashcardItem.model_validate(element)
+            except ValidationError:
+                continue
+            cards = flashcards.get(card.knowledge_point_id)
+            if cards is None or len(cards) >= count:
+                continue
+            cards.append({"front": card.front, "back": card.back})
+        
+        if not any(flashcards.values()):
+            raise LLMResponseError("No valid flashcards in response")
+        return flashcards
+    
+    async def explain_concept(
+        self,
+        concept: str,
+        context: str = "",
+        user_level: str = "intermediate",
+        bypass_cache: bool = False
+    ) -> str:
+        """Provide an explanation of a concept"""
+        return await self._chat(
+            "explanation",
+            messages=self._explanation_messages(concept, context, user_level),
+            max_tokens=600,
+            temperature=0.5,
+            bypass_cache=bypass_cache
+        )
     
-    async def generate_exercises(self, topic: str, difficulty: str = "intermediate", count: int = 3) -> List[Dict]:
+    def stream_explain_concept(
+        self,
+        concept: str,
+        context: str = "",
+        user_level: str = "intermediate",
+        bypass_cache: bool = False
+    ) -> AsyncIterator[str]:
+        """Stream an explanation of a concept as it is generated"""
+        return self._chat_stream(
+            "explanation",
+            messages=self._explanation_messages(concept, context, user_level),
+            max_tokens=600,
+            temperature=0.5,
+            bypass_cache=bypass_cache
+        )
+    
+    @staticmethod
+    def _explanation_messages(concept: str, context: str, user_level: str) -> List[Dict[str, str]]:
+        system_prompt = f"You are a helpful tutor explaining concepts at a {user_level} level. Provide clear, engaging explanations."
+        user_prompt = f"Explain this concept: {concept}"
+        
+        if context:
+            user_prompt += f"\n\nContext: {context}"
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    async def generate_exercises(
+        self,
+        topic: str,
+        difficulty: str = "intermediate",
+        count: int = 3,
+        bypass_cache: bool = False
+    ) -> List[Dict]:
         """Generate practice exercises for a topic"""
-        try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are an educational assistant creating {difficulty} level practice exercises. Return a JSON array of objects with 'question', 'options' (for multiple choice), 'correct_answer', and 'explanation' fields."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Create {count} {difficulty} level exercises about: {topic}"
-                    }
-                ],
-                max_tokens=1200,
-                temperature=0.4
-            )
-            
-            import json
-            exercises = json.loads(response.choices[0].message.content)
-            return exercises
-        except Exception as e:
-            print(f"Error generating exercises: {e}")
-            return []
\ No newline at end of file
+        return await self._chat_items(
+            "exercises",
+            messages=[
+                {
+                    "role": "system",
+                    "content": f"You are an educational assistant creating {difficulty} level practice exercises. Return a JSON array of objects with 'question', 'options' (for multiple choice), 'correct_answer', and 'explanation' fields."
+                },
+                {
+                    "role": "user",
+                    "content": f"Create {count} {difficulty} level exercises about: {topic}"
+                }
+            ],
+            max_tokens=1200,
+            temperature=0.4,
+            schema=ExerciseItem,
+            count=count,
+            bypass_cache=bypass_cache
+        )
\ No newline at end of file
@@ -0,0 +1,107 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import asyncio
+import time
+
+from app.config import settings
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate_per_minute``.
+
+    The bucket holds at most ``capacity`` tokens (a minute's worth by
+    default). Waiters are served in arrival order, so a large request is not
+    starved by a stream of small ones.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_minute / 60
+        )
+        self._updated_at = now
+
+    async def acquire(self, amount: float = 1):
+        # A request larger than the bucket could never be served otherwise
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) * 60 / self.rate_per_minute)
+
+    def refund(self, amount: float):
+        """Return tokens that were reserved but not used"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+class RateLimitUsage:
+    """Lets a caller report how many tokens a request actually used"""
+
+    def __init__(self, reserved: int):
+        self.reserved = reserved
+        self.used: Optional[int] = None
+
+    def report(self, tokens: int):
+        self.used = tokens
+
+class LLMRateLimiter:
+    """Limits LLM calls by concurrency, requests per minute and tokens per minute.
+
+    Limits left unset are read from ``Settings``; a rate of 0 disables that
+    bucket. Token reservations are an estimate (prompt plus ``max_tokens``)
+    and the unused part is refunded once the provider reports actual usage.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None
+    ):
+        self._max_concurrency = max_concurrency
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _setting(self, value: Optional[int], name: str) -> int:
+        return getattr(settings, name) if value is None else value
+
+    def _bind(self):
+        # Locks and semaphores belong to one event loop; rebuild them when
+        # used from a new one (e.g. separate asyncio.run calls)
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self._setting(self._max_concurrency, "LLM_MAX_CONCURRENCY"))
+        requests_per_minute = self._setting(self._requests_per_minute, "LLM_REQUESTS_PER_MINUTE")
+        tokens_per_minute = self._setting(self._tokens_per_minute, "LLM_TOKENS_PER_MINUTE")
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+
+    @asynccontextmanager
+    async def limit(self, tokens: int) -> AsyncIterator[RateLimitUsage]:
+        """Hold a concurrency slot and reserve one request and ``tokens`` tokens"""
+        self._bind()
+        usage = RateLimitUsage(tokens)
+        async with self._semaphore:
+            if self._requests is not None:
+                await self._requests.acquire(1)
+            if self._tokens is not None:
+                await self._tokens.acquire(tokens)
+            try:
+                yield usage
+            finally:
+                if self._tokens is not None and usage.used is not None and usage.used < tokens:
+                    self._tokens.refund(tokens - usage.used)
+
+llm_rate_limiter = LLMRateLimiter()
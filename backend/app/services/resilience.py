@@ -0,0 +1,211 @@
+from collections import deque
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+import asyncio
+import random
+import time
+
+from app.config import settings
+from app.services.llm_errors import LLMError, LLMProviderError, LLMUnavailableError
+
+T = TypeVar("T")
+
+def backoff_delay(retries: int, base: float, cap: float, rng: random.Random = random) -> float:
+    """Exponential backoff with full jitter, so retrying clients spread out"""
+    return rng.uniform(0, min(cap, base * 2 ** retries))
+
+class CircuitBreaker:
+    """Fails calls fast while the provider keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls raise ``LLMUnavailableError`` for ``reset_timeout`` seconds. Then
+    a single trial call is let through: success closes the circuit again,
+    failure reopens it. A threshold of 0 disables the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def failure_threshold(self) -> int:
+        return settings.LLM_CIRCUIT_FAILURE_THRESHOLD if self._failure_threshold is None else self._failure_threshold
+
+    @property
+    def reset_timeout(self) -> float:
+        return settings.LLM_CIRCUIT_RESET_TIMEOUT if self._reset_timeout is None else self._reset_timeout
+
+    def before_call(self):
+        """Raise ``LLMUnavailableError`` unless a call may go ahead"""
+        if self.failure_threshold <= 0:
+            return
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.reset_timeout - self.clock()
+            if remaining > 0:
+                raise LLMUnavailableError("LLM provider circuit is open", retry_after=remaining)
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                raise LLMUnavailableError("LLM provider circuit is half open", retry_after=self.reset_timeout)
+            self._probing = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold > 0:
+            self.state = self.OPEN
+            self._opened_at = self.clock()
+
+    def record_error(self, error: LLMError):
+        """A call failed; only errors worth retrying say the provider is unhealthy.
+
+        A rejected request (bad input, context too long, auth) was answered,
+        so it must not open the circuit for every other user.
+        """
+        if error.retryable:
+            self.record_failure()
+        else:
+            self.release()
+
+    def release(self):
+        """The call ended without telling anything about the provider (e.g. it was cancelled)"""
+        self._probing = False
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls"""
+
+    def __init__(self, window: int = 500):
+        self._samples = deque(maxlen=window)
+
+    def observe(self, latency: float):
+        self._samples.append(latency)
+
+    def percentile(self, percentile: float, min_samples: int = 1) -> Optional[float]:
+        if len(self._samples) < max(1, min_samples):
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(percentile / 100 * len(ordered)))]
+
+class ResilientCaller:
+    """Runs LLM requests with retries, optional hedging and a circuit breaker.
+
+    Provider errors marked retryable are retried up to ``max_retries``
+    times with jittered exponential backoff (or the provider's Retry-After,
+    if longer). With hedging enabled, a request still running after the
+    ``hedge_percentile`` latency of recent requests is duplicated and the
+    first response wins. Failures count towards the circuit breaker.
+    """
+
+    def __init__(
+        self,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        latencies: Optional[LatencyTracker] = None,
+        rng: Optional[random.Random] = None
+    ):
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = latencies or LatencyTracker()
+        self.rng = rng or random.Random()
+        self.hedged = 0
+
+    @property
+    def max_retries(self) -> int:
+        return settings.LLM_MAX_RETRIES if self._max_retries is None else self._max_retries
+
+    def retry_delay(self, error: Exception, retries: int) -> Optional[float]:
+        """Seconds to wait before retrying after ``error``, or None to give up"""
+        if not isinstance(error, LLMProviderError) or not error.retryable or retries >= self.max_retries:
+            return None
+        delay = backoff_delay(
+            retries,
+            settings.LLM_RETRY_BASE_DELAY if self._base_delay is None else self._base_delay,
+            settings.LLM_RETRY_MAX_DELAY if self._max_delay is None else self._max_delay,
+            self.rng
+        )
+        return max(delay, error.retry_after or 0)
+
+    def hedge_delay(self) -> Optional[float]:
+        hedge = settings.LLM_HEDGE_ENABLED if self._hedge is None else self._hedge
+        if not hedge:
+            return None
+        return self.latencies.percentile(settings.LLM_HEDGE_PERCENTILE, settings.LLM_HEDGE_MIN_SAMPLES)
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> Tuple[T, int]:
+        """Run ``attempt`` until it succeeds or gives up; returns its result and the retries it took"""
+        retries = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = await self._hedged(attempt)
+            except LLMProviderError as e:
+                self.breaker.record_error(e)
+                delay = self.retry_delay(e, retries)
+                if delay is None:
+                    raise
+                retries += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result, retries
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed(attempt)
+
+        tasks = {asyncio.ensure_future(self._timed(attempt))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                tasks.add(asyncio.ensure_future(self._timed(attempt)))
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The slower request is abandoned
+            for task in tasks:
+                task.cancel()
+
+    async def _timed(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        started = time.perf_counter()
+        result = await attempt()
+        self.latencies.observe(time.perf_counter() - started)
+        return result
+
+llm_resilience = ResilientCaller()
@@ -0,0 +1,80 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.flashcard import Flashcard, ReviewStatus
+from app.models.review_log import ReviewLog
+from app.models.review_stats import DailyReviewStats, ReviewStats
+from app.services.forecast_service import ForecastService
+from app.services.scheduler import Scheduler
+from app.utils.counters import add_counts
+
+STAT_FIELDS = ("reviews", "correct_reviews", "new_cards", "time_spent")
+LOG_FIELDS = (
+    "review_id", "user_id", "flashcard_id", "reviewed_at", "score", "time_spent", "previous_interval", "interval"
+)
+
+class ReviewService:
+    """Applies flashcard reviews and keeps their log and statistics.
+
+    Every review is appended to ``review_logs``. Per-user and per-day
+    totals, and the due forecast, are updated in the same transaction, so
+    they are read without scanning the log or the cards.
+    """
+
+    @staticmethod
+    def review(
+        scheduler: Scheduler,
+        flashcard: Flashcard,
+        score: int,
+        reviewed_at: datetime,
+        time_spent: Optional[int] = None,
+        review_id: Optional[str] = None
+    ) -> Dict:
+        """Apply a review to the card, returning its log entry for ``record``"""
+        previous_interval = flashcard.interval
+        new_card = flashcard.review_status in (None, ReviewStatus.NEW)
+        previous_due_date = flashcard.due_date
+        scheduler.review(flashcard, score, reviewed_at)
+        return {
+            "review_id": review_id,
+            "user_id": flashcard.user_id,
+            "flashcard_id": flashcard.id,
+            "reviewed_at": reviewed_at,
+            "score": score,
+            "time_spent": time_spent,
+            "previous_interval": previous_interval,
+            "interval": flashcard.interval,
+            "new_card": new_card,
+            "previous_due_date": previous_due_date,
+            "due_date": flashcard.due_date
+        }
+
+    @staticmethod
+    def record(db: Session, user_id: int, reviews: List[Dict]):
+        """Append reviews of one user to the log with a bulk INSERT and add them to the statistics and forecast"""
+        if not reviews:
+            return
+        db.execute(insert(ReviewLog), [
+            {column: review[column] for column in LOG_FIELDS}
+            for review in reviews
+        ])
+        ForecastService.apply(db, ForecastService.changes(
+            (user_id, review["previous_due_date"], review["due_date"]) for review in reviews
+        ))
+
+        daily = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+        for review in reviews:
+            counts = daily[review["reviewed_at"].date()]
+            counts["reviews"] += 1
+            counts["correct_reviews"] += review["score"] >= Scheduler.PASSING_SCORE
+            counts["new_cards"] += review["new_card"]
+            counts["time_spent"] += review["time_spent"] or 0
+
+        for day, counts in daily.items():
+            add_counts(db, DailyReviewStats, {"user_id": user_id, "day": day}, counts)
+        add_counts(db, ReviewStats, {"user_id": user_id}, {
+            field: sum(counts[field] for counts in daily.values()) for field in STAT_FIELDS
+        })
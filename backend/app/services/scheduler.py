@@ -0,0 +1,358 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.flashcard import Flashcard, ReviewStatus
+from app.models.review_log import ReviewLog
+from app.services.forecast_service import ForecastService
+
+STATUSES = list(ReviewStatus)
+NEW = STATUSES.index(ReviewStatus.NEW)
+REVIEW = STATUSES.index(ReviewStatus.REVIEW)
+RELEARNING = STATUSES.index(ReviewStatus.RELEARNING)
+
+DAY = 86400.0  # Seconds
+
+def to_seconds(value: Optional[datetime]) -> float:
+    """Seconds since the epoch of a naive UTC datetime, NaN for None"""
+    if value is None:
+        return np.nan
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+def to_datetimes(seconds: np.ndarray) -> List[Optional[datetime]]:
+    """Naive UTC datetimes for seconds since the epoch, None for NaN"""
+    stamps = np.where(np.isnan(seconds), 0, np.round(seconds * 1e6)).astype("int64").astype("datetime64[us]")
+    return [None if missing else stamp for missing, stamp in zip(np.isnan(seconds).tolist(), stamps.astype(object))]
+
+class Scheduler:
+    """A spaced repetition algorithm, applied to many cards at once.
+
+    Scheduling state is held in NumPy arrays with one entry per card, and
+    ``step`` applies one review to every card selected by a mask. Reviewing
+    a single card runs the same code on arrays of one, so a card replayed
+    from its review log ends up exactly where live reviews left it.
+    Subclasses keep their own state in ``columns`` of ``Flashcard``.
+    Intervals are capped at ``REVIEW_MAXIMUM_INTERVAL`` days.
+    """
+
+    name = ""
+    columns: Tuple[str, ...] = ()
+    PASSING_SCORE = 3
+
+    def __init__(self, relearn_delay: timedelta = timedelta(minutes=10), maximum_interval: Optional[int] = None):
+        self.relearn_delay = relearn_delay.total_seconds()
+        self._maximum_interval = maximum_interval
+
+    @property
+    def maximum_interval(self) -> int:
+        return settings.REVIEW_MAXIMUM_INTERVAL if self._maximum_interval is None else self._maximum_interval
+
+    def initial_state(self, size: int) -> Dict[str, np.ndarray]:
+        """State of ``size`` cards that have never been reviewed"""
+        return {
+            "review_status": np.full(size, NEW, dtype=np.int64),
+            "repetitions": np.zeros(size, dtype=np.int64),
+            "interval": np.ones(size, dtype=np.int64),
+            "total_reviews": np.zeros(size, dtype=np.int64),
+            "correct_reviews": np.zeros(size, dtype=np.int64),
+            "last_review_score": np.zeros(size, dtype=np.int64),
+            "due_date": np.full(size, np.nan),
+            "last_reviewed": np.full(size, np.nan),
+            "first_reviewed": np.full(size, np.nan),
+        }
+
+    def load(self, flashcards: Sequence[Flashcard]) -> Dict[str, np.ndarray]:
+        """State of existing cards"""
+        state = self.initial_state(len(flashcards))
+        for index, flashcard in enumerate(flashcards):
+            state["review_status"][index] = STATUSES.index(ReviewStatus(flashcard.review_status or ReviewStatus.NEW))
+            for column in ("repetitions", "interval", "total_reviews", "correct_reviews", "last_review_score"):
+                value = getattr(flashcard, column)
+                if value is not None:
+                    state[column][index] = value
+            for column in ("due_date", "last_reviewed", "first_reviewed"):
+                state[column][index] = to_seconds(getattr(flashcard, column))
+        return state
+
+    def store(self, state: Dict[str, np.ndarray], index: int, flashcard: Flashcard):
+        for column, value in self.row(state, index).items():
+            setattr(flashcard, column, value)
+
+    def row(self, state: Dict[str, np.ndarray], index: int) -> Dict:
+        """The ``Flashcard`` columns of one card's state"""
+        return self.rows(state, np.array([index]))[0]
+
+    def rows(self, state: Dict[str, np.ndarray], indexes: np.ndarray) -> List[Dict]:
+        """``Flashcard`` columns of the selected cards, as dicts for a bulk update"""
+        columns = {
+            column: state[column][indexes].tolist()
+            for column in ("repetitions", "interval", "total_reviews", "correct_reviews", "last_review_score")
+            + self.columns
+        }
+        columns["review_status"] = [STATUSES[code] for code in state["review_status"][indexes].tolist()]
+        for column in ("due_date", "last_reviewed", "first_reviewed"):
+            columns[column] = to_datetimes(state[column][indexes])
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def review(self, flashcard: Flashcard, score: int, reviewed_at: datetime) -> Flashcard:
+        """Apply one review, made at ``reviewed_at``, to the card's statistics and schedule"""
+        state = self.load([flashcard])
+        self.step(state, np.array([True]), np.array([score]), np.array([to_seconds(reviewed_at)]))
+        self.store(state, 0, flashcard)
+        return flashcard
+
+    def replay(self, scores: np.ndarray, times: np.ndarray, counts: np.ndarray) -> Dict[str, np.ndarray]:
+        """State of cards after their review histories.
+
+        Row ``i`` of ``scores`` and ``times`` holds the first ``counts[i]``
+        reviews of card ``i`` in order; the rest is padding.
+        """
+        state = self.initial_state(len(counts))
+        for position in range(scores.shape[1]):
+            self.step(state, position < counts, scores[:, position], times[:, position])
+        return state
+
+    def step(self, state: Dict[str, np.ndarray], active: np.ndarray, scores: np.ndarray, times: np.ndarray):
+        """Apply a review at ``times`` with ``scores`` to the ``active`` cards"""
+        passed = scores >= self.PASSING_SCORE
+        # The algorithm sees the state before this review
+        changes = self.schedule(state, passed, scores, times)
+        changes["repetitions"] = np.where(passed, state["repetitions"] + 1, 0)
+        changes["review_status"] = np.where(passed, REVIEW, RELEARNING)
+        changes["first_reviewed"] = np.where(state["review_status"] == NEW, times, state["first_reviewed"])
+        changes["total_reviews"] = state["total_reviews"] + 1
+        changes["correct_reviews"] = state["correct_reviews"] + passed
+        changes["last_review_score"] = scores
+        changes["last_reviewed"] = times
+        for column, value in changes.items():
+            state[column] = np.where(active, value, state[column])
+
+    def schedule(
+        self,
+        state: Dict[str, np.ndarray],
+        passed: np.ndarray,
+        scores: np.ndarray,
+        times: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """New ``interval``, ``due_date`` and algorithm columns for a review"""
+        raise NotImplementedError
+
+class SM2Scheduler(Scheduler):
+    """SuperMemo 2 spaced repetition.
+
+    A score of 3 or more (on the 1-5 scale) counts as recalled and grows
+    the interval by the card's ease factor; a lower score sends the card
+    back to relearning.
+    """
+
+    name = "sm2"
+    columns = ("ease_factor",)
+
+    def __init__(self, initial_ease: float = 2.5, minimum_ease: float = 1.3, **kwargs):
+        super().__init__(**kwargs)
+        self.initial_ease = initial_ease
+        self.minimum_ease = minimum_ease
+
+    def initial_state(self, size: int) -> Dict[str, np.ndarray]:
+        state = super().initial_state(size)
+        state["ease_factor"] = np.full(size, self.initial_ease)
+        return state
+
+    def load(self, flashcards: Sequence[Flashcard]) -> Dict[str, np.ndarray]:
+        state = super().load(flashcards)
+        for index, flashcard in enumerate(flashcards):
+            if flashcard.ease_factor is not None:
+                state["ease_factor"][index] = flashcard.ease_factor
+        return state
+
+    def schedule(self, state, passed, scores, times):
+        repetitions = state["repetitions"] + 1
+        interval = np.where(
+            passed,
+            np.where(
+                repetitions == 1, 1,
+                np.where(
+                    repetitions == 2, 6,
+                    np.minimum(np.floor(state["interval"] * state["ease_factor"]), self.maximum_interval)
+                )
+            ),
+            1
+        ).astype(np.int64)
+        ease_factor = np.where(
+            passed,
+            np.maximum(self.minimum_ease, state["ease_factor"] + (0.1 - (5 - scores) * (0.08 + (5 - scores) * 0.02))),
+            state["ease_factor"]
+        )
+        return {
+            "interval": interval,
+            "ease_factor": ease_factor,
+            "due_date": times + np.where(passed, interval * DAY, self.relearn_delay)
+        }
+
+class FSRSScheduler(Scheduler):
+    """Free Spaced Repetition Scheduler (FSRS-4.5).
+
+    Each card has a memory stability (days until recall probability falls
+    to 90%) and a difficulty between 1 and 10. Intervals are chosen so
+    recall probability is ``desired_retention`` when the card comes due.
+    Scores map to FSRS ratings as 1-2 Again, 3 Hard, 4 Good and 5 Easy.
+    Cards first reviewed under another algorithm start from a stability
+    of their current interval and the default difficulty.
+    """
+
+    name = "fsrs"
+    columns = ("stability", "difficulty")
+
+    WEIGHTS = (
+        0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+        0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755
+    )
+    DECAY = -0.5
+    FACTOR = 0.9 ** (1 / DECAY) - 1
+
+    def __init__(self, weights: Sequence[float] = WEIGHTS, desired_retention: Optional[float] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.w = np.asarray(weights, dtype=float)
+        self._desired_retention = desired_retention
+
+    @property
+    def desired_retention(self) -> float:
+        return settings.FSRS_DESIRED_RETENTION if self._desired_retention is None else self._desired_retention
+
+    def initial_state(self, size: int) -> Dict[str, np.ndarray]:
+        state = super().initial_state(size)
+        state["stability"] = np.full(size, np.nan)
+        state["difficulty"] = np.full(size, np.nan)
+        return state
+
+    def load(self, flashcards: Sequence[Flashcard]) -> Dict[str, np.ndarray]:
+        state = super().load(flashcards)
+        for index, flashcard in enumerate(flashcards):
+            if flashcard.stability is not None and flashcard.difficulty is not None:
+                state["stability"][index] = flashcard.stability
+                state["difficulty"][index] = flashcard.difficulty
+            elif state["review_status"][index] != NEW:
+                state["stability"][index] = state["interval"][index]
+                state["difficulty"][index] = self.w[4]
+        return state
+
+    def schedule(self, state, passed, scores, times):
+        w = self.w
+        rating = np.clip(scores - 1, 1, 4)
+        new = state["review_status"] == NEW
+        # Keep the math finite for new cards, whose results are replaced below
+        stability = np.where(new, 1.0, state["stability"])
+        difficulty = np.where(new, w[4], state["difficulty"])
+
+        elapsed = np.maximum(0, np.nan_to_num(times - state["last_reviewed"]) / DAY)
+        retrievability = (1 + self.FACTOR * elapsed / stability) ** self.DECAY
+
+        next_difficulty = difficulty - w[6] * (rating - 3)
+        next_difficulty = np.clip(w[7] * w[4] + (1 - w[7]) * next_difficulty, 1, 10)
+        recalled = stability * (
+            1
+            + np.exp(w[8])
+            * (11 - next_difficulty)
+            * stability ** -w[9]
+            * (np.exp(w[10] * (1 - retrievability)) - 1)
+            * np.where(rating == 2, w[15], 1)
+            * np.where(rating == 4, w[16], 1)
+        )
+        forgotten = np.minimum(
+            stability,
+            w[11] * next_difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * np.exp(w[14] * (1 - retrievability))
+        )
+        next_stability = np.where(rating == 1, forgotten, recalled)
+
+        initial_stability = w[rating - 1]
+        initial_difficulty = np.clip(w[4] - (rating - 3) * w[5], 1, 10)
+        next_stability = np.where(new, initial_stability, next_stability)
+        next_difficulty = np.where(new, initial_difficulty, next_difficulty)
+
+        interval = np.clip(
+            np.round(next_stability / self.FACTOR * (self.desired_retention ** (1 / self.DECAY) - 1)),
+            1,
+            self.maximum_interval
+        )
+        interval = np.where(passed, interval, 1).astype(np.int64)
+        return {
+            "interval": interval,
+            "stability": next_stability,
+            "difficulty": next_difficulty,
+            "due_date": times + np.where(passed, interval * DAY, self.relearn_delay)
+        }
+
+SCHEDULERS = {scheduler.name: scheduler for scheduler in (SM2Scheduler(), FSRSScheduler())}
+
+def get_scheduler(name: Optional[str] = None) -> Scheduler:
+    """The scheduler called ``name``, by default ``SCHEDULING_ALGORITHM``"""
+    return SCHEDULERS[name or settings.SCHEDULING_ALGORITHM]
+
+def reschedule(
+    db: Session,
+    scheduler: Scheduler,
+    user_id: Optional[int] = None,
+    batch_size: Optional[int] = None
+) -> Dict[str, int]:
+    """Recompute the schedules of reviewed cards from their review logs.
+
+    Cards are read in batches of ``RESCHEDULE_BATCH_SIZE`` by id; each
+    batch is replayed in one vectorized pass and written back with a bulk
+    UPDATE, moving the cards in the due forecast. Cards whose log doesn't
+    hold every review they had are left as they are. Committing is up to
+    the caller.
+
+    Returns how many cards were rescheduled and skipped.
+    """
+    batch_size = batch_size or settings.RESCHEDULE_BATCH_SIZE
+    rescheduled = skipped = 0
+    last_id = 0
+    while True:
+        query = select(Flashcard.id, Flashcard.user_id, Flashcard.total_reviews, Flashcard.due_date).where(
+            Flashcard.id > last_id,
+            Flashcard.total_reviews > 0
+        )
+        if user_id is not None:
+            query = query.where(Flashcard.user_id == user_id)
+        cards = db.execute(query.order_by(Flashcard.id).limit(batch_size)).all()
+        if not cards:
+            break
+        last_id = cards[-1].id
+
+        ids = np.array([card.id for card in cards])
+        logs = db.execute(
+            select(ReviewLog.flashcard_id, ReviewLog.score, ReviewLog.reviewed_at)
+            .where(ReviewLog.flashcard_id.in_(ids.tolist()))
+            .order_by(ReviewLog.flashcard_id, ReviewLog.reviewed_at, ReviewLog.id)
+        ).all()
+        card_index = np.searchsorted(ids, np.array([log.flashcard_id for log in logs], dtype=np.int64))
+        counts = np.bincount(card_index, minlength=len(ids))
+        complete = counts == np.array([card.total_reviews for card in cards])
+
+        # Lay each card's reviews out in its own row
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        position = np.arange(len(logs)) - starts[card_index]
+        width = int(counts.max()) if len(logs) else 0
+        scores = np.zeros((len(ids), width), dtype=np.int64)
+        times = np.zeros((len(ids), width))
+        scores[card_index, position] = [log.score for log in logs]
+        times[card_index, position] = [to_seconds(log.reviewed_at) for log in logs]
+
+        indexes = np.flatnonzero(complete)
+        if len(indexes):
+            state = scheduler.replay(scores[indexes], times[indexes], counts[indexes])
+            rows = scheduler.rows(state, np.arange(len(indexes)))
+            for row, index in zip(rows, indexes.tolist()):
+                row["id"] = cards[index].id
+            db.execute(update(Flashcard), rows)
+            ForecastService.apply(db, ForecastService.changes(
+                (cards[index].user_id, cards[index].due_date, row["due_date"]) for row, index in zip(rows, indexes.tolist())
+            ))
+        rescheduled += len(indexes)
+        skipped += len(ids) - len(indexes)
+    return {"rescheduled": rescheduled, "skipped": skipped}
@@ -0,0 +1,99 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import time
+import uuid
+
+from app.config import settings
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    Within a process, callers arriving while a call for the same key is
+    running await that call's result instead of starting their own. The call
+    runs as its own task, so a caller that goes away does not cancel it for
+    the others.
+
+    Across processes, a Redis ``SET NX`` lock elects one leader per key when
+    ``LLM_SINGLE_FLIGHT_SHARED`` is enabled. Other processes poll for the
+    leader's result (``poll`` reads it from a shared store, typically the LLM
+    cache) and only run the call themselves once the lock is released or has
+    expired without a result.
+    """
+
+    def __init__(self, shared=None):
+        self._shared = shared
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    @property
+    def shared(self):
+        if self._shared is None and settings.LLM_SINGLE_FLIGHT_SHARED:
+            import redis.asyncio as redis
+            self._shared = redis.from_url(settings.REDIS_URL, decode_responses=True)
+        return self._shared
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        poll: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn, poll))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller went away
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[Any]], poll) -> Any:
+        shared = self.shared if poll is not None else None
+        if shared is None:
+            return await fn()
+
+        lock_key = f"{key}:lock"
+        token = str(uuid.uuid4())
+        try:
+            acquired = await shared.set(lock_key, token, nx=True, ex=settings.LLM_SINGLE_FLIGHT_LOCK_TTL)
+        except Exception as e:
+            print(f"Error acquiring single-flight lock: {e}")
+            return await fn()
+
+        if acquired:
+            try:
+                return await fn()
+            finally:
+                await self._release(shared, lock_key, token)
+
+        deadline = time.monotonic() + settings.LLM_SINGLE_FLIGHT_LOCK_TTL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.LLM_SINGLE_FLIGHT_POLL_INTERVAL)
+            result = await poll()
+            if result is not None:
+                return result
+            try:
+                if await shared.get(lock_key) is None:
+                    break  # The leader finished without a result or gave up
+            except Exception as e:
+                print(f"Error checking single-flight lock: {e}")
+                break
+
+        return await fn()
+
+    @staticmethod
+    async def _release(shared, lock_key: str, token: str):
+        try:
+            # Only release our own lock; it may have expired and been retaken
+            if await shared.get(lock_key) == token:
+                await shared.delete(lock_key)
+        except Exception as e:
+            print(f"Error releasing single-flight lock: {e}")
+
+llm_single_flight = SingleFlight()
@@ -0,0 +1,157 @@
+from typing import Dict, Optional, Tuple
+import hashlib
+import os
+import uuid
+import aiofiles
+from fastapi import UploadFile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.document import DocumentBlob
+from app.config import settings
+
+class FileTooLargeError(Exception):
+    """Raised when an upload grows past the allowed size while streaming"""
+    pass
+
+class StorageService:
+    @staticmethod
+    async def save_upload(
+        file: UploadFile,
+        destination: str,
+        max_size: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ) -> Dict:
+        """Stream an upload to disk in fixed-size chunks.
+
+        Bytes are written to a temporary file next to ``destination`` and the
+        file is renamed into place only once the whole upload has been read,
+        so a half-written file is never visible under its final name. The
+        size and SHA-256 content hash are computed as the chunks arrive.
+        """
+        max_size = max_size or settings.MAX_FILE_SIZE
+        chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+
+        directory = os.path.dirname(destination) or "."
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f".{uuid.uuid4()}.part")
+
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(temp_path, "wb") as buffer:
+                while True:
+                    chunk = await file.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLargeError(f"File exceeds {max_size} bytes")
+                    hasher.update(chunk)
+                    await buffer.write(chunk)
+            os.replace(temp_path, destination)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return {
+            "file_path": destination,
+            "file_size": size,
+            "content_hash": hasher.hexdigest()
+        }
+
+    @staticmethod
+    def blob_path(content_hash: str, extension: str = "") -> str:
+        """Content-addressed location of a blob, fanned out by hash prefix"""
+        return os.path.join(
+            settings.UPLOAD_DIR, "blobs", content_hash[:2], f"{content_hash}{extension}"
+        )
+    
+    @staticmethod
+    async def store_upload(file: UploadFile, db: Session, extension: str = "") -> Tuple[DocumentBlob, bool]:
+        """Stream an upload into content-addressed storage.
+        
+        Returns the blob holding the content and whether it already existed.
+        The blob's reference count is incremented for the caller; release it
+        with ``release_blob`` when the referencing document goes away.
+        """
+        incoming_path = os.path.join(settings.UPLOAD_DIR, "incoming", f"{uuid.uuid4()}{extension}")
+        stored = await StorageService.save_upload(file, incoming_path)
+        try:
+            return StorageService.add_blob_reference(db, stored, extension)
+        finally:
+            if os.path.exists(incoming_path):
+                os.remove(incoming_path)
+    
+    @staticmethod
+    def add_blob_reference(db: Session, stored: Dict, extension: str = "") -> Tuple[DocumentBlob, bool]:
+        """Reference the blob for a freshly saved file, creating it if needed.
+        
+        ``stored`` is the result of ``save_upload``. The saved file is moved
+        into the blob store only when no blob exists for its content yet.
+        """
+        content_hash = stored["content_hash"]
+        
+        blob = db.query(DocumentBlob).filter(DocumentBlob.content_hash == content_hash).first()
+        if blob is not None:
+            updated = db.query(DocumentBlob).filter(DocumentBlob.id == blob.id).update(
+                {DocumentBlob.ref_count: DocumentBlob.ref_count + 1},
+                synchronize_session=False
+            )
+            if updated:
+                db.refresh(blob)
+                if not os.path.exists(blob.file_path):
+                    StorageService._move_into_place(stored["file_path"], blob.file_path)
+                return blob, True
+        
+        blob_path = StorageService.blob_path(content_hash, extension)
+        StorageService._move_into_place(stored["file_path"], blob_path)
+        blob = DocumentBlob(
+            content_hash=content_hash,
+            file_path=blob_path,
+            file_size=stored["file_size"],
+            ref_count=1
+        )
+        try:
+            with db.begin_nested():
+                db.add(blob)
+        except IntegrityError:
+            # Another upload created the same blob concurrently
+            blob = db.query(DocumentBlob).filter(DocumentBlob.content_hash == content_hash).first()
+            db.query(DocumentBlob).filter(DocumentBlob.id == blob.id).update(
+                {DocumentBlob.ref_count: DocumentBlob.ref_count + 1},
+                synchronize_session=False
+            )
+            db.refresh(blob)
+            return blob, True
+        
+        return blob, False
+    
+    @staticmethod
+    def release_blob(db: Session, content_hash: str) -> Optional[str]:
+        """Drop one reference to a blob.
+        
+        When no references remain the blob row is deleted and its file path
+        is returned; the caller removes the file once the transaction has
+        been committed.
+        """
+        blob = db.query(DocumentBlob).filter(DocumentBlob.content_hash == content_hash).first()
+        if blob is None:
+            return None
+        
+        db.query(DocumentBlob).filter(DocumentBlob.id == blob.id).update(
+            {DocumentBlob.ref_count: DocumentBlob.ref_count - 1},
+            synchronize_session=False
+        )
+        db.refresh(blob)
+        if blob.ref_count > 0:
+            return None
+        
+        db.delete(blob)
+        return blob.file_path
+    
+    @staticmethod
+    def _move_into_place(source: str, destination: str):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(source, destination)
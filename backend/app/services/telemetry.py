@@ -0,0 +1,224 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import asyncio
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.llm_usage import LLMUsage
+from app.utils.counters import add_counts
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # Seconds
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+USAGE_FIELDS = ("calls", "cache_hits", "errors", "retries", "prompt_tokens", "completion_tokens", "latency_ms", "cost")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple, float] = defaultdict(float)
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        self._values[labels] += amount
+
+    def value(self, labels: Tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self._counts: Dict[Tuple, list] = {}
+        self._sums: Dict[Tuple, float] = defaultdict(float)
+
+    def observe(self, labels: Tuple, value: float):
+        counts = self._counts.setdefault(labels, [0] * (len(self.buckets) + 1))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+        self._sums[labels] += value
+
+    def count(self, labels: Tuple = ()) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_format_labels(self.labels + ('le',), labels + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {self._sums[labels]}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+class LLMTelemetry:
+    """Records every LLM call as metrics and per-user daily usage.
+
+    Metrics are kept in process and rendered in the Prometheus text format.
+    Usage is aggregated in memory per (user, day, method, model) and added
+    to the ``llm_usage`` table by ``flush``, which runs periodically in the
+    background, so calls never wait on a database write.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, Dict[str, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        labels = ("method", "model")
+        self.requests = Counter("llm_requests_total", "LLM calls by outcome", labels + ("outcome",))
+        self.errors = Counter("llm_errors_total", "Failed LLM calls by error class", labels + ("error",))
+        self.retries = Counter("llm_retries_total", "Retried LLM requests", labels)
+        self.cost = Counter("llm_cost_usd_total", "Estimated LLM spend in USD", labels)
+        self.latency = Histogram("llm_request_duration_seconds", "LLM call latency", LATENCY_BUCKETS, labels + ("outcome",))
+        self.prompt_tokens = Histogram("llm_prompt_tokens", "Prompt tokens per LLM call", TOKEN_BUCKETS, labels)
+        self.completion_tokens = Histogram("llm_completion_tokens", "Completion tokens per LLM call", TOKEN_BUCKETS, labels)
+
+    @staticmethod
+    def estimate_cost(prompt_tokens: int, completion_tokens: int) -> float:
+        return (
+            prompt_tokens * settings.LLM_PROMPT_PRICE_PER_1K
+            + completion_tokens * settings.LLM_COMPLETION_PRICE_PER_1K
+        ) / 1000
+
+    def record(
+        self,
+        method: str,
+        model: str,
+        latency: float,
+        user_id: Optional[int] = None,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        retries: int = 0,
+        cache_hit: bool = False,
+        error: Optional[str] = None
+    ):
+        """Record one call; ``latency`` is in seconds, ``error`` an exception class name"""
+        outcome = "error" if error else "cache_hit" if cache_hit else "ok"
+        labels = (method, model)
+        cost = self.estimate_cost(prompt_tokens, completion_tokens)
+
+        self.requests.inc(labels + (outcome,))
+        self.latency.observe(labels + (outcome,), latency)
+        if error:
+            self.errors.inc(labels + (error,))
+        if retries:
+            self.retries.inc(labels, retries)
+        if not cache_hit and not error:
+            self.prompt_tokens.observe(labels, prompt_tokens)
+            self.completion_tokens.observe(labels, completion_tokens)
+        if cost:
+            self.cost.inc(labels, cost)
+
+        key = (user_id, datetime.utcnow().date(), method, model)
+        with self._lock:
+            usage = self._pending.setdefault(key, dict.fromkeys(USAGE_FIELDS, 0))
+            usage["calls"] += 1
+            usage["cache_hits"] += int(cache_hit)
+            usage["errors"] += int(error is not None)
+            usage["retries"] += retries
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+            usage["latency_ms"] += latency * 1000
+            usage["cost"] += cost
+
+    def flush(self, db: Session):
+        """Add the aggregated usage to the database"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        try:
+            for (user_id, day, method, model), usage in pending.items():
+                self._add_usage(db, user_id, day, method, model, usage)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Keep the usage for the next flush
+            with self._lock:
+                for key, usage in pending.items():
+                    current = self._pending.setdefault(key, dict.fromkeys(USAGE_FIELDS, 0))
+                    for field in USAGE_FIELDS:
+                        current[field] += usage[field]
+            raise
+
+    @staticmethod
+    def _add_usage(db: Session, user_id, day, method, model, usage: Dict[str, float]):
+        add_counts(db, LLMUsage, {"user_id": user_id, "day": day, "method": method, "model": model}, usage)
+
+    def tokens_used_today(self, db: Session, user_id: int) -> int:
+        """Tokens a user has spent today, flushed or not"""
+        today = datetime.utcnow().date()
+        stored = db.query(
+            func.coalesce(func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens), 0)
+        ).filter(LLMUsage.user_id == user_id, LLMUsage.day == today).scalar()
+        with self._lock:
+            pending = sum(
+                usage["prompt_tokens"] + usage["completion_tokens"]
+                for (pending_user, day, _, _), usage in self._pending.items()
+                if pending_user == user_id and day == today
+            )
+        return int(stored) + int(pending)
+
+    def render_metrics(self) -> str:
+        metrics = (
+            self.requests, self.errors, self.retries, self.cost,
+            self.latency, self.prompt_tokens, self.completion_tokens
+        )
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._flush_in_thread()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(settings.LLM_USAGE_FLUSH_INTERVAL)
+            try:
+                await self._flush_in_thread()
+            except Exception as e:
+                print(f"Error flushing LLM usage: {e}")
+
+    async def _flush_in_thread(self):
+        def flush():
+            db = self.session_factory()
+            try:
+                self.flush(db)
+            finally:
+                db.close()
+
+        await asyncio.get_running_loop().run_in_executor(None, flush)
+
+llm_telemetry = LLMTelemetry()
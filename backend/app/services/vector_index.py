@@ -0,0 +1,496 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import fcntl
+import hashlib
+import os
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.document import Document, ProcessingStatus
+from app.models.knowledge_point import KnowledgePoint
+from app.services.document_service import DocumentService
+from app.services.llm_providers import LLMProvider
+from app.services.llm_service import LLMService
+from app.utils.tokens import count_tokens
+
+class VectorIndex:
+    """Normalized embeddings of text passages, searched by cosine similarity.
+
+    Vectors live in one float32 matrix that grows by doubling, so inserts are
+    amortized O(1) and a search is a single matrix-vector product. Removing
+    a passage moves the last row into its slot.
+    """
+
+    def __init__(self, model: str = ""):
+        self.model = model
+        self.keys: List[str] = []
+        self.texts: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._positions
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:len(self.keys)]
+
+    def text(self, key: str) -> Optional[str]:
+        position = self._positions.get(key)
+        return None if position is None else self.texts[position]
+
+    def keys_with_prefix(self, prefix: str) -> List[str]:
+        return [key for key in self.keys if key.startswith(prefix)]
+
+    def upsert(self, keys: List[str], texts: List[str], vectors) -> None:
+        if not keys:
+            return
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32))
+        if self._vectors.shape[1] != vectors.shape[1]:
+            if self.keys:
+                raise ValueError(
+                    f"Expected {self._vectors.shape[1]}-dimensional vectors, got {vectors.shape[1]}"
+                )
+            self._vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+
+        for key, text, vector in zip(keys, texts, vectors):
+            position = self._positions.get(key)
+            if position is None:
+                position = len(self.keys)
+                self._reserve(position + 1)
+                self._positions[key] = position
+                self.keys.append(key)
+                self.texts.append(text)
+            else:
+                self.texts[position] = text
+            self._vectors[position] = vector
+
+    def remove(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            position = self._positions.pop(key, None)
+            if position is None:
+                continue
+            last = len(self.keys) - 1
+            if position != last:
+                moved = self.keys[last]
+                self.keys[position] = moved
+                self.texts[position] = self.texts[last]
+                self._vectors[position] = self._vectors[last]
+                self._positions[moved] = position
+            self.keys.pop()
+            self.texts.pop()
+
+    def search(self, vector, k: int, exclude: Iterable[str] = ()) -> List[Dict]:
+        """The ``k`` passages most similar to ``vector``, best first"""
+        if not self.keys or k <= 0:
+            return []
+        query = self._normalize(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        scores = self.vectors @ query
+        for key in exclude:
+            position = self._positions.get(key)
+            if position is not None:
+                scores[position] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {"key": self.keys[position], "text": self.texts[position], "score": float(scores[position])}
+            for position in top
+            if np.isfinite(scores[position])
+        ]
+
+    def save(self, path: str) -> None:
+        """Write a snapshot, replacing any previous one atomically"""
+        encoded = [text.encode("utf-8") for text in self.texts]
+        offsets = np.cumsum([0] + [len(text) for text in encoded], dtype=np.int64)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez(
+                file,
+                model=np.array(self.model),
+                keys=np.array(self.keys, dtype=str),
+                text_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                text_offsets=offsets,
+                vectors=self.vectors
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        with np.load(path) as data:
+            index = cls(str(data["model"]))
+            index.keys = data["keys"].tolist()
+            text_bytes = data["text_bytes"].tobytes()
+            offsets = data["text_offsets"].tolist()
+            index.texts = [
+                text_bytes[start:end].decode("utf-8")
+                for start, end in zip(offsets, offsets[1:])
+            ]
+            index._vectors = data["vectors"].astype(np.float32)
+        index._positions = {key: position for position, key in enumerate(index.keys)}
+        return index
+
+    def _reserve(self, size: int) -> None:
+        capacity = self._vectors.shape[0]
+        if size <= capacity:
+            return
+        vectors = np.zeros((max(size, capacity * 2, 64), self._vectors.shape[1]), dtype=np.float32)
+        vectors[:len(self.keys)] = self.vectors
+        self._vectors = vectors
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+class VectorStore:
+    """Per-user vector indexes over knowledge points and document passages.
+
+    Indexes are loaded lazily from snapshots in ``directory`` and the most
+    recently used ``max_users`` are kept in memory. A user without a
+    snapshot, or with one made by another embedding model, is indexed from
+    the database in the background; searches find nothing until then.
+    Updates only embed new or changed text and then rewrite the user's
+    snapshot.
+
+    Several API worker processes share the snapshots: a cached index is
+    reloaded whenever its snapshot was replaced by another process, and
+    updates are merged into the latest snapshot under a file lock.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_users: Optional[int] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        provider: Optional[LLMProvider] = None
+    ):
+        self._directory = directory
+        self._max_users = max_users
+        self.session_factory = session_factory
+        self.provider = provider
+        self._indexes: "OrderedDict[int, VectorIndex]" = OrderedDict()
+        self._versions: Dict[int, Tuple[int, int, int]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._builds: Dict[int, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def directory(self) -> str:
+        return settings.VECTOR_INDEX_DIR if self._directory is None else self._directory
+
+    @property
+    def max_users(self) -> int:
+        return settings.VECTOR_INDEX_MAX_USERS if self._max_users is None else self._max_users
+
+    @staticmethod
+    def knowledge_point_text(knowledge_point: KnowledgePoint) -> str:
+        parts = (knowledge_point.title, knowledge_point.description, knowledge_point.content)
+        return "\n".join(part for part in parts if part)
+
+    async def index_knowledge_point(self, user_id: int, knowledge_point_id: int, text: str) -> bool:
+        try:
+            await self._update(user_id, {f"kp:{knowledge_point_id}": text})
+            return True
+        except Exception as e:
+            print(f"Error indexing knowledge point {knowledge_point_id}: {e}")
+            return False
+
+    async def remove_knowledge_point(self, user_id: int, knowledge_point_id: int) -> bool:
+        try:
+            await self._update(user_id, {}, removed=[f"kp:{knowledge_point_id}"])
+            return True
+        except Exception as e:
+            print(f"Error removing knowledge point {knowledge_point_id} from index: {e}")
+            return False
+
+    async def index_document(self, user_id: int, document_id: int) -> bool:
+        """Index the stored text of a processed document, replacing its old passages"""
+        try:
+            passages = await asyncio.get_running_loop().run_in_executor(
+                None, self._read_document_passages, document_id
+            )
+            await self._update(user_id, passages, stale_prefix=f"doc:{document_id}:")
+            return True
+        except Exception as e:
+            print(f"Error indexing document {document_id}: {e}")
+            return False
+
+    async def remove_document(self, user_id: int, document_id: int) -> bool:
+        try:
+            await self._update(user_id, {}, stale_prefix=f"doc:{document_id}:")
+            return True
+        except Exception as e:
+            print(f"Error removing document {document_id} from index: {e}")
+            return False
+
+    async def build(self, user_id: int):
+        """Index the user's library from the database, or wait for the build in progress"""
+        await asyncio.shield(self._start_build(user_id))
+
+    async def search(
+        self,
+        user_id: int,
+        query: str,
+        k: Optional[int] = None,
+        exclude: Iterable[str] = ()
+    ) -> List[Dict]:
+        """The user's passages most similar to ``query``, as dicts with 'key', 'text' and 'score'.
+
+        Finds nothing while the user's index is still being built, rather
+        than embedding their whole library inside the request.
+        """
+        index = await self._index(user_id)
+        if index is None:
+            self._start_build(user_id)
+            return []
+        if not len(index):
+            return []
+        vector = (await LLMService(provider=self.provider, user_id=user_id).embed([query]))[0]
+        return index.search(vector, settings.RETRIEVAL_TOP_K if k is None else k, exclude)
+
+    async def retrieve_context(
+        self,
+        user_id: int,
+        query: str,
+        exclude: Iterable[str] = (),
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """The most relevant passages for ``query`` that fit in ``max_tokens``"""
+        max_tokens = settings.RETRIEVAL_CONTEXT_TOKENS if max_tokens is None else max_tokens
+        try:
+            passages = await self.search(user_id, query, exclude=exclude)
+        except Exception as e:
+            print(f"Error retrieving context: {e}")
+            return ""
+
+        selected = []
+        used = 0
+        for passage in passages:
+            tokens = count_tokens(passage["text"], settings.LLM_MODEL)
+            if used + tokens > max_tokens:
+                continue
+            selected.append(passage["text"])
+            used += tokens
+        return "\n\n".join(selected)
+
+    def _lock(self, user_id: int) -> asyncio.Lock:
+        # Locks and builds belong to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._locks = {}
+            self._builds = {}
+        return self._locks.setdefault(user_id, asyncio.Lock())
+
+    @asynccontextmanager
+    async def _snapshot_lock(self, user_id: int):
+        """Exclusive access to the user's snapshot across worker processes"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{user_id}.lock"), "a") as lock_file:
+            await asyncio.get_running_loop().run_in_executor(
+                None, fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX
+            )
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    async def _index(self, user_id: int) -> Optional[VectorIndex]:
+        """The user's index, reloaded if its snapshot changed; None until it has been built"""
+        version = self._snapshot_version(user_id)
+        index = self._indexes.get(user_id)
+        if index is not None and version in (None, self._versions.get(user_id)):
+            self._indexes.move_to_end(user_id)
+            return index
+        if version is None:
+            return None
+
+        index = await asyncio.get_running_loop().run_in_executor(None, self._load_snapshot, user_id)
+        if index is not None:
+            self._remember(user_id, index, version)
+        return index
+
+    def _remember(self, user_id: int, index: VectorIndex, version: Tuple[int, int, int]):
+        self._indexes[user_id] = index
+        self._indexes.move_to_end(user_id)
+        self._versions[user_id] = version
+        while len(self._indexes) > self.max_users:
+            evicted, _ = self._indexes.popitem(last=False)
+            self._versions.pop(evicted, None)
+
+    def _start_build(self, user_id: int) -> asyncio.Task:
+        self._lock(user_id)  # Drops builds started on another loop
+        task = self._builds.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._build(user_id))
+            self._builds[user_id] = task
+            task.add_done_callback(lambda _: self._builds.pop(user_id, None))
+        return task
+
+    async def _build(self, user_id: int):
+        try:
+            passages = await asyncio.get_running_loop().run_in_executor(
+                None, self._read_user_passages, user_id
+            )
+            await self._apply(user_id, passages, stale_prefix="")
+        except Exception as e:
+            print(f"Error building vector index for user {user_id}: {e}")
+
+    async def _update(
+        self,
+        user_id: int,
+        passages: Dict[str, str],
+        stale_prefix: Optional[str] = None,
+        removed: Iterable[str] = ()
+    ):
+        """Apply a change, building the user's index first if there is none.
+
+        Updates already run in the background, so they wait for the build.
+        """
+        if await self._index(user_id) is None:
+            await self.build(user_id)
+        await self._apply(user_id, passages, stale_prefix, removed)
+
+    async def _apply(
+        self,
+        user_id: int,
+        passages: Dict[str, str],
+        stale_prefix: Optional[str] = None,
+        removed: Iterable[str] = ()
+    ):
+        """Merge new or changed ``passages`` into the user's snapshot.
+
+        Keys in ``removed``, and other keys under ``stale_prefix``, are
+        dropped; an empty prefix builds the index from scratch. Passages are
+        embedded before taking the snapshot lock, against the index as this
+        process last saw it. Under the lock the latest snapshot is reloaded,
+        so changes saved by other processes are kept, and only text that
+        differs from it is embedded again.
+        """
+        full = stale_prefix == ""
+        cached = self._indexes.get(user_id)
+        vectors = await self._embed_changed(user_id, cached, passages, {}) if cached is not None or full else {}
+
+        async with self._lock(user_id):
+            async with self._snapshot_lock(user_id):
+                index = await self._index(user_id)
+                if (index is None) != full:
+                    # No index to change yet (building it reads the change from
+                    # the database), or another process finished building it
+                    return
+                if index is None:
+                    index = VectorIndex(settings.EMBEDDING_MODEL)
+                vectors = await self._embed_changed(user_id, index, passages, vectors)
+
+                removed = list(removed)
+                if stale_prefix is not None:
+                    removed.extend(key for key in index.keys_with_prefix(stale_prefix) if key not in passages)
+                index.remove(removed)
+                changed = [key for key, text in passages.items() if index.text(key) != text]
+                index.upsert(changed, [passages[key] for key in changed], [vectors[key] for key in changed])
+
+                version = await asyncio.get_running_loop().run_in_executor(
+                    None, self._save_snapshot, user_id, index
+                )
+                self._remember(user_id, index, version)
+
+    async def _embed_changed(
+        self,
+        user_id: int,
+        index: Optional[VectorIndex],
+        passages: Dict[str, str],
+        vectors: Dict[str, np.ndarray]
+    ) -> Dict[str, np.ndarray]:
+        """Add vectors for the passages whose text differs from ``index``"""
+        missing = [
+            key for key, text in passages.items()
+            if key not in vectors and (index is None or index.text(key) != text)
+        ]
+        if not missing:
+            return vectors
+        embedded = await LLMService(provider=self.provider, user_id=user_id).embed(
+            [passages[key] for key in missing]
+        )
+        return {**vectors, **dict(zip(missing, embedded))}
+
+    def _snapshot_path(self, user_id: int) -> str:
+        return os.path.join(self.directory, f"{user_id}.npz")
+
+    def _snapshot_version(self, user_id: int) -> Optional[Tuple[int, int, int]]:
+        """Identifies a snapshot file; every save replaces the file, changing it"""
+        try:
+            stat = os.stat(self._snapshot_path(user_id))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _load_snapshot(self, user_id: int) -> Optional[VectorIndex]:
+        path = self._snapshot_path(user_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            index = VectorIndex.load(path)
+        except Exception as e:
+            print(f"Error loading vector index {path}: {e}")
+            return None
+        # Vectors from another model aren't comparable with new queries
+        return index if index.model == settings.EMBEDDING_MODEL else None
+
+    def _save_snapshot(self, user_id: int, index: VectorIndex) -> Tuple[int, int, int]:
+        os.makedirs(self.directory, exist_ok=True)
+        index.save(self._snapshot_path(user_id))
+        return self._snapshot_version(user_id)
+
+    def _read_user_passages(self, user_id: int) -> Dict[str, str]:
+        db = self.session_factory()
+        try:
+            passages = {
+                f"kp:{knowledge_point.id}": self.knowledge_point_text(knowledge_point)
+                for knowledge_point in db.query(KnowledgePoint).filter(KnowledgePoint.user_id == user_id)
+            }
+            document_ids = [
+                document_id
+                for document_id, in db.query(Document.id).filter(
+                    Document.owner_id == user_id,
+                    Document.processing_status == ProcessingStatus.COMPLETED
+                )
+            ]
+            for document_id in document_ids:
+                passages.update(self._document_passages(db, document_id))
+            return passages
+        finally:
+            db.close()
+
+    def _read_document_passages(self, document_id: int) -> Dict[str, str]:
+        db = self.session_factory()
+        try:
+            return self._document_passages(db, document_id)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _document_passages(db: Session, document_id: int) -> Dict[str, str]:
+        # Keyed by content, so re-indexing an edited document only embeds changed passages
+        passages = {}
+        for chunk in DocumentService.iter_chunks(
+            DocumentService.iter_page_records(db, document_id),
+            settings.RETRIEVAL_CHUNK_TOKENS,
+            measure=lambda text: count_tokens(text, settings.EMBEDDING_MODEL)
+        ):
+            text = chunk["text"].strip()
+            if text:
+                digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+                passages[f"doc:{document_id}:{digest}"] = text
+        return passages
+
+vector_store = VectorStore()
@@ -7,6 +7,12 @@ from sqlalchemy.pool import StaticPool
 from app.main import app
 from app.database import get_db, Base
 from app.config import settings
+from app.services import llm_service, document_processor
+from app.services.llm_cache import LLMCache
+from app.services.llm_providers import MockProvider
+from app.services.resilience import ResilientCaller
+from app.services.vector_index import VectorStore
+from app.api.v1 import documents, knowledge_points
 
 # Test database URL
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -75,4 +81,47 @@ def authenticated_client(client, test_user_data):
     token = response.json()["access_token"]
     client.headers.update({"Authorization": f"Bearer {token}"})
     
-    return client
\ No newline at end of file
+    return client
+
+class FakeRedis:
+    """In-memory stand-in for the async Redis client"""
+    
+    def __init__(self):
+        self.values = {}
+    
+    async def get(self, key):
+        return self.values.get(key)
+    
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+    
+    async def delete(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+@pytest.fixture(autouse=True)
+def llm_cache(monkeypatch):
+    cache = LLMCache(shared=FakeRedis())
+    monkeypatch.setattr(llm_service, "llm_cache", cache)
+    return cache
+
+@pytest.fixture(autouse=True)
+def llm_resilience(monkeypatch):
+    # A fresh circuit per test, and retries without waiting
+    resilience = ResilientCaller(base_delay=0, max_delay=0)
+    monkeypatch.setattr(llm_service, "llm_resilience", resilience)
+    return resilience
+
+@pytest.fixture(autouse=True)
+def vector_store(monkeypatch, tmp_path, db_session):
+    store = VectorStore(
+        directory=str(tmp_path / "vector_index"),
+        # Own sessions on the test connection, so closing them leaves db_session usable
+        session_factory=lambda: TestingSessionLocal(bind=db_session.get_bind(), join_transaction_mode="create_savepoint"),
+        provider=MockProvider(latency_ms=0)
+    )
+    for module in (document_processor, documents, knowledge_points):
+        monkeypatch.setattr(module, "vector_store", store)
+    return store
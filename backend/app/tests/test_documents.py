@@ -0,0 +1,601 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+import os
+import threading
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1 import documents as documents_module
+from app.config import settings
+from app.database import Base
+from app.models.document import Document, DocumentBlob, DocumentPage, DocumentType, ProcessingStatus
+from app.models.user import User
+from app.services.document_processor import DocumentProcessor, document_processor
+from app.services import document_service as document_service_module
+from app.services.document_service import DocumentService, EXTRACTOR_VERSIONS
+from app.services.extraction_cache import ExtractionCache
+from app.utils.schema import add_missing_columns
+from benchmarks.pdf_extraction import build_sample_pdf
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_DIR", str(tmp_path / "extraction_cache"))
+    (tmp_path / "uploads").mkdir()
+    return tmp_path / "uploads"
+
+@pytest.fixture(autouse=True)
+def processing_jobs(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(document_processor, "enqueue", jobs.append)
+    return jobs
+
+@pytest.fixture
+def owner(db_session):
+    user = User(email="owner@example.com", username="owner", hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+def test_upload_document_streams_to_disk(authenticated_client, db_session, upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 4)
+    content = b"Lecture notes\n" * 10
+    
+    response = authenticated_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("notes.txt", content, "text/plain")}
+    )
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert data["file_size"] == len(content)
+    
+    document = db_session.query(Document).filter(Document.id == data["id"]).first()
+    assert document.content_hash == hashlib.sha256(content).hexdigest()
+    with open(document.file_path, "rb") as stored:
+        assert stored.read() == content
+    assert not list((upload_dir / "incoming").iterdir())
+
+def test_upload_document_enqueues_processing(authenticated_client, processing_jobs):
+    response = authenticated_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("notes.txt", b"hello", "text/plain")}
+    )
+    assert response.status_code == 200
+    assert response.json()["processing_status"] == "pending"
+    assert processing_jobs == [response.json()["id"]]
+
+def test_upload_document_too_large(authenticated_client, upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 16)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 4)
+    
+    response = authenticated_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("big.txt", b"x" * 64, "text/plain")}
+    )
+    assert response.status_code == 400
+    assert "File too large" in response.json()["detail"]
+    assert not list((upload_dir / "incoming").iterdir())
+    assert not (upload_dir / "blobs").exists()
+
+def test_upload_document_invalid_type(authenticated_client):
+    response = authenticated_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("script.exe", b"MZ", "application/octet-stream")}
+    )
+    assert response.status_code == 400
+
+def test_document_processor_completes_document(db_session, owner, upload_dir):
+    file_path = upload_dir / "notes.txt"
+    file_path.write_text("  First line  \n\n\nSecond line\n")
+    document = Document(
+        title="notes.txt",
+        filename="notes.txt",
+        file_path=str(file_path),
+        document_type=DocumentType.TXT,
+        owner_id=owner.id
+    )
+    db_session.add(document)
+    db_session.commit()
+    document_id = document.id
+    
+    processor = DocumentProcessor(max_workers=1, session_factory=lambda: db_session)
+    
+    async def run():
+        await processor.process(document_id)
+        await processor.shutdown()
+    
+    asyncio.run(run())
+    
+    document = db_session.query(Document).filter(Document.id == document_id).first()
+    assert document.processing_status == ProcessingStatus.COMPLETED
+    assert DocumentService.get_content(db_session, document_id) == "First line\nSecond line"
+    assert document.processed_at is not None
+
+def test_document_processor_indexes_without_holding_a_slot(db_session, owner, upload_dir, vector_store, monkeypatch):
+    file_path = upload_dir / "notes.txt"
+    file_path.write_text("Indexed after extraction")
+    document = Document(
+        title="notes.txt",
+        filename="notes.txt",
+        file_path=str(file_path),
+        document_type=DocumentType.TXT,
+        owner_id=owner.id
+    )
+    db_session.add(document)
+    db_session.commit()
+    document_id = document.id
+    
+    processor = DocumentProcessor(max_workers=1, session_factory=lambda: db_session)
+    slots_held = []
+    
+    async def index_document(user_id, indexed_id):
+        slots_held.append(processor._semaphore.locked())
+        return True
+    
+    monkeypatch.setattr(vector_store, "index_document", index_document)
+    
+    async def run():
+        assert await processor.process(document_id)
+        await processor.shutdown()
+    
+    asyncio.run(run())
+    assert slots_held == [False]
+
+def test_document_processor_marks_failure(db_session, owner, upload_dir):
+    document = Document(
+        title="missing.pdf",
+        filename="missing.pdf",
+        file_path=str(upload_dir / "missing.pdf"),
+        document_type=DocumentType.PDF,
+        owner_id=owner.id
+    )
+    db_session.add(document)
+    db_session.commit()
+    document_id = document.id
+    
+    processor = DocumentProcessor(max_workers=1, session_factory=lambda: db_session)
+    
+    async def run():
+        await processor.process(document_id)
+        await processor.shutdown()
+    
+    asyncio.run(run())
+    
+    document = db_session.query(Document).filter(Document.id == document_id).first()
+    assert document.processing_status == ProcessingStatus.FAILED
+    # The cause is kept rather than a generic message
+    assert "missing.pdf" in document.processing_error
+
+def test_document_processor_resumes_unfinished_documents(db_session, owner, upload_dir):
+    stale = datetime.utcnow() - timedelta(seconds=settings.DOCUMENT_PROCESSING_STALE_SECONDS + 60)
+    statuses = {
+        "pending": (ProcessingStatus.PENDING, None),
+        "crashed": (ProcessingStatus.PROCESSING, stale),
+        "running": (ProcessingStatus.PROCESSING, datetime.utcnow()),
+        "done": (ProcessingStatus.COMPLETED, stale),
+    }
+    documents = {
+        name: Document(
+            title=name,
+            filename=f"{name}.txt",
+            file_path=str(upload_dir / f"{name}.txt"),
+            document_type=DocumentType.TXT,
+            owner_id=owner.id,
+            processing_status=status,
+            created_at=stale,
+            updated_at=updated_at
+        )
+        for name, (status, updated_at) in statuses.items()
+    }
+    db_session.add_all(documents.values())
+    db_session.commit()
+    unfinished = [documents["pending"].id, documents["crashed"].id]
+    
+    processor = DocumentProcessor(max_workers=1, session_factory=lambda: db_session)
+    jobs = []
+    processor.enqueue = jobs.append
+    
+    assert processor.resume() == unfinished
+    assert jobs == unfinished
+    # Already claimed, so another worker starting up leaves them alone
+    assert processor.resume() == []
+
+def test_document_processor_stores_pages_off_the_event_loop(db_session, owner, upload_dir, monkeypatch):
+    file_path = upload_dir / "notes.txt"
+    file_path.write_text("Stored in a thread")
+    document = Document(
+        title="notes.txt",
+        filename="notes.txt",
+        file_path=str(file_path),
+        document_type=DocumentType.TXT,
+        owner_id=owner.id
+    )
+    db_session.add(document)
+    db_session.commit()
+    document_id = document.id
+    
+    threads = []
+    apply_extraction = DocumentService.apply_extraction
+    
+    def recording_apply(*args):
+        threads.append(threading.current_thread())
+        return apply_extraction(*args)
+    
+    monkeypatch.setattr(DocumentService, "apply_extraction", recording_apply)
+    processor = DocumentProcessor(max_workers=1, session_factory=lambda: db_session)
+    
+    async def run():
+        await processor.process(document_id)
+        await processor.shutdown()
+    
+    asyncio.run(run())
+    
+    assert threads and threads[0] is not threading.main_thread()
+    assert DocumentService.get_content(db_session, document_id) == "Stored in a thread"
+
+def test_sharded_pdf_extraction_matches_serial(upload_dir):
+    file_path = upload_dir / "book.pdf"
+    file_path.write_bytes(build_sample_pdf(7, lines_per_page=2))
+    
+    serial = DocumentService.extract_content(str(file_path), "pdf")
+    processor = DocumentProcessor(max_workers=2, pdf_pages_per_shard=3)
+    
+    async def run():
+        try:
+            return await processor.extract(str(file_path), "pdf")
+        finally:
+            await processor.shutdown()
+    
+    sharded = asyncio.run(run())
+    
+    serial_entries = list(DocumentService.iter_extraction(serial["path"]))
+    sharded_entries = list(DocumentService.iter_extraction(sharded["path"]))
+    assert sharded_entries == serial_entries
+    assert [entry["page"] for entry in sharded_entries[:-1]] == list(range(1, 8))
+    summary = sharded_entries[-1]["summary"]
+    assert summary["page_count"] == 7
+    raw_content = DocumentService.read_extraction(sharded)
+    for page_number, offset in enumerate(summary["page_offsets"], start=1):
+        assert raw_content[offset:].startswith(f"Page {page_number} line 0")
+
+def test_document_processor_stores_sharded_pdf_pages(db_session, owner, upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_ENABLED", False)
+    file_path = upload_dir / "book.pdf"
+    file_path.write_bytes(build_sample_pdf(7, lines_per_page=2))
+    document = Document(
+        title="book.pdf",
+        filename="book.pdf",
+        file_path=str(file_path),
+        document_type=DocumentType.PDF,
+        owner_id=owner.id
+    )
+    db_session.add(document)
+    db_session.commit()
+    document_id = document.id
+    
+    processor = DocumentProcessor(max_workers=2, session_factory=lambda: db_session, pdf_pages_per_shard=3)
+    extractions = []
+    extract = processor.extract
+    
+    async def recording_extract(*args):
+        extractions.append(await extract(*args))
+        return extractions[-1]
+    
+    processor.extract = recording_extract
+    
+    async def run():
+        await processor.process(document_id)
+        await processor.shutdown()
+    
+    asyncio.run(run())
+    
+    document = db_session.query(Document).filter(Document.id == document_id).first()
+    assert document.processing_status == ProcessingStatus.COMPLETED
+    assert document.page_count == 7
+    pages = DocumentService.get_pages(db_session, document_id)
+    assert [page.page_number for page in pages] == list(range(1, 8))
+    assert pages[6].processed_content.startswith("Page 7 line 0")
+    # The uncached extraction file is removed once stored
+    assert extractions[0]["temporary"]
+    assert not os.path.exists(extractions[0]["path"])
+
+def test_duplicate_uploads_share_blob(authenticated_client, db_session, processing_jobs):
+    content = b"Shared lecture slides"
+    first = authenticated_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("lecture.txt", content, "text/plain")}
+    ).json()
+    
+    # Pretend the first upload has been processed and summarized
+    document = db_session.query(Document).filter(Document.id == first["id"]).first()
+    DocumentService.apply_extraction(db_session, document, DocumentService.extract_content(document.file_path, "txt"))
+    document.summary = "A summary"
+    db_session.commit()
+    
+    second = authenticated_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("copy.txt", content, "text/plain")}
+    ).json()
+    
+    assert second["id"] != first["id"]
+    assert second["processing_status"] == "completed"
+    assert second["summary"] == "A summary"
+    assert processing_jobs == [first["id"]]
+    
+    blob = db_session.query(DocumentBlob).filter(
+        DocumentBlob.content_hash == hashlib.sha256(content).hexdigest()
+    ).one()
+    assert blob.ref_count == 2
+    assert second["filename"] == first["filename"]
+    
+    authenticated_client.delete(f"/api/v1/documents/{first['id']}")
+    db_session.refresh(blob)
+    assert blob.ref_count == 1
+    assert os.path.exists(blob.file_path)
+    
+    blob_path = blob.file_path
+    authenticated_client.delete(f"/api/v1/documents/{second['id']}")
+    assert db_session.query(DocumentBlob).count() == 0
+    assert not os.path.exists(blob_path)
+
+def test_extraction_streams_records(upload_dir):
+    file_path = upload_dir / "notes.txt"
+    file_path.write_text("Spaced repetition\nworks.\n\n\n间隔重复是一种学习方法\n\nLast  \n")
+    
+    records = list(DocumentService.iter_records(str(file_path), "txt"))
+    assert [(record["type"], record["number"]) for record in records] == [
+        ("paragraph", 1), ("paragraph", 2), ("paragraph", 3)
+    ]
+    
+    part = DocumentService.write_pages(iter(records))
+    result = DocumentService.finish_extraction([part], "txt")
+    processed_content = DocumentService.read_extraction(result, processed=True)
+    assert processed_content == "Spaced repetition\nworks.\n间隔重复是一种学习方法\nLast"
+    assert not os.path.exists(result["path"])
+    assert DocumentService.detect_language(["间隔重复是一种学习方法"]) == "zh"
+    assert DocumentService.detect_language(["Spaced repetition"]) == "en"
+    
+    chunks = list(DocumentService.iter_chunks(DocumentService.clean_records(records), max_size=30))
+    assert "".join(chunk["text"].replace("\n", "") for chunk in chunks) == processed_content.replace("\n", "")
+    assert chunks[0]["start"] == ("paragraph", 1)
+    assert chunks[-1]["end"] == ("paragraph", 3)
+    assert all(len(chunk["text"]) <= 30 for chunk in chunks)
+
+def test_unpaged_text_is_stored_in_bounded_pages(monkeypatch):
+    monkeypatch.setattr(document_service_module, "UNPAGED_PAGE_SIZE", 30)
+    records = [
+        {"type": "paragraph", "number": number, "text": f"Paragraph {number}"}
+        for number in range(1, 6)
+    ]
+    
+    part = DocumentService.write_pages(iter(records))
+    entries = list(DocumentService.iter_extraction(part["path"]))
+    # A page is written out before it would grow past the limit
+    assert [(entry["page"], entry["raw"]) for entry in entries] == [
+        (1, "Paragraph 1\nParagraph 2"), (2, "Paragraph 3\nParagraph 4"), (3, "Paragraph 5")
+    ]
+    extraction = DocumentService.finish_extraction([part], "txt")
+    assert DocumentService.read_extraction(extraction) == "\n".join(record["text"] for record in records)
+
+def test_extraction_cache_reuses_and_invalidates_per_format(upload_dir, monkeypatch):
+    txt_path = upload_dir / "notes.txt"
+    txt_path.write_text("Cached notes")
+    pdf_path = upload_dir / "book.pdf"
+    pdf_path.write_bytes(build_sample_pdf(2, lines_per_page=1))
+    
+    txt_result = DocumentService.extract_content(str(txt_path), "txt")
+    pdf_result = DocumentService.extract_content(str(pdf_path), "pdf")
+    
+    def fail(*args):
+        raise AssertionError("extractor should not run on a cache hit")
+    
+    with monkeypatch.context() as patched:
+        patched.setattr(DocumentService, "iter_records", fail)
+        assert DocumentService.extract_content(str(txt_path), "txt") == txt_result
+        assert DocumentService.extract_content(str(pdf_path), "pdf") == pdf_result
+        assert DocumentService.extract_text_from_file(str(txt_path), "txt") == "Cached notes"
+    
+    # Bumping the PDF extractor only invalidates PDF entries
+    monkeypatch.setitem(EXTRACTOR_VERSIONS, "pdf", EXTRACTOR_VERSIONS["pdf"] + 1)
+    txt_hash = hashlib.sha256(b"Cached notes").hexdigest()
+    pdf_hash = hashlib.sha256(pdf_path.read_bytes()).hexdigest()
+    assert DocumentService.get_cached_extraction(txt_hash, "txt") == txt_result
+    assert not txt_result["temporary"]
+    assert DocumentService.get_cached_extraction(pdf_hash, "pdf") is None
+
+def test_extraction_cache_evicts_least_recently_used(tmp_path):
+    cache = ExtractionCache(directory=str(tmp_path / "cache"), max_bytes=10 ** 6)
+    
+    def entry():
+        path = tmp_path / "extraction.jsonl.gz"
+        path.write_bytes(os.urandom(2000))
+        return str(path)
+    
+    for key in ["a" * 64, "b" * 64, "c" * 64]:
+        assert cache.store(key, "txt", 1, entry()) == cache._path(key, "txt", 1)
+    entry_size = os.path.getsize(cache._path("a" * 64, "txt", 1))
+    
+    # Touch "a" so that "b" becomes the least recently used entry
+    for key, mtime in [("a" * 64, 300), ("b" * 64, 100), ("c" * 64, 200)]:
+        os.utime(cache._path(key, "txt", 1), (mtime, mtime))
+    cache.lookup("a" * 64, "txt", 1)
+    
+    cache._max_bytes = entry_size * 3 - 1
+    cache.store("d" * 64, "txt", 1, entry())
+    
+    assert cache.lookup("b" * 64, "txt", 1) is None
+    assert cache.lookup("c" * 64, "txt", 1) is None
+    assert cache.lookup("a" * 64, "txt", 1) is not None
+    assert cache.lookup("d" * 64, "txt", 1) is not None
+    
+    # An entry larger than the whole cache is still kept until the next store
+    cache._max_bytes = 1
+    assert os.path.exists(cache.store("e" * 64, "txt", 1, entry()))
+
+def test_document_content_by_page_range(authenticated_client, db_session, upload_dir):
+    content = build_sample_pdf(4, lines_per_page=1)
+    uploaded = authenticated_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("book.pdf", content, "application/pdf")}
+    ).json()
+    
+    document = db_session.query(Document).filter(Document.id == uploaded["id"]).first()
+    DocumentService.apply_extraction(db_session, document, DocumentService.extract_content(document.file_path, "pdf"))
+    db_session.commit()
+    
+    response = authenticated_client.get(
+        f"/api/v1/documents/{document.id}/content",
+        params={"start_page": 2, "end_page": 3}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["page_count"] == 4
+    assert [page["page_number"] for page in data["pages"]] == [2, 3]
+    assert data["pages"][0]["content"].startswith("Page 2 line 0")
+    
+    assert authenticated_client.delete(f"/api/v1/documents/{document.id}").status_code == 200
+    assert db_session.query(DocumentPage).count() == 0
+
+def test_legacy_database_is_upgraded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        # The documents table as created before text moved into pages
+        connection.exec_driver_sql(
+            "CREATE TABLE documents (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, "
+            "filename VARCHAR NOT NULL, file_path VARCHAR NOT NULL, file_size INTEGER, "
+            "document_type VARCHAR(4) NOT NULL, processing_status VARCHAR(10), processing_error TEXT, "
+            "raw_content TEXT, processed_content TEXT, summary TEXT, language VARCHAR, "
+            "page_count INTEGER, owner_id INTEGER NOT NULL, created_at DATETIME, "
+            "updated_at DATETIME, processed_at DATETIME)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO documents (id, title, filename, file_path, document_type, processing_status, "
+            "raw_content, processed_content, owner_id) VALUES "
+            "(1, 'old', 'old.txt', 'old.txt', 'TXT', 'COMPLETED', '  Old  notes \n\n', 'Old  notes', 1), "
+            "(2, 'new', 'new.txt', 'new.txt', 'TXT', 'PENDING', NULL, NULL, 1), "
+            "(3, 'bad', 'bad.txt', 'bad.txt', 'TXT', 'COMPLETED', 'Bad', 'Bad', 1)"
+        )
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        # A document whose text can never be moved
+        connection.exec_driver_sql(
+            "CREATE TRIGGER reject_bad_page BEFORE INSERT ON document_pages "
+            "WHEN NEW.document_id = 3 BEGIN SELECT RAISE(ABORT, 'bad legacy data'); END"
+        )
+    
+    added = add_missing_columns(engine, Base.metadata)
+    assert {"documents.content_hash", "documents.page_offsets"} <= set(added)
+    assert add_missing_columns(engine, Base.metadata) == []
+    
+    db = sessionmaker(bind=engine)()
+    try:
+        # The failing document is retried once, then skipped instead of blocking startup
+        assert DocumentService.migrate_legacy_content(db, batch_size=1) == 1
+        assert DocumentService.migrate_legacy_content(db, batch_size=1) == 0
+        assert DocumentService.get_content(db, 1) == "Old  notes"
+        assert DocumentService.get_content(db, 1, processed=False) == "  Old  notes \n\n"
+        assert DocumentService.get_content(db, 2) is None
+        assert DocumentService.get_content(db, 3) is None
+        assert db.query(Document).filter(Document.content_hash.is_(None)).count() == 3
+    finally:
+        db.close()
+        engine.dispose()
+
+def test_list_documents_keyset_pagination(authenticated_client, db_session):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    for number in range(5):
+        db_session.add(Document(
+            title=f"doc-{number}",
+            filename=f"doc-{number}.txt",
+            file_path=f"doc-{number}.txt",
+            document_type=DocumentType.TXT,
+            owner_id=user_id,
+            # Two documents share each timestamp so that ties are broken by id
+            created_at=created_at + timedelta(minutes=number // 2)
+        ))
+    db_session.commit()
+    
+    first = authenticated_client.get(
+        "/api/v1/documents/", params={"limit": 2, "include_total": True}
+    ).json()
+    assert first["total"] == 5
+    assert first["page"] == 1
+    assert [doc["title"] for doc in first["documents"]] == ["doc-4", "doc-3"]
+    
+    titles = [doc["title"] for doc in first["documents"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = authenticated_client.get(
+            "/api/v1/documents/", params={"limit": 2, "cursor": cursor, "include_total": True}
+        ).json()
+        assert page["total"] is None
+        assert page["page"] is None
+        titles.extend(doc["title"] for doc in page["documents"])
+        cursor = page["next_cursor"]
+    
+    assert titles == ["doc-4", "doc-3", "doc-2", "doc-1", "doc-0"]
+    
+    without_total = authenticated_client.get("/api/v1/documents/", params={"limit": 10}).json()
+    assert without_total["total"] is None
+    assert without_total["next_cursor"] is None
+    
+    assert authenticated_client.get(
+        "/api/v1/documents/", params={"cursor": "not-a-cursor"}
+    ).status_code == 400
+
+def test_batch_upload_reports_per_file_results(authenticated_client, db_session, upload_dir, processing_jobs, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 64)
+    
+    response = authenticated_client.post(
+        "/api/v1/documents/upload/batch",
+        files=[
+            ("files", ("week1.txt", b"Week one notes", "text/plain")),
+            ("files", ("virus.exe", b"MZ", "application/octet-stream")),
+            ("files", ("huge.txt", b"x" * 128, "text/plain")),
+            ("files", ("week2.txt", b"Week two notes", "text/plain")),
+        ]
+    )
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert data["uploaded"] == 2
+    assert data["failed"] == 2
+    assert [result["filename"] for result in data["results"]] == ["week1.txt", "virus.exe", "huge.txt", "week2.txt"]
+    assert data["results"][1]["error"] == "File type .exe not allowed"
+    assert data["results"][2]["error"] == "File too large"
+    
+    document_ids = [data["results"][i]["document"]["id"] for i in (0, 3)]
+    assert sorted(processing_jobs) == sorted(document_ids)
+    assert db_session.query(Document).count() == 2
+    assert db_session.query(DocumentBlob).count() == 2
+    assert not list((upload_dir / "incoming").iterdir())
+
+def test_batch_upload_reports_storage_failures(authenticated_client, upload_dir, processing_jobs, monkeypatch, capsys):
+    create_document = documents_module._create_document
+    
+    def fail_on_week2(db, blob, filename, *args):
+        if filename == "week2.txt":
+            raise RuntimeError("disk quota exceeded")
+        return create_document(db, blob, filename, *args)
+    
+    monkeypatch.setattr(documents_module, "_create_document", fail_on_week2)
+    
+    response = authenticated_client.post(
+        "/api/v1/documents/upload/batch",
+        files=[
+            ("files", ("week1.txt", b"Week one notes", "text/plain")),
+            ("files", ("week2.txt", b"Week two notes", "text/plain")),
+        ]
+    )
+    
+    data = response.json()
+    assert (data["uploaded"], data["failed"]) == (1, 1)
+    assert data["results"][1]["error"] == "Failed to store file (RuntimeError)"
+    
+    captured = capsys.readouterr()
+    assert "Error storing week2.txt: RuntimeError: disk quota exceeded" in captured.out
+    assert "Traceback" in captured.err
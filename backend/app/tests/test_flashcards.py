@@ -0,0 +1,250 @@
+from datetime import datetime, timedelta
+import json
+import pytest
+
+from app.config import settings
+from app.models.flashcard import Flashcard, ReviewStatus
+from app.models.knowledge_point import KnowledgePoint
+from app.models.review_log import ReviewLog
+from app.models.review_stats import DailyReviewStats
+from app.services.llm_errors import LLMResponseError
+from app.services.llm_service import LLMService
+
+def batch_response(messages):
+    """Answer a batch prompt with two cards per listed knowledge point"""
+    listing = messages[-1]["content"].split("\n\n", 1)[1]
+    ids = [int(line.split(":", 1)[0]) for line in listing.splitlines()]
+    return json.dumps([
+        {"knowledge_point_id": id, "front": f"Q{card} about {id}", "back": f"A{card}"}
+        for id in ids
+        for card in range(2)
+    ])
+
+@pytest.fixture
+def prompts(monkeypatch):
+    sent = []
+
+    async def complete(self, messages, max_tokens, temperature, method=None):
+        sent.append(messages)
+        return batch_response(messages)
+
+    monkeypatch.setattr(LLMService, "_complete", complete)
+    return sent
+
+@pytest.fixture
+def knowledge_points(authenticated_client, db_session):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    points = [
+        KnowledgePoint(title=f"Point {number}", description="About it", user_id=user_id)
+        for number in range(25)
+    ]
+    db_session.add_all(points)
+    db_session.commit()
+    return points
+
+def test_generate_flashcards_batches_and_bulk_inserts(authenticated_client, db_session, knowledge_points, prompts):
+    ids = [point.id for point in knowledge_points]
+
+    response = authenticated_client.post(
+        "/api/v1/flashcards/generate",
+        json={"knowledge_point_ids": ids, "cards_per_point": 2}
+    )
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["failed_knowledge_point_ids"] == []
+    assert len(data["flashcards"]) == 50
+    assert data["flashcards"][0]["tags"] == []
+    assert len(prompts) == 3  # 25 points in batches of 10
+    assert {card["knowledge_point_id"] for card in data["flashcards"]} == set(ids)
+
+    stored = db_session.query(Flashcard).filter(Flashcard.knowledge_point_id == ids[0]).all()
+    assert [card.front for card in stored] == [f"Q0 about {ids[0]}", f"Q1 about {ids[0]}"]
+    assert stored[0].ease_factor == 2.5
+
+def test_generate_flashcards_reports_failed_batches(authenticated_client, knowledge_points, monkeypatch):
+    prompts = []
+
+    async def complete(self, messages, max_tokens, temperature, method=None):
+        prompts.append(messages[-1]["content"])
+        # Only the batch holding the first ten points succeeds
+        if "Point 0 -" not in messages[-1]["content"]:
+            return "not json"
+        return batch_response(messages)
+
+    monkeypatch.setattr(LLMService, "_complete", complete)
+    ids = [point.id for point in knowledge_points]
+
+    response = authenticated_client.post(
+        "/api/v1/flashcards/generate",
+        json={"knowledge_point_ids": ids}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert sorted(data["failed_knowledge_point_ids"]) == ids[10:]
+    # Two of three cards per point, then one more each from a second prompt
+    assert len(data["flashcards"]) == 30
+    assert sum(prompt.startswith("Create 1 flashcards") for prompt in prompts) == 1
+
+def test_generate_flashcards_requires_own_knowledge_points(authenticated_client, prompts):
+    response = authenticated_client.post(
+        "/api/v1/flashcards/generate",
+        json={"knowledge_point_ids": [999999]}
+    )
+    assert response.status_code == 404
+    assert prompts == []
+
+def test_parse_flashcard_batch_drops_invalid_items():
+    content = json.dumps([
+        {"knowledge_point_id": 1, "front": "Q", "back": "A"},
+        {"knowledge_point_id": 1, "front": "", "back": "A"},
+        {"knowledge_point_id": 3, "front": "Q", "back": "A"},
+        {"knowledge_point_id": "2", "front": "Q2", "back": "A2"},
+        {"knowledge_point_id": 2, "front": "Q3", "back": "A3"},
+        "not a card"
+    ])
+
+    parsed = LLMService._parse_flashcard_batch(content, [1, 2], count=1)
+
+    assert parsed == {1: [{"front": "Q", "back": "A"}], 2: [{"front": "Q2", "back": "A2"}]}
+    with pytest.raises(LLMResponseError):
+        LLMService._parse_flashcard_batch("[]", [1], count=1)
+
+def test_review_session_orders_by_priority(authenticated_client, db_session, monkeypatch):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    now = datetime.utcnow()
+    cards = {
+        "new 1": (ReviewStatus.NEW, now - timedelta(days=3)),
+        "new 2": (ReviewStatus.NEW, now - timedelta(days=2)),
+        "new 3": (ReviewStatus.NEW, now - timedelta(days=1)),
+        "relearning": (ReviewStatus.RELEARNING, now + timedelta(minutes=5)),
+        "relearning later": (ReviewStatus.RELEARNING, now + timedelta(hours=2)),
+        "overdue": (ReviewStatus.REVIEW, now - timedelta(days=1)),
+        "very overdue": (ReviewStatus.REVIEW, now - timedelta(days=5)),
+        "learning": (ReviewStatus.LEARNING, now - timedelta(days=2)),
+        "not due": (ReviewStatus.REVIEW, now + timedelta(days=1)),
+    }
+    db_session.add_all([
+        Flashcard(front=front, back="A", user_id=user_id, review_status=review_status, due_date=due_date)
+        for front, (review_status, due_date) in cards.items()
+    ])
+    # One new card was introduced earlier today
+    db_session.add(DailyReviewStats(user_id=user_id, day=now.date(), reviews=1, correct_reviews=1, new_cards=1, time_spent=0))
+    db_session.commit()
+    monkeypatch.setattr(settings, "NEW_CARDS_PER_DAY", 3)
+
+    response = authenticated_client.get("/api/v1/flashcards/review-session")
+    assert response.status_code == 200
+    data = response.json()
+    assert [card["front"] for card in data["flashcards"]] == [
+        "very overdue", "learning", "overdue", "relearning", "new 1", "new 2"
+    ]
+    assert data["new_cards_remaining"] == 0
+
+    response = authenticated_client.get("/api/v1/flashcards/review-session", params={"limit": 2})
+    assert [card["front"] for card in response.json()["flashcards"]] == ["very overdue", "learning"]
+    assert response.json()["new_cards_remaining"] == 2
+
+def test_first_review_counts_towards_new_card_cap(authenticated_client, db_session, monkeypatch):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    now = datetime.utcnow()
+    db_session.add_all([
+        Flashcard(front=front, back="A", user_id=user_id, due_date=now - timedelta(minutes=number))
+        for number, front in enumerate(("Q2", "Q1"))
+    ])
+    db_session.commit()
+    monkeypatch.setattr(settings, "NEW_CARDS_PER_DAY", 1)
+
+    session = authenticated_client.get("/api/v1/flashcards/review-session").json()
+    assert [card["front"] for card in session["flashcards"]] == ["Q1"]
+
+    # Failed, so it comes back as relearning, but no second new card today
+    authenticated_client.post(f"/api/v1/flashcards/{session['flashcards'][0]['id']}/review", json={"score": 1})
+    session = authenticated_client.get("/api/v1/flashcards/review-session").json()
+    assert [card["front"] for card in session["flashcards"]] == ["Q1"]
+    assert session["new_cards_remaining"] == 0
+
+def test_batch_review_applies_in_order_once(authenticated_client, db_session):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    card = Flashcard(front="Q", back="A", user_id=user_id, due_date=datetime.utcnow())
+    db_session.add(card)
+    db_session.commit()
+    started = datetime.utcnow() - timedelta(days=1)
+    reviews = [
+        # Listed out of order; the failed review came first
+        {"review_id": "b", "flashcard_id": card.id, "score": 4, "reviewed_at": (started + timedelta(minutes=15)).isoformat()},
+        {"review_id": "a", "flashcard_id": card.id, "score": 1, "reviewed_at": started.isoformat() + "Z"},
+        {"review_id": "c", "flashcard_id": card.id, "score": 5, "reviewed_at": (started + timedelta(hours=1)).isoformat()},
+    ]
+
+    response = authenticated_client.post("/api/v1/flashcards/reviews", json={"reviews": reviews})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["applied_review_ids"] == ["b", "a", "c"]
+    flashcard = data["flashcards"][0]
+    assert (flashcard["total_reviews"], flashcard["correct_reviews"], flashcard["repetitions"]) == (3, 2, 2)
+    assert flashcard["interval"] == 6
+    assert flashcard["review_status"] == "review"
+
+    # A retried sync changes nothing
+    response = authenticated_client.post("/api/v1/flashcards/reviews", json={"reviews": reviews})
+    assert response.json()["applied_review_ids"] == []
+    assert response.json()["duplicate_review_ids"] == ["b", "a", "c"]
+    db_session.refresh(card)
+    assert card.total_reviews == 3
+
+def test_batch_review_requires_own_flashcards(authenticated_client):
+    review = {"review_id": "a", "flashcard_id": 999999, "score": 3, "reviewed_at": datetime.utcnow().isoformat()}
+
+    response = authenticated_client.post("/api/v1/flashcards/reviews", json={"reviews": [review]})
+    assert response.status_code == 404
+
+def test_reviews_are_logged_and_counted(authenticated_client, db_session):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    cards = [Flashcard(front=front, back="A", user_id=user_id, due_date=datetime.utcnow()) for front in ("Q1", "Q2")]
+    db_session.add_all(cards)
+    db_session.commit()
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    reviews = [
+        {"review_id": "a", "flashcard_id": cards[0].id, "score": 4, "reviewed_at": yesterday.isoformat(), "time_spent": 5},
+        {"review_id": "b", "flashcard_id": cards[1].id, "score": 2, "reviewed_at": yesterday.isoformat(), "time_spent": 9},
+    ]
+    authenticated_client.post("/api/v1/flashcards/reviews", json={"reviews": reviews})
+    authenticated_client.post(f"/api/v1/flashcards/{cards[0].id}/review", json={"score": 5, "time_spent": 3})
+
+    logs = db_session.query(ReviewLog).filter(ReviewLog.flashcard_id == cards[0].id).order_by(ReviewLog.id).all()
+    assert [(log.review_id, log.score, log.previous_interval, log.interval) for log in logs] == [
+        ("a", 4, 1, 1), (None, 5, 1, 6)
+    ]
+
+    response = authenticated_client.get("/api/v1/users/me/review-stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["reviews"], data["correct_reviews"], data["new_cards"], data["time_spent"]) == (3, 2, 2, 17)
+    assert [(day["reviews"], day["new_cards"]) for day in data["days"]] == [(1, 0), (2, 2)]
+
+def test_due_forecast_follows_card_changes(authenticated_client, db_session, prompts):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    now = datetime.utcnow()
+    overdue, due_today, later = [
+        Flashcard(front=front, back="A", user_id=user_id, due_date=now + timedelta(days=days))
+        for front, days in (("overdue", -1), ("today", 0), ("later", 3))
+    ]
+    point = KnowledgePoint(title="Osmosis", user_id=user_id)
+    db_session.add_all([overdue, due_today, later, point])
+    db_session.commit()
+
+    # Cards created before the forecast are counted on first read
+    response = authenticated_client.get("/api/v1/flashcards/forecast", params={"days": 5})
+    assert response.status_code == 200
+    assert response.json()["overdue"] == 1
+    assert [day["cards"] for day in response.json()["days"]] == [1, 0, 0, 1, 0]
+
+    authenticated_client.post(f"/api/v1/flashcards/{due_today.id}/review", json={"score": 4})
+    authenticated_client.delete(f"/api/v1/flashcards/{overdue.id}")
+    authenticated_client.post("/api/v1/flashcards/generate", json={"knowledge_point_ids": [point.id], "cards_per_point": 2})
+
+    data = authenticated_client.get("/api/v1/flashcards/forecast", params={"days": 5}).json()
+    assert data["overdue"] == 0
+    assert [day["cards"] for day in data["days"]] == [2, 1, 0, 1, 0]
+    assert data["days"][0]["day"] == now.date().isoformat()
@@ -0,0 +1,515 @@
+from types import SimpleNamespace
+import asyncio
+import json
+import time
+import pytest
+
+from app.config import settings
+from app.models.chunk_summary import ChunkSummary
+from app.models.document import Document, DocumentType, ProcessingStatus
+from app.models.knowledge_point import KnowledgePoint
+from app.services.document_service import DocumentService
+from app.services.llm_cache import LLMCache
+from app.services.llm_errors import LLMResponseError
+from app.services import llm_service as llm_service_module
+from app.services.llm_providers import LLMProviderError, MockProvider, OpenAIProvider
+from app.services.llm_service import LLMService
+from app.services.rate_limiter import LLMRateLimiter, TokenBucket
+from app.services.single_flight import SingleFlight
+from app.utils.json_array import parse_json_array
+from app.utils.tokens import count_tokens
+
+class FakeCompletions:
+    """Stands in for the OpenAI call and records every prompt it is sent"""
+
+    def __init__(self):
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, messages, max_tokens, temperature, method=None):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        number = len(self.prompts)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return f"summary {number}"
+
+@pytest.fixture
+def completions(monkeypatch):
+    fake = FakeCompletions()
+    monkeypatch.setattr(LLMService, "_complete", lambda self, *args, **kwargs: fake(*args, **kwargs))
+    return fake
+
+def sample_records(page_count, lines_per_page=20):
+    return [
+        {
+            "type": "page",
+            "number": page,
+            "text": "\n".join(f"Page {page} line {line} about photosynthesis" for line in range(lines_per_page))
+        }
+        for page in range(1, page_count + 1)
+    ]
+
+def test_chunk_records_respects_token_limit(monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_CHUNK_TOKENS", 100)
+    llm_service = LLMService()
+
+    chunks = llm_service.chunk_records(sample_records(10))
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk["text"]) <= 100 for chunk in chunks)
+    assert "\n".join(chunk["text"] for chunk in chunks) == "\n".join(
+        record["text"] for record in sample_records(10)
+    )
+
+def test_chunk_records_keys_are_stable_after_edit(monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_CHUNK_TOKENS", 150)
+    llm_service = LLMService()
+    records = sample_records(30)
+    edited = [dict(record) for record in records]
+    edited[15]["text"] += "\nAn extra sentence."
+
+    before = {chunk["key"] for chunk in llm_service.chunk_records(records)}
+    after = [chunk["key"] for chunk in llm_service.chunk_records(edited)]
+
+    changed = [key for key in after if key not in before]
+    assert 0 < len(changed) < len(after) // 2
+
+def test_summarize_chunks_map_reduce(completions, monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_CHUNK_TOKENS", 100)
+    monkeypatch.setattr(settings, "SUMMARY_CONCURRENCY", 2)
+    llm_service = LLMService()
+    chunks = llm_service.chunk_records(sample_records(6))
+
+    summary, new_summaries = asyncio.run(llm_service.summarize_chunks(chunks, 200))
+
+    assert summary.startswith("summary")
+    assert set(new_summaries) == {chunk["key"] for chunk in chunks}
+    assert completions.max_in_flight == 2
+    assert "Combine them" in completions.prompts[-1]
+
+    # Known chunk summaries are reused; only the final merge is requested again
+    completions.prompts.clear()
+    _, new_summaries = asyncio.run(
+        llm_service.summarize_chunks(chunks, 200, new_summaries, bypass_cache=True)
+    )
+    assert new_summaries == {}
+    assert len(completions.prompts) == 1
+
+def test_generate_summary_short_content(completions):
+    summary = asyncio.run(LLMService().generate_summary("A short note.", max_length=100))
+
+    assert summary == "summary 1"
+    assert len(completions.prompts) == 1
+    assert "A short note." in completions.prompts[0]
+
+def test_summarize_document_reuses_chunk_summaries(authenticated_client, db_session, completions, llm_cache, monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_CHUNK_TOKENS", 150)
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    document = Document(
+        title="notes",
+        filename="notes.txt",
+        file_path="notes.txt",
+        file_size=1,
+        document_type=DocumentType.TXT,
+        owner_id=user_id
+    )
+    db_session.add(document)
+    db_session.commit()
+    DocumentService.apply_extraction(db_session, document, DocumentService.finish_extraction(
+        [DocumentService.write_pages(sample_records(10))], "pdf"
+    ))
+    db_session.commit()
+
+    response = authenticated_client.post(f"/api/v1/documents/{document.id}/summarize")
+    assert response.status_code == 200
+    assert response.json()["summary"].startswith("summary")
+    first_calls = len(completions.prompts)
+    stored = db_session.query(ChunkSummary).count()
+    assert stored > 1
+
+    completions.prompts.clear()
+    llm_cache.clear()
+    llm_cache._shared.values.clear()
+    response = authenticated_client.post(f"/api/v1/documents/{document.id}/summarize")
+    assert response.status_code == 200
+    assert len(completions.prompts) == 1 < first_calls
+    assert db_session.query(ChunkSummary).count() == stored
+
+def test_summarize_unprocessed_document(authenticated_client, db_session):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    document = Document(
+        title="notes",
+        filename="notes.txt",
+        file_path="notes.txt",
+        file_size=1,
+        document_type=DocumentType.TXT,
+        processing_status=ProcessingStatus.PENDING,
+        owner_id=user_id
+    )
+    db_session.add(document)
+    db_session.commit()
+
+    response = authenticated_client.post(f"/api/v1/documents/{document.id}/summarize")
+    assert response.status_code == 409
+
+def test_responses_are_cached_per_prompt(completions, llm_cache):
+    llm_service = LLMService()
+
+    first = asyncio.run(llm_service.explain_concept("osmosis", user_level="beginner"))
+    second = asyncio.run(llm_service.explain_concept("osmosis", user_level="beginner"))
+    other_level = asyncio.run(llm_service.explain_concept("osmosis", user_level="advanced"))
+
+    assert first == second != other_level
+    assert len(completions.prompts) == 2
+    assert llm_cache.stats()["explanation"] == {"hits": 1, "misses": 2}
+
+    refreshed = asyncio.run(llm_service.explain_concept("osmosis", user_level="beginner", bypass_cache=True))
+    assert refreshed != first
+    assert asyncio.run(llm_service.explain_concept("osmosis", user_level="beginner")) == refreshed
+
+def test_shared_tier_is_used_across_processes(completions, llm_cache):
+    asyncio.run(LLMService().explain_concept("osmosis"))
+
+    # A second API process has its own in-process tier but shares Redis
+    other_process = LLMCache(shared=llm_cache._shared)
+    explanation = asyncio.run(LLMService(cache=other_process).explain_concept("osmosis"))
+
+    assert explanation == "summary 1"
+    assert len(completions.prompts) == 1
+    assert other_process.stats()["explanation"] == {"hits": 1, "misses": 0}
+
+def test_invalid_responses_are_not_cached(llm_cache, monkeypatch):
+    responses = iter(["not json", '[{"front": "Q", "back": "A"}]'])
+
+    async def complete(self, messages, max_tokens, temperature, method=None):
+        return next(responses)
+
+    monkeypatch.setattr(LLMService, "_complete", complete)
+    llm_service = LLMService()
+
+    with pytest.raises(LLMResponseError):
+        asyncio.run(llm_service.generate_flashcards("osmosis"))
+    assert asyncio.run(llm_service.generate_flashcards("osmosis")) == [{"front": "Q", "back": "A"}]
+
+def test_local_tier_evicts_and_expires(monkeypatch):
+    cache = LLMCache(max_entries=2, shared=None)
+    monkeypatch.setattr(settings, "LLM_CACHE_SHARED_ENABLED", False)
+
+    for key in ("a", "b", "c"):
+        asyncio.run(cache.set("explanation", key, key.upper()))
+    assert asyncio.run(cache.get("explanation", "a")) is None
+    assert asyncio.run(cache.get("explanation", "c")) == "C"
+
+    monkeypatch.setattr(settings, "LLM_CACHE_TTL_EXPLANATION", 0)
+    asyncio.run(cache.set("explanation", "d", "D"))
+    assert asyncio.run(cache.get("explanation", "d")) is None
+
+class FakeClient:
+    """Stands in for openai.AsyncOpenAI, tracking concurrent requests"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = self
+        self.completions = self
+
+    async def create(self, model, messages, max_tokens, temperature):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=" answer "))],
+            usage=SimpleNamespace(prompt_tokens=4, completion_tokens=6)
+        )
+
+def test_complete_shares_client_and_limits_concurrency(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(llm_service_module, "get_provider", lambda: OpenAIProvider(client))
+    monkeypatch.setattr(llm_service_module, "llm_rate_limiter", LLMRateLimiter(max_concurrency=2))
+    llm_service = LLMService()
+
+    async def run():
+        return await asyncio.gather(*[
+            llm_service._complete([{"role": "user", "content": f"question {n}"}], 50, 0.0)
+            for n in range(6)
+        ])
+
+    assert asyncio.run(run()) == ["answer"] * 6
+    assert client.max_in_flight == 2
+
+def test_token_bucket_waits_for_refill():
+    async def run():
+        bucket = TokenBucket(rate_per_minute=600, capacity=1)
+        started = time.monotonic()
+        await bucket.acquire()
+        await bucket.acquire()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    # 10 tokens a second: two refills take about 0.2s
+    assert 0.15 < asyncio.run(run()) < 1
+
+def test_rate_limiter_refunds_unused_tokens():
+    limiter = LLMRateLimiter(max_concurrency=1, requests_per_minute=0, tokens_per_minute=1000)
+
+    async def run():
+        async with limiter.limit(800) as usage:
+            usage.report(100)
+        started = time.monotonic()
+        # Would wait about 36s if the 700 unused tokens had not been returned
+        async with limiter.limit(800):
+            pass
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 1
+
+def test_concurrent_identical_requests_share_one_call(completions, llm_cache):
+    llm_service = LLMService()
+
+    async def run():
+        return await asyncio.gather(
+            *[llm_service.explain_concept("osmosis") for _ in range(5)],
+            llm_service.explain_concept("  osmosis "),
+            llm_service.explain_concept("diffusion")
+        )
+
+    results = asyncio.run(run())
+
+    assert len(set(results[:6])) == 1
+    assert results[0] != results[6]
+    assert len(completions.prompts) == 2
+
+def test_identical_requests_coalesce_across_workers(completions, llm_cache, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SINGLE_FLIGHT_SHARED", True)
+    monkeypatch.setattr(settings, "LLM_SINGLE_FLIGHT_POLL_INTERVAL", 0.005)
+    redis = llm_cache._shared
+    workers = [
+        LLMService(cache=LLMCache(shared=redis), single_flight=SingleFlight(shared=redis))
+        for _ in range(3)
+    ]
+
+    async def run():
+        return await asyncio.gather(*[worker.explain_concept("osmosis") for worker in workers])
+
+    assert asyncio.run(run()) == ["summary 1"] * 3
+    assert len(completions.prompts) == 1
+    assert not [key for key in redis.values if key.endswith(":lock")]
+
+def test_coalesced_failure_reaches_every_caller(llm_cache, monkeypatch):
+    calls = []
+
+    async def complete(self, messages, max_tokens, temperature, method=None):
+        calls.append(messages)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream unavailable")
+
+    monkeypatch.setattr(LLMService, "_complete", complete)
+    llm_service = LLMService()
+
+    async def run():
+        return await asyncio.gather(
+            *[llm_service.explain_concept("osmosis") for _ in range(3)],
+            return_exceptions=True
+        )
+
+    assert [type(result) for result in asyncio.run(run())] == [RuntimeError] * 3
+    assert len(calls) == 1
+
+class FakeStream:
+    """Stands in for openai's AsyncStream of completion chunks"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.closed = False
+        self.response = self
+
+    async def __aiter__(self):
+        for piece in self.pieces:
+            await asyncio.sleep(0)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    async def aclose(self):
+        self.closed = True
+
+class FakeStreamingClient:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.streams = []
+        self.chat = self
+        self.completions = self
+
+    async def create(self, model, messages, max_tokens, temperature, stream=False):
+        self.streams.append(FakeStream(self.pieces))
+        return self.streams[-1]
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines.get("event", "message"), json.loads(lines["data"])))
+    return events
+
+def test_stream_explain_concept_caches_completed_stream(llm_cache, monkeypatch):
+    client = FakeStreamingClient(["Osmosis ", "is ", "diffusion of water."])
+    monkeypatch.setattr(llm_service_module, "get_provider", lambda: OpenAIProvider(client))
+    llm_service = LLMService()
+
+    async def collect():
+        return [delta async for delta in llm_service.stream_explain_concept("osmosis")]
+
+    assert asyncio.run(collect()) == ["Osmosis ", "is ", "diffusion of water."]
+    assert client.streams[0].closed
+
+    # The cached text is shared with the non-streaming variant
+    assert asyncio.run(collect()) == ["Osmosis is diffusion of water."]
+    assert asyncio.run(llm_service.explain_concept("osmosis")) == "Osmosis is diffusion of water."
+    assert len(client.streams) == 1
+
+def test_stream_caches_the_same_text_as_a_completion(llm_cache, monkeypatch):
+    client = FakeStreamingClient(["\n", "Osmosis ", "is ", "diffusion of water.\n\n"])
+    monkeypatch.setattr(llm_service_module, "get_provider", lambda: OpenAIProvider(client))
+    llm_service = LLMService()
+
+    async def collect():
+        return [delta async for delta in llm_service.stream_explain_concept("osmosis")]
+
+    asyncio.run(collect())
+
+    assert list(llm_cache._entries.values())[0][1] == "Osmosis is diffusion of water."
+
+def test_stream_closed_early_closes_upstream_without_caching(llm_cache, monkeypatch):
+    client = FakeStreamingClient(["Osmosis ", "is ", "diffusion of water."])
+    monkeypatch.setattr(llm_service_module, "get_provider", lambda: OpenAIProvider(client))
+    llm_service = LLMService()
+
+    async def read_first():
+        deltas = llm_service.stream_explain_concept("osmosis")
+        first = await deltas.__anext__()
+        await deltas.aclose()  # What a client disconnect does to the response body
+        return first
+
+    assert asyncio.run(read_first()) == "Osmosis "
+    assert client.streams[0].closed
+    assert llm_cache.stats()["explanation"] == {"hits": 0, "misses": 1}
+    assert not llm_cache._entries
+
+def test_explain_knowledge_point_streams_events(authenticated_client, db_session, llm_cache, monkeypatch):
+    monkeypatch.setattr(llm_service_module, "get_provider", lambda: OpenAIProvider(FakeStreamingClient(["Water ", "moves."])))
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    knowledge_point = KnowledgePoint(title="Osmosis", description="Biology", user_id=user_id)
+    db_session.add(knowledge_point)
+    db_session.commit()
+
+    response = authenticated_client.get(f"/api/v1/knowledge-points/{knowledge_point.id}/explain")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert parse_sse(response.text) == [
+        ("message", {"text": "Water "}),
+        ("message", {"text": "moves."}),
+        ("done", {"text": "Water moves."})
+    ]
+
+def test_stream_document_summary_saves_summary(authenticated_client, db_session, completions, monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_CHUNK_TOKENS", 150)
+    monkeypatch.setattr(llm_service_module, "get_provider", lambda: OpenAIProvider(FakeStreamingClient(["Plants ", "make sugar."])))
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    document = Document(
+        title="notes",
+        filename="notes.txt",
+        file_path="notes.txt",
+        file_size=1,
+        document_type=DocumentType.TXT,
+        owner_id=user_id
+    )
+    db_session.add(document)
+    db_session.commit()
+    DocumentService.apply_extraction(db_session, document, DocumentService.finish_extraction(
+        [DocumentService.write_pages(sample_records(10))], "pdf"
+    ))
+    db_session.commit()
+
+    response = authenticated_client.post(f"/api/v1/documents/{document.id}/summarize/stream")
+
+    assert response.status_code == 200
+    assert parse_sse(response.text)[-1] == ("done", {"text": "Plants make sugar."})
+    assert completions.prompts  # Section summaries came from the non-streaming path
+    db_session.refresh(document)
+    assert document.summary == "Plants make sugar."
+    assert db_session.query(ChunkSummary).count() == len(completions.prompts)
+
+def test_mock_provider_returns_valid_responses_for_every_method(llm_cache, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    llm_service = LLMService(provider=MockProvider(latency_ms=0))
+
+    async def run():
+        return await asyncio.gather(
+            llm_service.generate_summary("Plants turn light into sugar."),
+            llm_service.extract_knowledge_points("Plants turn light into sugar."),
+            llm_service.generate_flashcards("photosynthesis", count=4),
+            llm_service.generate_flashcards_batch([{"id": 7, "title": "Osmosis"}, {"id": 9, "title": "Diffusion"}], count=2),
+            llm_service.explain_concept("osmosis"),
+            llm_service.generate_exercises("osmosis", count=2)
+        )
+
+    summary, knowledge_points, flashcards, batch, explanation, exercises = asyncio.run(run())
+
+    assert summary and explanation
+    assert all({"title", "description", "category"} <= set(point) for point in knowledge_points)
+    assert len(flashcards) == 4 and all({"front", "back"} <= set(card) for card in flashcards)
+    assert {id: len(cards) for id, cards in batch.items()} == {7: 2, 9: 2}
+    assert len(exercises) == 2
+    assert all(exercise["correct_answer"] in exercise["options"] for exercise in exercises)
+
+    # Same prompt, same response
+    assert asyncio.run(llm_service.explain_concept("osmosis")) == explanation
+
+def test_mock_provider_error_rate_is_reproducible():
+    async def outcomes():
+        provider = MockProvider(latency_ms=0, error_rate=0.3, seed=42)
+        results = []
+        for _ in range(50):
+            try:
+                await provider.complete([{"role": "user", "content": "hi"}], "mock", 20, 0.0)
+                results.append(True)
+            except LLMProviderError:
+                results.append(False)
+        return results
+
+    first, second = asyncio.run(outcomes()), asyncio.run(outcomes())
+    assert first == second
+    assert 5 < first.count(False) < 30
+
+def test_json_array_parser_tolerates_prose_and_bad_items():
+    text = 'Sure [1]! Here you go:\n```json\n[{"front": "Q, ]"}, {oops}, {"front": "Q2"},]\n```'
+
+    assert parse_json_array(text) == ([{"front": "Q, ]"}, {"front": "Q2"}], ["{oops}"])
+
+    # A truncated response keeps the complete items
+    assert parse_json_array('[{"front": "Q"}, {"front": "cut') == ([{"front": "Q"}], ['{"front": "cut'])
+
+def test_items_are_validated_and_only_missing_ones_requested_again(monkeypatch):
+    prompts = []
+    responses = iter([
+        'Cards:\n[{"front": "Q1", "back": "A1"}, {"front": " ", "back": "A2"}, {"front": "Q3", "back": "A3"}, {"front": "Q4"',
+        '[{"front": "Q5", "back": "A5"}, {"front": "Q6", "back": "A6"}, {"front": "Q7", "back": "A7"}]'
+    ])
+
+    async def complete(self, messages, max_tokens, temperature, method=None):
+        prompts.append((messages, max_tokens))
+        return next(responses)
+
+    monkeypatch.setattr(LLMService, "_complete", complete)
+
+    cards = asyncio.run(LLMService().generate_flashcards("osmosis", count=4))
+
+    assert [card["front"] for card in cards] == ["Q1", "Q3", "Q5", "Q6"]
+    repair_messages, repair_tokens = prompts[1]
+    assert repair_messages[-1]["content"].startswith("Some items were missing or invalid. Create 2 more")
+    assert json.loads(repair_messages[-2]["content"]) == [{"front": "Q1", "back": "A1"}, {"front": "Q3", "back": "A3"}]
+    assert repair_tokens == 400  # Half the budget for half the items
@@ -0,0 +1,115 @@
+import asyncio
+import pytest
+
+from app.config import settings
+from app.models.knowledge_point import KnowledgePoint
+from app.services.llm_errors import LLMProviderError, LLMTransientError, LLMUnavailableError
+from app.services.resilience import CircuitBreaker, LatencyTracker, ResilientCaller
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def failing(errors, result="ok"):
+    """An attempt raising each of ``errors`` in turn, then returning ``result``"""
+    calls = []
+
+    async def attempt():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return attempt, calls
+
+def test_transient_errors_are_retried():
+    caller = ResilientCaller(max_retries=3, base_delay=0, max_delay=0)
+    attempt, calls = failing([LLMTransientError("rate limited"), LLMTransientError("timed out")])
+
+    assert asyncio.run(caller.call(attempt)) == ("ok", 2)
+    assert len(calls) == 3
+    assert caller.retry_delay(LLMTransientError("slow down", retry_after=2), 0) == 2
+
+def test_permanent_errors_are_not_retried():
+    caller = ResilientCaller(max_retries=3, base_delay=0, max_delay=0)
+    attempt, calls = failing([LLMProviderError("bad request")])
+
+    with pytest.raises(LLMProviderError):
+        asyncio.run(caller.call(attempt))
+    assert len(calls) == 1
+
+def test_circuit_opens_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    caller = ResilientCaller(max_retries=0, breaker=breaker)
+    attempt, calls = failing([LLMTransientError("overloaded")] * 2)
+
+    for _ in range(2):
+        with pytest.raises(LLMTransientError):
+            asyncio.run(caller.call(attempt))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Fails fast without calling the provider
+    clock.now = 10
+    with pytest.raises(LLMUnavailableError) as error:
+        asyncio.run(caller.call(attempt))
+    assert error.value.retry_after == 20
+    assert len(calls) == 2
+
+    # After the timeout one trial call goes through and closes the circuit
+    clock.now = 31
+    assert asyncio.run(caller.call(attempt)) == ("ok", 0)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_rejected_requests_leave_circuit_closed():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=FakeClock())
+    caller = ResilientCaller(max_retries=3, breaker=breaker)
+    attempt, calls = failing([LLMProviderError("context length exceeded")] * 5)
+
+    # One user's oversized prompts must not cut everyone off
+    for _ in range(5):
+        with pytest.raises(LLMProviderError):
+            asyncio.run(caller.call(attempt))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert len(calls) == 5
+    assert asyncio.run(caller.call(attempt)) == ("ok", 0)
+
+def test_slow_request_is_hedged(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 5)
+    latencies = LatencyTracker()
+    for _ in range(5):
+        latencies.observe(0.01)
+    caller = ResilientCaller(hedge=True, latencies=latencies)
+    started = []
+    cancelled = []
+
+    async def attempt():
+        # The first request stalls, its duplicate answers quickly
+        number = len(started)
+        started.append(number)
+        try:
+            await asyncio.sleep(5 if number == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(number)
+            raise
+        return number
+
+    assert asyncio.run(asyncio.wait_for(caller.call(attempt), timeout=2)) == (1, 0)
+    assert caller.hedged == 1
+    assert cancelled == [0]
+
+def test_open_circuit_returns_503(authenticated_client, db_session, llm_resilience, monkeypatch):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    point = KnowledgePoint(title="Osmosis", user_id=user_id)
+    db_session.add(point)
+    db_session.commit()
+
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_FAILURE_THRESHOLD", 1)
+    llm_resilience.breaker.record_failure()
+
+    response = authenticated_client.post("/api/v1/flashcards/generate", json={"knowledge_point_ids": [point.id]})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) == settings.LLM_CIRCUIT_RESET_TIMEOUT
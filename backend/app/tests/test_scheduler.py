@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+
+from app.models.flashcard import Flashcard, ReviewStatus
+from app.services.scheduler import FSRSScheduler, SM2Scheduler, to_seconds
+
+@pytest.mark.parametrize("scheduler", [SM2Scheduler(), FSRSScheduler()], ids=lambda scheduler: scheduler.name)
+def test_replay_matches_live_reviews(scheduler):
+    rng = np.random.default_rng(0)
+    started = datetime(2024, 1, 1)
+    counts = rng.integers(1, 12, size=50)
+    scores = rng.integers(1, 6, size=(50, counts.max()))
+    offsets = np.cumsum(rng.integers(600, 20 * 86400, size=scores.shape), axis=1)
+
+    expected = []
+    for card in range(50):
+        flashcard = Flashcard()
+        for position in range(counts[card]):
+            reviewed_at = started + timedelta(seconds=int(offsets[card, position]))
+            scheduler.review(flashcard, int(scores[card, position]), reviewed_at)
+        expected.append(flashcard)
+
+    times = np.vectorize(lambda offset: to_seconds(started + timedelta(seconds=int(offset))))(offsets)
+    state = scheduler.replay(scores, times, counts)
+    rows = scheduler.rows(state, np.arange(50))
+
+    for flashcard, row in zip(expected, rows):
+        for column, value in row.items():
+            assert getattr(flashcard, column) == value, column
+
+def test_fsrs_spaces_easier_answers_further():
+    scheduler = FSRSScheduler(desired_retention=0.9)
+    reviewed_at = datetime(2024, 1, 1)
+    intervals = {}
+    for score in (3, 4, 5):
+        flashcard = Flashcard()
+        scheduler.review(flashcard, 4, reviewed_at)
+        scheduler.review(flashcard, score, flashcard.due_date)
+        intervals[score] = flashcard.interval
+    assert intervals[3] < intervals[4] < intervals[5]
+
+    flashcard = Flashcard()
+    scheduler.review(flashcard, 4, reviewed_at)
+    stability = flashcard.stability
+    scheduler.review(flashcard, 1, flashcard.due_date)
+    assert flashcard.stability < stability
+    assert flashcard.review_status == "relearning"
+
+def test_switching_algorithm_reschedules_from_history(authenticated_client, db_session):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    logged = Flashcard(front="Q1", back="A", user_id=user_id)
+    # Reviewed before reviews were logged, so there is no history to replay
+    unlogged = Flashcard(
+        front="Q2", back="A", user_id=user_id, review_status=ReviewStatus.REVIEW,
+        total_reviews=1, correct_reviews=1, repetitions=1, interval=1, due_date=datetime.utcnow()
+    )
+    db_session.add_all([logged, unlogged])
+    db_session.commit()
+    started = datetime.utcnow() - timedelta(days=30)
+    reviews = [
+        {"review_id": str(day), "flashcard_id": logged.id, "score": 4, "reviewed_at": (started + timedelta(days=day)).isoformat()}
+        for day in (0, 1)
+    ]
+    authenticated_client.post("/api/v1/flashcards/reviews", json={"reviews": reviews})
+    # Reviews one at a time are logged too
+    authenticated_client.post(f"/api/v1/flashcards/{logged.id}/review", json={"score": 4})
+
+    authenticated_client.get("/api/v1/flashcards/forecast")
+    response = authenticated_client.put("/api/v1/users/me/scheduling-algorithm", json={"scheduling_algorithm": "fsrs"})
+    assert response.status_code == 200
+    assert response.json() == {"scheduling_algorithm": "fsrs", "rescheduled": 1, "skipped": 1}
+
+    db_session.refresh(logged)
+    db_session.refresh(unlogged)
+    assert logged.stability is not None and logged.total_reviews == 3
+    assert logged.due_date == logged.last_reviewed + timedelta(days=logged.interval)
+    assert unlogged.stability is None
+    forecast = authenticated_client.get("/api/v1/flashcards/forecast", params={"days": 366}).json()
+    due = {day["day"]: day["cards"] for day in forecast["days"] if day["cards"]}
+    assert due[logged.due_date.date().isoformat()] >= 1
+    assert forecast["overdue"] + sum(due.values()) == 2
+
+    # Later reviews use FSRS, starting from the SM-2 interval
+    response = authenticated_client.post(f"/api/v1/flashcards/{unlogged.id}/review", json={"score": 4})
+    assert response.json()["stability"] is not None
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import dependencies
+from app.config import settings
+from app.models.llm_usage import LLMUsage
+from app.services.llm_errors import LLMTransientError
+from app.services import llm_service as llm_service_module
+from app.services.llm_providers import MockProvider
+from app.services.llm_service import LLMService
+from app.services.telemetry import LLMTelemetry
+
+@pytest.fixture
+def telemetry(monkeypatch):
+    telemetry = LLMTelemetry()
+    monkeypatch.setattr(llm_service_module, "llm_telemetry", telemetry)
+    monkeypatch.setattr(dependencies, "llm_telemetry", telemetry)
+    return telemetry
+
+def test_records_calls_and_cache_hits(telemetry):
+    llm_service = LLMService(provider=MockProvider(latency_ms=0), user_id=7)
+
+    async def explain_twice():
+        await llm_service.explain_concept("Osmosis")
+        await llm_service.explain_concept("Osmosis")
+
+    asyncio.run(explain_twice())
+
+    labels = ("explanation", llm_service.model)
+    assert telemetry.requests.value(labels + ("ok",)) == 1
+    assert telemetry.requests.value(labels + ("cache_hit",)) == 1
+    assert telemetry.completion_tokens.count(labels) == 1
+
+    metrics = telemetry.render_metrics()
+    assert f'llm_requests_total{{method="explanation",model="{llm_service.model}",outcome="ok"}} 1' in metrics
+    assert "llm_request_duration_seconds_bucket" in metrics
+
+def test_records_error_class(telemetry):
+    llm_service = LLMService(provider=MockProvider(latency_ms=0, error_rate=1.0))
+
+    with pytest.raises(LLMTransientError):
+        asyncio.run(llm_service.explain_concept("Osmosis"))
+    assert telemetry.errors.value(("explanation", llm_service.model, "LLMTransientError")) == 1
+
+def test_flush_adds_to_daily_usage(telemetry, db_session, authenticated_client):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    telemetry.record("summary", "gpt", 0.5, user_id=user_id, prompt_tokens=100, completion_tokens=20)
+    telemetry.record("summary", "gpt", 0.3, user_id=user_id, cache_hit=True)
+    telemetry.flush(db_session)
+    telemetry.record("summary", "gpt", 0.2, user_id=user_id, prompt_tokens=50, completion_tokens=10, retries=1)
+    telemetry.flush(db_session)
+
+    usage = db_session.query(LLMUsage).filter(LLMUsage.user_id == user_id).one()
+    assert (usage.calls, usage.cache_hits, usage.retries) == (3, 1, 1)
+    assert (usage.prompt_tokens, usage.completion_tokens) == (150, 30)
+    assert usage.latency_ms == pytest.approx(1000)
+    assert usage.cost == pytest.approx(LLMTelemetry.estimate_cost(150, 30))
+
+    response = authenticated_client.get("/api/v1/users/me/llm-usage")
+    assert response.status_code == 200
+    assert response.json()[0]["prompt_tokens"] == 150
+
+def test_system_usage_has_one_row_per_day(telemetry, db_session):
+    telemetry.record("summary", "gpt", 0.5, prompt_tokens=100)
+    telemetry.flush(db_session)
+    telemetry.record("summary", "gpt", 0.5, prompt_tokens=50)
+    telemetry.flush(db_session)
+
+    usage = db_session.query(LLMUsage).filter(LLMUsage.user_id.is_(None)).one()
+    assert (usage.calls, usage.prompt_tokens) == (2, 150)
+
+    # A concurrent insert of the same system row is caught like a user's
+    with pytest.raises(IntegrityError):
+        with db_session.begin_nested():
+            db_session.add(LLMUsage(user_id=None, day=usage.day, method="summary", model="gpt"))
+
+def test_daily_budget_rejects_generation(telemetry, authenticated_client, monkeypatch):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    monkeypatch.setattr(settings, "LLM_DAILY_TOKEN_BUDGET", 100)
+    telemetry.record("explanation", "gpt", 0.1, user_id=user_id, prompt_tokens=80, completion_tokens=30)
+
+    response = authenticated_client.post("/api/v1/flashcards/generate", json={"knowledge_point_ids": [1]})
+    assert response.status_code == 429
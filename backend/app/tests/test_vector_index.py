@@ -0,0 +1,147 @@
+import asyncio
+import numpy as np
+
+from app.models.knowledge_point import KnowledgePoint
+from app.services import llm_service as llm_service_module
+from app.services.llm_providers import MockProvider
+from app.services.llm_service import LLMService
+from app.services.vector_index import VectorIndex, VectorStore
+
+class CountingProvider(MockProvider):
+    def __init__(self):
+        super().__init__(latency_ms=0)
+        self.embedded = []
+
+    async def embed(self, texts, model):
+        self.embedded.extend(texts)
+        return await super().embed(texts, model)
+
+def test_index_search_remove_and_snapshot(tmp_path):
+    index = VectorIndex("model")
+    index.upsert(["a", "b", "c"], ["A", "B", "C"], np.eye(3))
+    index.upsert(["b"], ["B2"], [[1, 1, 0]])
+
+    results = index.search([1, 0.1, 0], k=2)
+    assert [result["key"] for result in results] == ["a", "b"]
+    assert results[0]["score"] > results[1]["score"]
+    assert [result["key"] for result in index.search([1, 0, 0], k=1, exclude=["a"])] == ["b"]
+
+    index.remove(["a"])
+    assert "a" not in index
+    assert index.text("c") == "C"
+    assert [result["key"] for result in index.search([0, 0, 1], k=1)] == ["c"]
+
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = VectorIndex.load(path)
+    assert loaded.model == "model"
+    assert sorted(loaded.keys) == ["b", "c"]
+    assert loaded.text("b") == "B2"
+    assert np.allclose(loaded.vectors, index.vectors)
+
+def test_store_only_embeds_changed_text(tmp_path, db_session, authenticated_client):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    points = [
+        KnowledgePoint(title="Osmosis", description="Water moves across a membrane", user_id=user_id),
+        KnowledgePoint(title="Mitosis", description="Cell division", user_id=user_id)
+    ]
+    db_session.add_all(points)
+    db_session.commit()
+
+    provider = CountingProvider()
+    store = VectorStore(directory=str(tmp_path), session_factory=lambda: db_session, provider=provider)
+
+    async def update():
+        await store.index_knowledge_point(user_id, points[0].id, "Osmosis\nWater moves across a membrane")
+        await store.index_knowledge_point(user_id, points[1].id, "Mitosis\nCells split in two")
+        await store.remove_knowledge_point(user_id, points[0].id)
+
+    asyncio.run(update())
+    # The first call builds the index from the database
+    assert provider.embedded == [
+        "Osmosis\nWater moves across a membrane", "Mitosis\nCell division", "Mitosis\nCells split in two"
+    ]
+
+    reloaded = VectorStore(directory=str(tmp_path), session_factory=lambda: db_session, provider=provider)
+    results = asyncio.run(reloaded.search(user_id, "how do cells split"))
+    assert [result["key"] for result in results] == [f"kp:{points[1].id}"]
+
+def test_explanation_uses_related_knowledge_points(authenticated_client, db_session, vector_store, monkeypatch):
+    monkeypatch.setattr(llm_service_module, "get_provider", lambda: MockProvider(latency_ms=0))
+    prompts = []
+
+    async def stream_complete(self, messages, max_tokens, temperature, method=None):
+        prompts.append(messages[-1]["content"])
+        yield "An explanation."
+
+    monkeypatch.setattr(LLMService, "_stream_complete", stream_complete)
+
+    # Created directly, so the index has to be built from the database
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    points = [
+        KnowledgePoint(title=title, description=description, user_id=user_id)
+        for title, description in [
+            ("Osmosis", "Water moves across a semipermeable membrane"),
+            ("Membrane transport", "Water and ions cross the cell membrane"),
+            ("French revolution", "Began in 1789")
+        ]
+    ]
+    db_session.add_all(points)
+    db_session.commit()
+    osmosis_id = points[0].id
+
+    # The first explanation doesn't wait for the index to be built
+    response = authenticated_client.get(f"/api/v1/knowledge-points/{osmosis_id}/explain")
+    assert response.status_code == 200
+    assert "Related notes:" not in prompts[0]
+
+    asyncio.run(vector_store.build(user_id))
+    response = authenticated_client.get(f"/api/v1/knowledge-points/{osmosis_id}/explain")
+    assert response.status_code == 200
+
+    prompt = prompts[1]
+    assert "Related notes:" in prompt
+    assert prompt.index("Water and ions cross the cell membrane") < prompt.index("Began in 1789")
+    assert prompt.count("semipermeable") == 1  # The point itself is not repeated
+
+def test_knowledge_point_changes_update_index(authenticated_client, db_session, vector_store):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    point = KnowledgePoint(title="Osmosis", user_id=user_id)
+    db_session.add(point)
+    db_session.commit()
+
+    response = authenticated_client.put(
+        f"/api/v1/knowledge-points/{point.id}",
+        json={"description": "Water crossing a membrane"}
+    )
+    assert response.status_code == 200
+    results = asyncio.run(vector_store.search(user_id, "membrane"))
+    assert results[0]["text"] == "Osmosis\nWater crossing a membrane"
+
+    authenticated_client.delete(f"/api/v1/knowledge-points/{point.id}")
+    assert asyncio.run(vector_store.search(user_id, "membrane")) == []
+
+def test_workers_merge_into_the_shared_snapshot(tmp_path, db_session, authenticated_client):
+    user_id = authenticated_client.get("/api/v1/auth/me").json()["id"]
+    point = KnowledgePoint(title="Osmosis", user_id=user_id)
+    db_session.add(point)
+    db_session.commit()
+
+    # Two API worker processes sharing the snapshot directory
+    first, second = [
+        VectorStore(directory=str(tmp_path), session_factory=lambda: db_session, provider=CountingProvider())
+        for _ in range(2)
+    ]
+
+    async def update():
+        await first.build(user_id)
+        assert await second.search(user_id, "osmosis")
+        await first.index_knowledge_point(user_id, 101, "Mitosis\nCell division")
+        # The second worker still caches the old index, but merges into the newer snapshot
+        await second.index_knowledge_point(user_id, 102, "Meiosis\nGamete formation")
+        return await first.search(user_id, "cells", k=10)
+
+    results = asyncio.run(update())
+    assert {result["key"] for result in results} == {f"kp:{point.id}", "kp:101", "kp:102"}
+    # Only its query and its own change were embedded by the second worker
+    assert second.provider.embedded == ["osmosis", "Meiosis\nGamete formation"]
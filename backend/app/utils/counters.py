@@ -0,0 +1,24 @@
+from typing import Dict
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+def add_counts(db: Session, model, key: Dict, counts: Dict[str, int]):
+    """Add ``counts`` to the counter columns of the ``model`` row identified by ``key``.
+
+    The row is incremented in place if it exists and created otherwise;
+    ``key`` must match a unique constraint so concurrent creation is caught.
+    """
+    def increment() -> int:
+        return db.query(model).filter_by(**key).update(
+            {getattr(model, field): getattr(model, field) + value for field, value in counts.items()},
+            synchronize_session=False
+        )
+
+    if increment():
+        return
+    try:
+        with db.begin_nested():
+            db.add(model(**key, **counts))
+    except IntegrityError:
+        # Another request created the row concurrently
+        increment()
@@ -1,3 +1,4 @@
+import hashlib
 import uuid
 import os
 from pathlib import Path
@@ -15,6 +16,14 @@ def validate_file_type(filename: str) -> bool:
     file_extension = Path(filename).suffix.lower()
     return file_extension in settings.ALLOWED_FILE_TYPES
 
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hash a file's content without reading it into memory at once"""
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
 def ensure_upload_directory():
     """Ensure the upload directory exists"""
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
@@ -0,0 +1,75 @@
+from typing import Dict, List, Tuple
+import json
+
+def parse_json_array(text: str) -> Tuple[List[Dict], List[str]]:
+    """The objects of the JSON array in an LLM response, and the raw elements that weren't.
+
+    Anything around the array, such as prose or a code fence, is ignored,
+    and a bracketed aside before it that holds no objects is skipped.
+    Elements that aren't valid JSON objects are returned separately instead
+    of failing the whole response, and a response cut off mid-array keeps
+    the objects completed so far.
+    """
+    items: List[Dict] = []
+    invalid: List[str] = []
+    depth = 0
+    in_string = False
+    escaped = False
+    element: List[str] = []
+    array_items = 0
+    array_invalid = 0  # Invalid elements before the current array
+
+    def finish_element():
+        raw = "".join(element).strip()
+        element.clear()
+        if not raw:
+            return  # Empty array or trailing comma
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            item = None
+        if isinstance(item, dict):
+            items.append(item)
+        else:
+            invalid.append(raw)
+
+    for char in text:
+        if depth == 0:
+            if char == "[":
+                depth = 1
+                array_items = len(items)
+                array_invalid = len(invalid)
+            continue
+
+        if in_string:
+            element.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                finish_element()
+                if len(items) > array_items:
+                    return items, invalid
+                # An aside like "[1]" in prose isn't the answer
+                del invalid[array_invalid:]
+                continue
+        elif char == "," and depth == 1:
+            finish_element()
+            continue
+        element.append(char)
+
+    # Truncated: an element cut off mid-way counts as invalid
+    if depth >= 1:
+        finish_element()
+    return items, invalid
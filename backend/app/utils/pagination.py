@@ -0,0 +1,78 @@
+from typing import List, Optional, Tuple
+from datetime import datetime
+import base64
+import json
+from fastapi import HTTPException, Response, status
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Query
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Encode a (created_at, id) position as an opaque URL-safe cursor"""
+    payload = json.dumps([created_at.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def paginate(
+    query: Query,
+    model,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    include_total: bool = False
+) -> Tuple[List, Optional[str], Optional[int]]:
+    """Page through a query newest first, ordered by (created_at, id).
+
+    With a ``cursor`` the page starts right after the cursor's row (keyset
+    pagination), so deep pages cost the same as the first one; ``skip`` is
+    still honoured for OFFSET paging when no cursor is given. The total is
+    counted in the same round trip with a window function. As a keyset
+    filter would restrict that count, it is only returned when no cursor
+    is given.
+
+    Returns the page of rows, the cursor of the next page (None on the last
+    page) and the total (or None).
+    """
+    with_total = include_total and cursor is None
+    if with_total:
+        query = query.add_columns(func.count().over().label("total"))
+
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, id))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+
+    total = None
+    if with_total:
+        if rows:
+            total = rows[0].total
+        elif not skip:
+            total = 0  # An OFFSET past the end leaves the total unknown
+        rows = [row[0] for row in rows]
+
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return items, next_cursor, total
+
+def set_pagination_headers(response: Response, next_cursor: Optional[str], total: Optional[int]):
+    """Expose paging state on endpoints that return a bare list"""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
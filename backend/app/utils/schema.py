@@ -0,0 +1,45 @@
+from typing import List
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+def add_missing_columns(engine: Engine, metadata: MetaData) -> List[str]:
+    """Bring tables created by older versions up to date with the models.
+
+    ``create_all`` only creates missing tables, so columns and indexes added
+    to an existing model never reach an existing database. Missing columns
+    are added as nullable (existing rows have no value for them) and
+    missing indexes are created. Each change is its own transaction, so an
+    API worker that loses the race to another one starting up skips it.
+    Returns the ``table.column`` names added.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+    added = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            try:
+                with engine.begin() as connection:
+                    if hasattr(column.type, "create"):
+                        # Enum types are schema objects of their own on some databases
+                        column.type.create(connection, checkfirst=True)
+                    connection.exec_driver_sql(
+                        f"ALTER TABLE {preparer.format_table(table)} "
+                        f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=engine.dialect)}"
+                    )
+                added.append(f"{table.name}.{column.name}")
+            except DBAPIError as e:
+                print(f"Error adding column {table.name}.{column.name}: {e}")
+        for index in table.indexes:
+            try:
+                with engine.begin() as connection:
+                    index.create(connection, checkfirst=True)
+            except DBAPIError as e:
+                print(f"Error creating index {index.name}: {e}")
+    return added
@@ -0,0 +1,48 @@
+from typing import AsyncIterator, Awaitable, Callable, Optional
+import json
+from fastapi.responses import StreamingResponse
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """Encode one server-sent event with a JSON payload"""
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+async def sse_text_stream(
+    deltas: AsyncIterator[str],
+    on_complete: Optional[Callable[[str], Awaitable[None]]] = None
+) -> AsyncIterator[str]:
+    """Forward text deltas as SSE ``data`` events.
+
+    Ends with a ``done`` event carrying the full text (passed to
+    awaiting ``on_complete`` first), or an ``error`` event if generation fails, telling
+    whether trying again later may help.
+    """
+    parts = []
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            yield format_sse({"text": delta})
+    except Exception as e:
+        print(f"Error streaming completion: {e}")
+        yield format_sse(
+            {"detail": "Generation failed", "retryable": getattr(e, "retryable", False)},
+            event="error"
+        )
+        return
+
+    text = "".join(parts).strip()
+    if on_complete is not None:
+        await on_complete(text)
+    yield format_sse({"text": text}, event="done")
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Don't let nginx buffer the stream
+        }
+    )
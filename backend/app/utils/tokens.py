@@ -0,0 +1,35 @@
+from functools import lru_cache
+import re
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to an estimate
+    tiktoken = None
+
+# CJK characters are roughly one token each; other text averages about
+# four characters per token with OpenAI tokenizers
+CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]")
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            return None
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count without a tokenizer"""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + -(-(len(text) - cjk) // 4)
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """Count the tokens of text for a model, estimating when tiktoken is unavailable"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
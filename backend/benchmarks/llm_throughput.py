@@ -0,0 +1,89 @@
+"""Benchmark LLMService throughput and tail latency offline.
+
+Uses the mock provider in-process by default; pass --base-url to go through
+the OpenAI provider against benchmarks/mock_llm_server.py instead. Run from
+the backend directory:
+
+    python -m benchmarks.llm_throughput --requests 500 --latency-ms 300 --error-rate 0.02
+    python -m benchmarks.llm_throughput --base-url http://localhost:8100/v1
+"""
+import argparse
+import asyncio
+import time
+
+from app.config import settings
+from app.services.llm_errors import LLMError
+from app.services.llm_providers import MockProvider, OpenAIProvider
+from app.services.llm_service import LLMService
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run(args):
+    settings.LLM_CACHE_ENABLED = not args.no_cache
+    settings.LLM_CACHE_SHARED_ENABLED = False
+    settings.LLM_MAX_CONCURRENCY = args.concurrency
+    settings.LLM_REQUESTS_PER_MINUTE = args.rpm
+    settings.LLM_TOKENS_PER_MINUTE = args.tpm
+
+    if args.base_url:
+        settings.OPENAI_BASE_URL = args.base_url
+        settings.OPENAI_API_KEY = settings.OPENAI_API_KEY or "mock"
+        provider = OpenAIProvider()
+    else:
+        provider = MockProvider(
+            latency_ms=args.latency_ms, latency_sigma=args.latency_sigma, error_rate=args.error_rate, seed=args.seed
+        )
+    llm_service = LLMService(provider=provider)
+
+    async def call(number: int):
+        started = time.perf_counter()
+        try:
+            if args.method == "flashcards":
+                points = [
+                    {"id": number * args.points + point, "title": f"Topic {number}.{point}"}
+                    for point in range(args.points)
+                ]
+                result = await llm_service.generate_flashcards_batch(points)
+                ok = len(result) == len(points)
+            else:
+                await llm_service.explain_concept(f"Concept {number % args.distinct}")
+                ok = True
+        except LLMError:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[call(number) for number in range(args.requests)])
+    elapsed = time.perf_counter() - started
+    await provider.close()
+
+    latencies = [latency * 1000 for latency, _ in results]
+    failures = sum(1 for _, ok in results if not ok)
+    print(f"{args.requests} {args.method} requests in {elapsed:.2f}s ({args.requests / elapsed:.1f}/s), {failures} failed")
+    print(
+        f"latency ms: p50 {percentile(latencies, 0.5):.0f}  p95 {percentile(latencies, 0.95):.0f}  "
+        f"p99 {percentile(latencies, 0.99):.0f}  max {max(latencies):.0f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--method", choices=["explain", "flashcards"], default="explain")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=50, help="distinct concepts for explain requests")
+    parser.add_argument("--points", type=int, default=20, help="knowledge points per flashcard request")
+    parser.add_argument("--concurrency", type=int, default=settings.LLM_MAX_CONCURRENCY)
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute limit, 0 for none")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens per minute limit, 0 for none")
+    parser.add_argument("--latency-ms", type=float, default=settings.MOCK_LLM_LATENCY_MS)
+    parser.add_argument("--latency-sigma", type=float, default=settings.MOCK_LLM_LATENCY_SIGMA)
+    parser.add_argument("--error-rate", type=float, default=settings.MOCK_LLM_ERROR_RATE)
+    parser.add_argument("--seed", type=int, default=settings.MOCK_LLM_SEED)
+    parser.add_argument("--base-url", help="OpenAI-compatible server to call instead of the in-process mock")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""OpenAI-compatible chat completion server backed by the mock LLM provider.
+
+Point the API at it to load-test the real HTTP path (connection pooling,
+rate limiting, streaming) without network access or API spend:
+
+    MOCK_LLM_LATENCY_MS=300 MOCK_LLM_ERROR_RATE=0.02 \\
+        uvicorn benchmarks.mock_llm_server:app --port 8100
+    LLM_PROVIDER=openai OPENAI_BASE_URL=http://localhost:8100/v1 OPENAI_API_KEY=mock \\
+        uvicorn app.main:app
+"""
+import json
+import time
+import uuid
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from app.services.llm_providers import LLMProviderError, MockProvider
+from app.utils.tokens import count_tokens
+
+app = FastAPI(title="Mock LLM")
+provider = MockProvider()
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body["messages"]
+    model = body.get("model", "mock")
+    max_tokens = body.get("max_tokens") or 512
+    temperature = body.get("temperature", 1.0)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if body.get("stream"):
+        async def events():
+            try:
+                async for piece in provider.stream(messages, model, max_tokens, temperature):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+            except LLMProviderError as e:
+                yield f"data: {json.dumps({'error': {'message': str(e)}})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    try:
+        completion = await provider.complete(messages, model, max_tokens, temperature)
+    except LLMProviderError as e:
+        # Surface mock failures like a provider under load
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": completion["text"]},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": completion["prompt_tokens"],
+            "completion_tokens": completion["completion_tokens"],
+            "total_tokens": completion["prompt_tokens"] + completion["completion_tokens"]
+        }
+    }
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    model = body.get("model", "mock")
+    try:
+        vectors = await provider.embed(texts, model)
+    except LLMProviderError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    tokens = sum(count_tokens(text, model) for text in texts)
+    return {
+        "object": "list",
+        "model": model,
+        "data": [
+            {"object": "embedding", "index": index, "embedding": vector}
+            for index, vector in enumerate(vectors)
+        ],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    }
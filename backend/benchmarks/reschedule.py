@@ -0,0 +1,56 @@
+"""Benchmark vectorized rescheduling against reviewing cards one at a time.
+
+Replays synthetic review histories with each scheduler. Run from the
+backend directory:
+
+    python -m benchmarks.reschedule --cards 1000000 --reviews 20
+    python -m benchmarks.reschedule --algorithm fsrs --loop-cards 2000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.models.flashcard import Flashcard
+from app.services.scheduler import SCHEDULERS
+
+def build_histories(cards: int, reviews: int, seed: int):
+    """Scores, timestamps and lengths of random review histories"""
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(1, reviews + 1, size=cards)
+    scores = rng.choice([1, 2, 3, 4, 5], p=[0.08, 0.07, 0.25, 0.45, 0.15], size=(cards, reviews))
+    gaps = rng.exponential(5 * 86400, size=(cards, reviews)) + 600
+    times = datetime(2024, 1, 1).timestamp() + np.cumsum(gaps, axis=1)
+    return scores, times, counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithm", choices=sorted(SCHEDULERS), default="sm2")
+    parser.add_argument("--cards", type=int, default=200000)
+    parser.add_argument("--reviews", type=int, default=20, help="most reviews per card")
+    parser.add_argument("--loop-cards", type=int, default=1000, help="cards to time one review at a time")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scheduler = SCHEDULERS[args.algorithm]
+    scores, times, counts = build_histories(args.cards, args.reviews, args.seed)
+
+    started = time.perf_counter()
+    state = scheduler.replay(scores, times, counts)
+    rows = scheduler.rows(state, np.arange(args.cards))
+    vectorized = time.perf_counter() - started
+    print(f"vectorized: {args.cards} cards, {counts.sum()} reviews in {vectorized:.2f}s ({args.cards / vectorized:,.0f} cards/s, rows included)")
+
+    loop_cards = min(args.loop_cards, args.cards)
+    started = time.perf_counter()
+    for card in range(loop_cards):
+        flashcard = Flashcard()
+        for position in range(counts[card]):
+            scheduler.review(flashcard, int(scores[card, position]), datetime(1970, 1, 1) + timedelta(seconds=times[card, position]))
+    loop = time.perf_counter() - started
+    print(f"one at a time: {loop_cards} cards in {loop:.2f}s ({loop_cards / loop:,.0f} cards/s)")
+    assert rows[0]["due_date"] is not None
+
+if __name__ == "__main__":
+    main()